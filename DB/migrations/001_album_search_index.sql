@@ -0,0 +1,34 @@
+-- Migration 001: local album search.
+-- Trigram indexes so /v1/search/albums can answer from our own album/author
+-- tables before going to Deezer. Run after music.sql (and the older ALTER
+-- scripts in DB/), e.g.:
+-- psql -h localhost -p 5432 -U postgres -d capstonemusic -f DB/migrations/001_album_search_index.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS music.schema_migrations
+(
+    version integer NOT NULL,
+    name text COLLATE pg_catalog."default" NOT NULL,
+    applied_at timestamp with time zone NOT NULL DEFAULT now(),
+    CONSTRAINT schema_migrations_pkey PRIMARY KEY (version)
+);
+
+-- pg_trgm lives in public, which is on the app's search_path (music, public)
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+
+CREATE INDEX IF NOT EXISTS album_name_trgm_idx
+    ON music.album USING gin (album_name public.gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS author_name_trgm_idx
+    ON music.author USING gin (author_name public.gin_trgm_ops);
+
+-- artist matches join author -> album
+CREATE INDEX IF NOT EXISTS album_author_id_idx
+    ON music.album (author_id);
+
+INSERT INTO music.schema_migrations (version, name)
+VALUES (1, 'album_search_index')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
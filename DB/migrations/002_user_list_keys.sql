@@ -0,0 +1,44 @@
+-- Migration 002: keys and indexes for the per-user hot queries.
+-- want_to_listen and user_rating had no key at all, so every
+-- (user_id, album_id) lookup, the per-user list pages and the upserts in
+-- add_album/rate_album scanned the whole table.
+-- psql -h localhost -p 5432 -U postgres -d capstonemusic -f DB/migrations/002_user_list_keys.sql
+-- Check the plans afterwards with backend/bench/explain_hot_queries.py.
+
+BEGIN;
+
+-- Existing duplicates would block the primary keys; keep one row per pair
+-- (for ratings, the highest ctid, i.e. usually the last one written).
+DELETE FROM music.want_to_listen w
+USING music.want_to_listen d
+WHERE w.user_id = d.user_id AND w.album_id = d.album_id AND w.ctid < d.ctid;
+
+DELETE FROM music.user_rating r
+USING music.user_rating d
+WHERE r.user_id = d.user_id AND r.album_id = d.album_id AND r.ctid < d.ctid;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'want_to_listen_pkey') THEN
+        ALTER TABLE music.want_to_listen
+            ADD CONSTRAINT want_to_listen_pkey PRIMARY KEY (user_id, album_id);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'user_rating_pkey') THEN
+        ALTER TABLE music.user_rating
+            ADD CONSTRAINT user_rating_pkey PRIMARY KEY (user_id, album_id);
+    END IF;
+END $$;
+
+-- select_album's track list: WHERE album_id = ? ORDER BY song_num
+CREATE INDEX IF NOT EXISTS song_album_id_song_num_idx
+    ON music.song (album_id, song_num);
+
+-- find_user_by_username: WHERE lower(user_name) = lower(?)
+CREATE INDEX IF NOT EXISTS app_user_lower_user_name_idx
+    ON music.app_user (lower(user_name));
+
+INSERT INTO music.schema_migrations (version, name)
+VALUES (2, 'user_list_keys')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,105 @@
+-- Migration 003: per-album community rating, maintained incrementally.
+-- album.rating_count / album.rating_sum are kept in step with user_rating by
+-- statement-level triggers, in the same transaction as the rating change.
+-- Statement-level means the batch rating endpoint costs one aggregate update
+-- per album, not one per row. album.album_rating holds the average.
+-- music.rebuild_album_rating_aggregates() recomputes everything from
+-- user_rating and returns how many albums were out of step.
+-- psql -h localhost -p 5432 -U postgres -d capstonemusic -f DB/migrations/003_album_rating_aggregates.sql
+
+BEGIN;
+
+ALTER TABLE music.album ADD COLUMN IF NOT EXISTS rating_count integer NOT NULL DEFAULT 0;
+ALTER TABLE music.album ADD COLUMN IF NOT EXISTS rating_sum double precision NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION music.apply_album_rating_deltas() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    -- Transition tables only exist for the event that fired the trigger;
+    -- plpgsql plans each statement on first use, so each branch only
+    -- references the tables its event provides.
+    IF TG_OP = 'INSERT' THEN
+        UPDATE music.album a
+        SET rating_count = a.rating_count + d.n,
+            rating_sum = a.rating_sum + d.s,
+            album_rating = ((a.rating_sum + d.s) / (a.rating_count + d.n))::real
+        FROM (SELECT album_id, count(*)::integer AS n, sum(user_rating::double precision) AS s
+              FROM new_ratings WHERE user_rating IS NOT NULL GROUP BY album_id) d
+        WHERE a.album_id = d.album_id;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE music.album a
+        SET rating_count = a.rating_count - d.n,
+            rating_sum = a.rating_sum - d.s,
+            album_rating = CASE WHEN a.rating_count - d.n > 0
+                                THEN ((a.rating_sum - d.s) / (a.rating_count - d.n))::real END
+        FROM (SELECT album_id, count(*)::integer AS n, sum(user_rating::double precision) AS s
+              FROM old_ratings WHERE user_rating IS NOT NULL GROUP BY album_id) d
+        WHERE a.album_id = d.album_id;
+    ELSE
+        UPDATE music.album a
+        SET rating_count = a.rating_count + d.n,
+            rating_sum = a.rating_sum + d.s,
+            album_rating = CASE WHEN a.rating_count + d.n > 0
+                                THEN ((a.rating_sum + d.s) / (a.rating_count + d.n))::real END
+        FROM (SELECT album_id, sum(n)::integer AS n, sum(s) AS s
+              FROM (SELECT album_id, -count(*) AS n, -sum(user_rating::double precision) AS s
+                    FROM old_ratings WHERE user_rating IS NOT NULL GROUP BY album_id
+                    UNION ALL
+                    SELECT album_id, count(*), sum(user_rating::double precision)
+                    FROM new_ratings WHERE user_rating IS NOT NULL GROUP BY album_id) changes
+              GROUP BY album_id) d
+        WHERE a.album_id = d.album_id AND (d.n <> 0 OR d.s <> 0);
+    END IF;
+    RETURN NULL;
+END $$;
+
+DROP TRIGGER IF EXISTS user_rating_aggregate_insert ON music.user_rating;
+DROP TRIGGER IF EXISTS user_rating_aggregate_update ON music.user_rating;
+DROP TRIGGER IF EXISTS user_rating_aggregate_delete ON music.user_rating;
+
+CREATE TRIGGER user_rating_aggregate_insert
+    AFTER INSERT ON music.user_rating
+    REFERENCING NEW TABLE AS new_ratings
+    FOR EACH STATEMENT EXECUTE FUNCTION music.apply_album_rating_deltas();
+
+CREATE TRIGGER user_rating_aggregate_update
+    AFTER UPDATE ON music.user_rating
+    REFERENCING OLD TABLE AS old_ratings NEW TABLE AS new_ratings
+    FOR EACH STATEMENT EXECUTE FUNCTION music.apply_album_rating_deltas();
+
+CREATE TRIGGER user_rating_aggregate_delete
+    AFTER DELETE ON music.user_rating
+    REFERENCING OLD TABLE AS old_ratings
+    FOR EACH STATEMENT EXECUTE FUNCTION music.apply_album_rating_deltas();
+
+CREATE OR REPLACE FUNCTION music.rebuild_album_rating_aggregates() RETURNS integer
+LANGUAGE sql AS $$
+    WITH totals AS (
+        SELECT a.album_id,
+               count(r.user_rating)::integer AS n,
+               coalesce(sum(r.user_rating::double precision), 0) AS s
+        FROM music.album a
+        LEFT JOIN music.user_rating r ON r.album_id = a.album_id
+        GROUP BY a.album_id
+    ), fixed AS (
+        UPDATE music.album a
+        SET rating_count = t.n,
+            rating_sum = t.s,
+            album_rating = CASE WHEN t.n > 0 THEN (t.s / t.n)::real END
+        FROM totals t
+        WHERE a.album_id = t.album_id
+          AND (a.rating_count <> t.n
+               OR abs(a.rating_sum - t.s) > 1e-6
+               OR a.album_rating IS DISTINCT FROM CASE WHEN t.n > 0 THEN (t.s / t.n)::real END)
+        RETURNING 1
+    )
+    SELECT count(*)::integer FROM fixed;
+$$;
+
+SELECT music.rebuild_album_rating_aggregates();
+
+INSERT INTO music.schema_migrations (version, name)
+VALUES (3, 'album_rating_aggregates')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,21 @@
+-- Migration 004: indexes for keyset pagination of /v1/me/albums and
+-- /v1/me/rated-albums.
+-- want_to_listen pages are ordered by (album_name, album_id): walking album
+-- in that order and probing want_to_listen_pkey stops after one page.
+-- rated-albums pages are ordered by (user_rating DESC, album_name, album_id):
+-- the user's ratings come off the index already in rating order.
+-- psql -h localhost -p 5432 -U postgres -d capstonemusic -f DB/migrations/004_user_list_pagination.sql
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS album_name_album_id_idx
+    ON music.album (album_name, album_id);
+
+CREATE INDEX IF NOT EXISTS user_rating_user_id_rating_idx
+    ON music.user_rating (user_id, user_rating DESC, album_id);
+
+INSERT INTO music.schema_migrations (version, name)
+VALUES (4, 'user_list_pagination')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
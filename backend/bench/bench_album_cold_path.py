@@ -0,0 +1,68 @@
+"""
+Cold album-detail path: upstream latency before/after parallel fetching.
+
+"before" replays the old select_album sequence (/album/{id}, the same
+/album/{id} again for release_date/cover, then /album/{id}/tracks, one
+after another). "after" is fetch_album_details(), which requests
+/album/{id} and /album/{id}/tracks once each, in parallel. Both run
+against a local Deezer stub with a fixed per-request delay.
+
+    python bench_album_cold_path.py --latency 0.1 --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import external_api_service as service  # noqa: E402
+from deezer_client import DeezerClient  # noqa: E402
+from deezer_stub import DeezerStub  # noqa: E402
+
+
+def sequential_fetch(client, album_id):
+    full_album = client.album(album_id)
+    album_data = service.album_from_deezer(full_album)
+    full_album = client.album(album_id)
+    album_data['release_date'] = album_data['release_date'] or full_album.get('release_date')
+    album_data['tracks'] = client.album_tracks(album_id)['data']
+    return album_data
+
+
+def measure(fn, runs):
+    timings = []
+    for i in range(runs):
+        started = time.perf_counter()
+        fn(str(1000 + i))
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'runs': runs,
+        'p50_ms': round(statistics.median(timings), 2),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'max_ms': round(max(timings), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency', type=float, default=0.1, help="stub delay per request (s)")
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    with DeezerStub(latency=args.latency) as stub:
+        client = DeezerClient(stub.base_url, rate_per_second=None)
+        service.set_deezer_client(client)
+
+        results = {
+            'stub_latency_ms': args.latency * 1000,
+            'before_sequential': measure(lambda album_id: sequential_fetch(client, album_id), args.runs),
+            'after_parallel': measure(service.fetch_album_details, args.runs),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
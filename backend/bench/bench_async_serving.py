@@ -0,0 +1,208 @@
+"""
+Sync vs. async serving under a slow Deezer.
+
+Runs the app in a child process (the Deezer stub in another) either as the Flask app on a WSGI server
+with a fixed pool of request threads (what gunicorn --threads N gives you)
+or as async_service on uvicorn, both pointed at the local Deezer stub
+with --latency seconds added to every upstream response. Then drives
+/v1/search/albums and /v1/albums/<id> at increasing concurrency and reports
+throughput and latency percentiles per mode.
+
+Every request uses a new query/album id, so nothing is served from cache;
+the Deezer rate limiter and response cache are off, and the database is
+treated as unavailable (both modes fall through to Deezer), so only
+request handling and upstream I/O are measured. /v1/albums/random makes
+no upstream calls and isn't included.
+
+    python bench_async_serving.py --latency 1.0 --concurrency 8 32 64 128 --seconds 6
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import ssl
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+STUB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deezer_stub.py')
+
+
+def serve(mode, port, stub_url, threads):
+    """Child process: configure the app for the benchmark and serve it"""
+    sys.stdout = open(os.devnull, 'w')
+    sys.stderr = open(os.devnull, 'w')
+
+    import external_api_service as svc
+    from deezer_client import DeezerClient
+
+    def no_db():
+        raise ConnectionError("database disabled for benchmark")
+
+    svc.set_deezer_client(DeezerClient(base_url=stub_url, rate_per_second=0, pool_maxsize=512))
+    svc.get_db_connection = no_db
+    svc.save_albums_to_db = lambda albums: [int(album['deezer_id']) for album in albums]
+    svc.PREFETCH_ENABLED = False
+
+    if mode == 'async':
+        import uvicorn
+        import async_service
+
+        async def no_async_db():
+            raise ConnectionError("database disabled for benchmark")
+
+        async_service.get_async_db_pool = no_async_db
+        async_service.ASYNC_DEEZER_MAX_CONNECTIONS = 512
+        uvicorn.run(async_service.app, host='127.0.0.1', port=port, log_level='warning',
+                    backlog=2048)
+    else:
+        from werkzeug.serving import BaseWSGIServer
+
+        class PooledWSGIServer(BaseWSGIServer):
+            """WSGI server with a fixed number of request threads"""
+            request_queue_size = 2048
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.executor = ThreadPoolExecutor(max_workers=threads)
+
+            def process_request(self, request, client_address):
+                self.executor.submit(self._process, request, client_address)
+
+            def _process(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+
+        PooledWSGIServer('127.0.0.1', port, svc.app).serve_forever()
+
+
+def wait_for(proc, url, what, timeout=1.0):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=timeout)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{what} did not start")
+
+
+def start_stub(port, latency):
+    # Own process: its request threads would otherwise compete with the
+    # load generator for the GIL and skew the numbers.
+    proc = subprocess.Popen([sys.executable, STUB, '--port', str(port), '--latency', str(latency)],
+                            stdout=subprocess.DEVNULL)
+    return wait_for(proc, f"http://127.0.0.1:{port}/album/1", "Deezer stub", timeout=latency + 1)
+
+
+def start_server(mode, port, stub_url, threads):
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', mode,
+                             '--port', str(port), '--stub-url', stub_url,
+                             '--threads', str(threads)])
+    return wait_for(proc, f"http://127.0.0.1:{port}/api/ping", f"{mode} server")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1) if values else None
+
+
+async def drive(base_url, path_for, concurrency, seconds):
+    counter = itertools.count(1)
+    latencies = []
+    errors = 0
+    # One single-connection client per worker, built before the clock starts:
+    # a shared httpx pool costs O(connections) per request and would make the
+    # load generator the bottleneck at a few hundred connections.
+    ssl_context = ssl.create_default_context()
+    clients = [httpx.AsyncClient(base_url=base_url, timeout=60, verify=ssl_context)
+               for _ in range(concurrency)]
+
+    async def worker(client):
+        nonlocal errors
+        async with client:
+            while time.monotonic() < deadline:
+                started = time.monotonic()
+                try:
+                    response = await client.get(path_for(next(counter)))
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.monotonic() - started)
+                else:
+                    errors += 1
+
+    started = time.monotonic()
+    deadline = started + seconds
+    await asyncio.gather(*(worker(client) for client in clients))
+    elapsed = time.monotonic() - started
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+    }
+
+
+MODES = ('sync', 'async')
+
+ENDPOINTS = {
+    'search_albums': lambda n: f"/v1/search/albums?q=bench{n}",
+    'select_album': lambda n: f"/v1/albums/{1_000_000 + n}",
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--latency', type=float, default=0.5, help="seconds added to every Deezer response")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32, 64, 128])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--threads', type=int, default=16, help="request threads for the sync server")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--serve', choices=['sync', 'async'], help=argparse.SUPPRESS)
+    parser.add_argument('--stub-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.stub_url, args.threads)
+        return
+
+    results = {'latency_s': args.latency, 'sync_threads': args.threads, 'modes': {}}
+    stub = start_stub(args.port + 1, args.latency)
+    try:
+        for mode in MODES:
+            proc = start_server(mode, args.port, f"http://127.0.0.1:{args.port + 1}", args.threads)
+            try:
+                base_url = f"http://127.0.0.1:{args.port}"
+                results['modes'][mode] = {
+                    name: [asyncio.run(drive(base_url, path_for, c, args.seconds)) for c in args.concurrency]
+                    for name, path_for in ENDPOINTS.items()
+                }
+            finally:
+                proc.terminate()
+                proc.wait(10)
+    finally:
+        stub.terminate()
+        stub.wait(10)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
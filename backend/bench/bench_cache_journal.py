@@ -0,0 +1,204 @@
+"""
+Restart and shutdown time of the search cache with its crash journal.
+
+For each --pages size a child process fills the search cache the way
+searches and prefetches do (pages of --page-size albums, track lists merged
+into half of them) and is then SIGKILLed. Fresh processes then measure:
+
+- restart: restore_search_cache() replays the journal; checks every page
+  and every merged track list came back
+- shutdown: save_all_cache_to_db() against a simulated database that takes
+  --batch-latency seconds per batch, with 1 worker (the old serial flush)
+  and with SHUTDOWN_FLUSH_WORKERS; then with a --deadline too short to
+  finish, followed by a restart whose shutdown saves only the albums the
+  first one didn't reach
+
+Plus the cost of one store_search_session() with and without the journal.
+No database or Deezer is needed.
+
+    python bench_cache_journal.py --pages 1000 5000 --batch-latency 0.05 --deadline 1
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+
+def make_page(n, page_size):
+    return [{
+        'deezer_id': str(1_000_000 + n * page_size + i),
+        'title': f"Bench album {n}/{i}",
+        'artist_name': f"Bench artist {n % 500}",
+        'artist_id': str(10_000 + n % 500),
+        'cover_url': f"https://cdn.example.com/cover/{n}/{i}.jpg",
+        'release_date': None,
+    } for i in range(page_size)]
+
+
+def make_details(album_id):
+    return {
+        'release_date': '2020-01-01',
+        'genre_id': 132,
+        'tracks': [{'id': int(album_id) * 100 + t, 'title': f"Track {t}", 'track_position': t + 1}
+                   for t in range(12)],
+    }
+
+
+def child(args):
+    """Child process: one app instance with a simulated database; writes results to args.out"""
+    sys.stdout = open(os.devnull, 'w')
+    import external_api_service as svc
+
+    saved = []
+    lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def fake_db():
+        class Connection:
+            def cursor(self):
+                return contextlib.nullcontext(None)
+        yield Connection()
+
+    def fake_upsert(cur, albums):
+        time.sleep(args.batch_latency)
+        with lock:
+            saved.extend(album['deezer_id'] for album in albums)
+        return len(albums), 0
+
+    svc.get_db_connection = fake_db
+    svc._upsert_albums = fake_upsert
+    svc.fetch_album_details = make_details
+    svc.SESSION_CACHE.max_entries = svc.SESSION_CACHE.max_bytes = 10 ** 12
+    svc.SHUTDOWN_FLUSH_WORKERS = args.workers
+    result = {}
+
+    if args.child == 'fill':
+        svc.restore_search_cache()
+        started = time.perf_counter()
+        for n in range(args.pages):
+            svc.store_search_session(f"bench {n}:1", make_page(n, args.page_size))
+        result['search_us'] = round((time.perf_counter() - started) * 1e6 / args.pages, 1)
+        for n in range(args.pages):
+            for album in make_page(n, args.page_size)[::2]:
+                svc._prefetch_album(album['deezer_id'])
+        with open(args.out, 'w') as f:
+            json.dump(result, f)
+        if svc.SEARCH_JOURNAL is not None and svc.SEARCH_JOURNAL.is_open:
+            os.kill(os.getpid(), signal.SIGKILL)    # crash: no atexit flush
+        os._exit(0)
+
+    started = time.perf_counter()
+    svc.restore_search_cache()
+    result['restart_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    result['journal_records_replayed'] = svc.SEARCH_JOURNAL.stats()['replayed_records']
+    pages = svc.SESSION_CACHE.items()
+    result['pages_restored'] = len(pages)
+    result['tracks_restored'] = sum(1 for _, albums in pages for album in albums if album.get('tracks'))
+
+    svc.PERSIST_QUEUE.flush()      # saves of restored albums, if any, aren't shutdown time
+    saved.clear()
+    started = time.perf_counter()
+    svc.save_all_cache_to_db(timeout=args.deadline)
+    result['shutdown_s'] = round(time.perf_counter() - started, 3)
+    result['albums_saved'] = len(saved)
+    result['albums_left_in_journal'] = svc.SEARCH_JOURNAL.stats()['unsaved_albums']
+    with open(args.out, 'w') as f:
+        json.dump(result, f)
+    os._exit(0)     # the atexit flush already ran above
+
+
+def run_child(args, mode, journal_path, out, workers=1, deadline=600.0):
+    env = dict(os.environ, SEARCH_JOURNAL_PATH=journal_path)
+    if os.path.exists(out):
+        os.remove(out)
+    subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode,
+                    '--pages', str(args.pages[0]), '--page-size', str(args.page_size),
+                    '--batch-latency', str(args.batch_latency), '--workers', str(workers),
+                    '--deadline', str(deadline), '--out', out], env=env, check=False)
+    with open(out) as f:
+        return json.load(f)
+
+
+def run_size(pages, args, tmpdir):
+    args = argparse.Namespace(**{**vars(args), 'pages': [pages]})
+    crashed = os.path.join(tmpdir, f'crashed-{pages}.journal')
+    out = os.path.join(tmpdir, 'result.json')
+    fill = run_child(args, 'fill', crashed, out)
+    no_journal = run_child(args, 'fill', '', out)
+
+    def restart(name, **kwargs):
+        path = os.path.join(tmpdir, f'{name}-{pages}.journal')
+        shutil.copy(crashed, path)
+        return path, run_child(args, 'restart', path, out, **kwargs)
+
+    _, serial = restart('serial', workers=1)
+    _, parallel = restart('parallel', workers=args.parallel_workers)
+    path, bounded = restart('bounded', workers=args.parallel_workers, deadline=args.deadline)
+    after = run_child(args, 'restart', path, out, workers=args.parallel_workers)
+
+    return {
+        'pages': pages,
+        'albums': pages * args.page_size,
+        'journal_bytes': os.path.getsize(crashed),
+        'search_us_with_journal': fill['search_us'],
+        'search_us_without_journal': no_journal['search_us'],
+        'restart_ms': parallel['restart_ms'],
+        'pages_restored': parallel['pages_restored'],
+        'track_lists_restored': parallel['tracks_restored'],
+        'shutdown_serial_s': serial['shutdown_s'],
+        'shutdown_parallel_s': parallel['shutdown_s'],
+        'albums_saved': parallel['albums_saved'],
+        'deadline': {
+            'deadline_s': args.deadline,
+            'shutdown_s': bounded['shutdown_s'],
+            'albums_saved': bounded['albums_saved'],
+            'albums_left_in_journal': bounded['albums_left_in_journal'],
+            'next_restart_ms': after['restart_ms'],
+            'next_shutdown_s': after['shutdown_s'],
+            'next_shutdown_albums_saved': after['albums_saved'],
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--pages', type=int, nargs='+', default=[1000, 5000])
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--batch-latency', type=float, default=0.05, help="simulated seconds per saved batch")
+    parser.add_argument('--parallel-workers', type=int, default=4)
+    parser.add_argument('--deadline', type=float, default=1.0, help="shutdown deadline for the bounded run")
+    parser.add_argument('--child', choices=['fill', 'restart'], help=argparse.SUPPRESS)
+    parser.add_argument('--workers', type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.pages = args.pages[0]
+        child(args)
+        return
+
+    tmpdir = tempfile.mkdtemp(prefix='cache-journal-bench-')
+    try:
+        results = {
+            'page_size': args.page_size,
+            'batch_latency_s': args.batch_latency,
+            'parallel_workers': args.parallel_workers,
+            'sizes': [run_size(pages, args, tmpdir) for pages in args.pages],
+        }
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,631 @@
+"""
+Reproducible load test of the main endpoints against a disposable database
+and the local Deezer stub.
+
+Sets up, from scratch on every run:
+
+- a throwaway PostgreSQL cluster (initdb/pg_ctl from --pg-bin, PATH,
+  pg_config or the pgserver package), or a throwaway database on the server
+  given by --dsn; loaded with DB/music.sql, int_to_bigint.sql,
+  release_date.sql and DB/migrations/*.sql, then a generated catalog of
+  --albums albums, their tracks, --users users and their ratings and lists
+- the Deezer stub (deezer_stub.py) in its own process, with --latency
+  seconds added to every response and --error-rate of them answering 503
+
+Then, for each endpoint, starts a fresh app process (sync: the Flask app on
+a WSGI server with --threads request threads; async: async_service on
+uvicorn), logs every client in, and drives it with --concurrency clients
+for --seconds per scenario:
+
+- cold: the app was just started (empty search, HTTP and Deezer response
+  caches) and every request is for a key not requested before: new search
+  queries, album ids it hasn't loaded, new (user, album) ratings. A share of
+  the album ids (--upstream-share) isn't in the catalog and comes from
+  Deezer. Postgres's own buffers are not flushed.
+- warm: right after, in the same process, each client repeats requests it
+  made during the cold run (albums already loaded, searches already made,
+  rating updates instead of inserts, ...)
+
+The sync server doesn't start the background backfill and rating-aggregate
+jobs, so only request handling is measured; the async one starts them from
+its lifespan, as it does in production. Deezer calls aren't rate limited unless
+--deezer-rate is given (the app's production setting is 10/s).
+
+Results (throughput, p50/p95/p99/max latency, statuses, per endpoint and
+scenario, plus the setup used) are printed as JSON and written to --out;
+--compare puts two such files side by side:
+
+    python bench_load_suite.py --albums 20000 --seconds 5 --out before.json
+    python bench_load_suite.py --albums 20000 --seconds 5 --out after.json
+    python bench_load_suite.py --compare before.json after.json --fail-over 20
+
+As root, the cluster runs as --pg-os-user (PostgreSQL refuses to run as root).
+"""
+import argparse
+import asyncio
+import glob
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import httpx
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(BENCH, '..', 'src')
+DB_DIR = os.path.join(BENCH, '..', '..', 'DB')
+STUB = os.path.join(BENCH, 'deezer_stub.py')
+sys.path.insert(0, SRC)
+
+SCHEMA_SCRIPTS = ['music.sql', 'int_to_bigint.sql', 'release_date.sql']
+
+WORDS = [
+    'midnight', 'river', 'golden', 'echo', 'velvet', 'summer', 'electric', 'shadow',
+    'paper', 'neon', 'silver', 'ocean', 'wild', 'broken', 'crystal', 'desert',
+    'honey', 'iron', 'lunar', 'static', 'violet', 'winter', 'fever', 'garden',
+    'hollow', 'ember', 'north', 'signal', 'thunder', 'atlas', 'blue', 'canyon',
+    'dream', 'forest', 'glass', 'harbor', 'island', 'jungle', 'kingdom', 'light',
+    'mirror', 'nomad', 'orbit', 'prism', 'quiet', 'rebel', 'saint', 'tide',
+]
+SEARCH_PAGES = 3
+
+BENCH_PASSWORD = 'bench-password'
+# Same as PASSWORD_HASH_METHOD in external_api_service; a different method
+# would only cost each user one rehash at their first login.
+BENCH_HASH_METHOD = 'scrypt:32768:8:1'
+
+UPSTREAM_ID_BASE = 5_000_000_000    # album ids outside the catalog, answered by the stub
+
+
+# --- Database -----------------------------------------------------------------
+
+def find_pg_bin(pg_bin=None):
+    """Directory holding initdb and pg_ctl: --pg-bin, PATH, pg_config --bindir, pgserver"""
+    candidates = [pg_bin]
+    initdb = shutil.which('initdb')
+    candidates.append(os.path.dirname(initdb) if initdb else None)
+    try:
+        candidates.append(subprocess.run(['pg_config', '--bindir'], capture_output=True, text=True,
+                                         check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        pass
+    spec = importlib.util.find_spec('pgserver')
+    if spec is not None and spec.submodule_search_locations:
+        candidates.append(os.path.join(spec.submodule_search_locations[0], 'pginstall', 'bin'))
+    for directory in candidates:
+        if directory and os.access(os.path.join(directory, 'initdb'), os.X_OK):
+            return directory
+    return None
+
+
+class DisposableCluster:
+    """
+    A PostgreSQL cluster in a temporary directory, listening only on a unix
+    socket in that directory; removed again by stop().
+    """
+
+    def __init__(self, pg_bin, port, os_user=None):
+        self.pg_bin = pg_bin
+        self.port = port
+        self.os_user = os_user if os.geteuid() == 0 else None
+        self.dir = tempfile.mkdtemp(prefix='load-suite-pg-')
+        self.data = os.path.join(self.dir, 'data')
+        if self.os_user:
+            shutil.chown(self.dir, user=self.os_user)
+
+    def _run(self, tool, *args):
+        command = [os.path.join(self.pg_bin, tool), *args]
+        if self.os_user:
+            command = ['runuser', '-u', self.os_user, '--', *command]
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+
+    def start(self):
+        self._run('initdb', '-D', self.data, '-U', 'postgres', '-A', 'trust', '-E', 'UTF8',
+                  '--locale=C', '--no-sync')
+        self._run('pg_ctl', '-D', self.data, '-l', os.path.join(self.dir, 'postgres.log'), '-w',
+                  '-o', f"-k {self.dir} -p {self.port} -h ''", 'start')
+        return {'host': self.dir, 'port': str(self.port), 'user': 'postgres', 'password': '',
+                'dbname': 'postgres'}
+
+    def stop(self):
+        try:
+            self._run('pg_ctl', '-D', self.data, '-m', 'immediate', 'stop')
+        finally:
+            shutil.rmtree(self.dir, ignore_errors=True)
+
+
+def db_config(admin, dbname):
+    """The app's DB_CONFIG keys (async_service needs all of them) for dbname on the admin server"""
+    config = {'host': '127.0.0.1', 'port': '5432', 'user': 'postgres', 'password': ''}
+    config.update({key: value for key, value in admin.items() if key != 'dbname'})
+    config['dbname'] = dbname
+    return config
+
+
+def admin_connection(admin):
+    conn = psycopg2.connect(**admin)
+    conn.autocommit = True
+    return conn
+
+
+def admin_execute(admin, sql):
+    conn = admin_connection(admin)
+    try:
+        with conn.cursor() as cur:
+            cur.execute(sql)
+    finally:
+        conn.close()
+
+
+def sql_file(name):
+    with open(os.path.join(DB_DIR, name)) as f:
+        return f.read()
+
+
+def without_trigram(script):
+    """Migration 001 minus pg_trgm and its indexes, for servers that don't ship the extension"""
+    script = '\n'.join(line for line in script.splitlines() if not line.lstrip().startswith('--'))
+    return ';'.join(statement for statement in script.split(';') if 'trgm' not in statement)
+
+
+def load_schema(conn):
+    """DB/ scripts in the order the migrations expect; returns whether local search can run"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        trigram = cur.fetchone() is not None
+        cur.execute("SET search_path TO music, public")    # release_date.sql isn't schema-qualified
+        for name in SCHEMA_SCRIPTS:
+            cur.execute(sql_file(name))
+        for path in sorted(glob.glob(os.path.join(DB_DIR, 'migrations', '*.sql'))):
+            script = sql_file(os.path.join('migrations', os.path.basename(path)))
+            if not trigram and os.path.basename(path).startswith('001_'):
+                script = without_trigram(script)
+            cur.execute(script)
+    return trigram
+
+
+def copy_rows(cur, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        buffer.write('\t'.join(r'\N' if value is None else str(value) for value in row) + '\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY music.{table} ({', '.join(columns)}) FROM STDIN", buffer)
+
+
+def generate_catalog(conn, args):
+    """
+    Albums 1..--albums with --tracks tracks each (track ids follow the stub's
+    album_id * 100 + n), --incomplete-share of them without tracks, cover and
+    release date, as if saved from a search; users 1..--users, each with
+    --ratings-per-user ratings and as many list entries.
+    """
+    rng = random.Random(args.seed)
+    started = time.monotonic()
+    authors = max(1, args.albums // 8)
+    from werkzeug.security import generate_password_hash
+    password_hash = generate_password_hash(BENCH_PASSWORD, method=BENCH_HASH_METHOD)
+
+    def name(words):
+        return ' '.join(rng.choice(WORDS) for _ in range(words)).title()
+
+    album_rows, song_rows = [], []
+    for album_id in range(1, args.albums + 1):
+        author_id = 1 + album_id % authors
+        complete = rng.random() >= args.incomplete_share
+        album_rows.append((album_id, author_id, album_id % 20, name(rng.choice((2, 3))),
+                           f"{1970 + album_id % 50}-01-01" if complete else None,
+                           f"https://example.invalid/cover/{album_id}.jpg" if complete else None))
+        if complete:
+            song_rows += [(album_id * 100 + n, author_id, album_id, f"Track {n}", n)
+                          for n in range(1, args.tracks + 1)]
+
+    ratings, listed = [], []
+    per_user = min(args.ratings_per_user, args.albums)
+    for user_id in range(1, args.users + 1):
+        ratings += [(user_id, album_id, rng.randint(1, 5))
+                    for album_id in rng.sample(range(1, args.albums + 1), per_user)]
+        listed += [(user_id, album_id) for album_id in rng.sample(range(1, args.albums + 1), per_user)]
+
+    with conn.cursor() as cur:
+        copy_rows(cur, 'genre', ['genre_id', 'genre_name'], [(g, f"Genre {g}") for g in range(20)])
+        copy_rows(cur, 'author', ['author_id', 'author_name'],
+                  [(author_id, name(2)) for author_id in range(1, authors + 1)])
+        copy_rows(cur, 'album', ['album_id', 'author_id', 'genre_id', 'album_name', 'release_date', 'cover_url'],
+                  album_rows)
+        copy_rows(cur, 'song', ['song_id', 'author_id', 'album_id', 'song_name', 'song_num'], song_rows)
+        copy_rows(cur, 'app_user', ['user_id', 'user_name', 'user_password'],
+                  [(user_id, f"bench_user_{user_id}", password_hash) for user_id in range(1, args.users + 1)])
+        copy_rows(cur, 'user_rating', ['user_id', 'album_id', 'user_rating'], ratings)
+        copy_rows(cur, 'want_to_listen', ['user_id', 'album_id'], listed)
+        cur.execute("ANALYZE")
+        cur.execute("SHOW server_version")
+        version = cur.fetchone()[0]
+
+    return {
+        'albums': len(album_rows),
+        'incomplete_albums': len(album_rows) - len({row[2] for row in song_rows}),
+        'songs': len(song_rows),
+        'users': args.users,
+        'ratings': len(ratings),
+        'list_entries': len(listed),
+        'load_s': round(time.monotonic() - started, 2),
+        'postgres': version,
+    }
+
+
+# --- App and stub processes -----------------------------------------------------
+
+def serve(config):
+    """Child process: the app configured for the benchmark, serving until terminated"""
+    import external_api_service as svc
+
+    svc.DB_CONFIG = config['db']
+    svc.LOCAL_SEARCH_ENABLED = config['local_search']
+    svc.DEEZER_RATE_PER_SECOND = config['deezer_rate']
+    svc.restore_search_cache()
+
+    if config['mode'] == 'async':
+        import uvicorn
+        import async_service
+        uvicorn.run(async_service.app, host='127.0.0.1', port=config['port'], log_level='warning',
+                    backlog=2048)
+        return
+
+    from werkzeug.serving import BaseWSGIServer
+
+    class PooledWSGIServer(BaseWSGIServer):
+        """WSGI server with a fixed number of request threads"""
+        request_queue_size = 2048
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.executor = ThreadPoolExecutor(max_workers=config['threads'])
+
+        def process_request(self, request, client_address):
+            self.executor.submit(self._process, request, client_address)
+
+        def _process(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer('127.0.0.1', config['port'], svc.app).serve_forever()
+
+
+def wait_for(proc, url, what, timeout=1.0):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            break
+        try:
+            httpx.get(url, timeout=timeout)
+            return proc
+        except httpx.TransportError:
+            time.sleep(0.2)
+    proc.kill()
+    raise RuntimeError(f"{what} did not start")
+
+
+def start_stub(port, latency, error_rate):
+    proc = subprocess.Popen([sys.executable, STUB, '--port', str(port), '--latency', str(latency),
+                             '--error-rate', str(error_rate)], stdout=subprocess.DEVNULL)
+    return wait_for(proc, f"http://127.0.0.1:{port}/album/1", "Deezer stub", timeout=latency + 1)
+
+
+def start_app(config, workdir, label):
+    """A fresh app process with its own (empty) Deezer response cache and search journal"""
+    env = dict(os.environ,
+               DEEZER_BASE_URL=config['stub_url'],
+               DEEZER_CACHE_PATH=os.path.join(workdir, f'deezer-cache-{label}.sqlite3'),
+               SEARCH_JOURNAL_PATH=os.path.join(workdir, f'search-{label}.journal'),
+               SEARCH_CACHE_URL='memory://')
+    log = open(os.path.join(workdir, f'app-{label}.log'), 'w')
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', json.dumps(config)],
+                            env=env, stdout=log, stderr=subprocess.STDOUT)
+    log.close()
+    return wait_for(proc, f"http://127.0.0.1:{config['port']}/api/ping", f"{config['mode']} server")
+
+
+def stop_process(proc):
+    proc.terminate()
+    try:
+        proc.wait(30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.wait()
+
+
+# --- Endpoints ----------------------------------------------------------------------
+
+class Catalog:
+    """The key spaces requests are drawn from; the same --seed gives the same requests"""
+
+    def __init__(self, args):
+        rng = random.Random(args.seed + 1)
+        self.album_ids = list(range(1, args.albums + 1))
+        rng.shuffle(self.album_ids)
+        self.upstream_every = round(1 / args.upstream_share) if args.upstream_share > 0 else 0
+
+    def album(self, n):
+        return self.album_ids[n % len(self.album_ids)]
+
+    def any_album(self, n):
+        """Catalog album, or every upstream_every-th request one only Deezer knows"""
+        if self.upstream_every and n % self.upstream_every == 0:
+            return UPSTREAM_ID_BASE + n
+        return self.album(n)
+
+    @staticmethod
+    def query(n):
+        first, second = WORDS[n % len(WORDS)], WORDS[(n // len(WORDS)) % len(WORDS)]
+        page = 1 + (n // len(WORDS) ** 2) % SEARCH_PAGES
+        return f"q={first}+{second}&page={page}"
+
+
+# name -> (needs a logged-in client, request for the n-th new key as (method, path, json body))
+ENDPOINTS = {
+    'search_albums': (False, lambda c, n: ('GET', f"/v1/search/albums?{c.query(n)}", None)),
+    'select_album': (False, lambda c, n: ('GET', f"/v1/albums/{c.any_album(n)}", None)),
+    'get_random_albums': (False, lambda c, n: ('GET', "/v1/albums/random?count=6", None)),
+    'rate_album': (True, lambda c, n: ('POST', f"/v1/albums/{c.album(n)}/rate", {'rating': 1 + n % 5})),
+    'get_user_rating': (True, lambda c, n: ('GET', f"/v1/albums/{c.album(n)}/rating", None)),
+    'get_rated_albums': (True, lambda c, n: ('GET', "/v1/me/rated-albums?limit=50", None)),
+}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1) if values else None
+
+
+async def login(client, user_id):
+    response = await client.post('/api/login', json={'username': f"bench_user_{user_id}",
+                                                     'password': BENCH_PASSWORD})
+    response.raise_for_status()
+
+
+async def drive(clients, histories, next_request, seconds):
+    """
+    Closed loop: each client sends its next request as soon as the previous
+    one is answered. Latencies are of 2xx responses; anything else counts
+    as an error, by status.
+    """
+    latencies = []
+    statuses = {}
+
+    async def worker(client, history):
+        while time.monotonic() < deadline:
+            method, path, body = next_request(history)
+            started = time.monotonic()
+            try:
+                response = await client.request(method, path, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError:
+                status = 'transport_error'
+            statuses[status] = statuses.get(status, 0) + 1
+            if status.startswith('2'):
+                latencies.append(time.monotonic() - started)
+                history.append((method, path, body))
+
+    started = time.monotonic()
+    deadline = started + seconds
+    await asyncio.gather(*(worker(client, history) for client, history in zip(clients, histories)))
+    elapsed = time.monotonic() - started
+    requests = sum(statuses.values())
+
+    return {
+        'requests': requests,
+        'errors': requests - len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'max_ms': round(max(latencies) * 1000, 1) if latencies else None,
+        'statuses': dict(sorted(statuses.items())),
+    }
+
+
+async def run_endpoint(name, base_url, catalog, args):
+    needs_login, make_request = ENDPOINTS[name]
+    clients = [httpx.AsyncClient(base_url=base_url, timeout=60) for _ in range(args.concurrency)]
+    try:
+        if needs_login:
+            await asyncio.gather(*(login(client, 1 + i % args.users) for i, client in enumerate(clients)))
+        counter = iter(range(sys.maxsize))
+        rng = random.Random(args.seed + 2)
+
+        def cold(history):
+            return make_request(catalog, next(counter))
+
+        def warm(history):
+            return rng.choice(history) if history else make_request(catalog, next(counter))
+
+        histories = [[] for _ in clients]
+        results = {'cold': await drive(clients, histories, cold, args.seconds)}
+        results['cold']['distinct_keys'] = len({request[:2] for history in histories for request in history})
+        histories = [list(history) for history in histories]
+        results['warm'] = await drive(clients, histories, warm, args.seconds)
+        return results
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+# --- Comparing runs ---------------------------------------------------------------------
+
+def compare(before_path, after_path, fail_over=None):
+    """Per endpoint and scenario: the metric in both runs and the change in percent"""
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+
+    def change(old, new):
+        return round((new - old) * 100 / old, 1) if old and new is not None else None
+
+    report = {'before': before_path, 'after': after_path, 'endpoints': {}}
+    regressions = []
+    for name, scenarios in after['endpoints'].items():
+        for scenario, new in scenarios.items():
+            old = before['endpoints'].get(name, {}).get(scenario)
+            if old is None:
+                continue
+            row = {}
+            for metric in ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'errors'):
+                row[metric] = {'before': old[metric], 'after': new[metric],
+                               'change_pct': change(old[metric], new[metric])}
+            report['endpoints'].setdefault(name, {})[scenario] = row
+            rps_change = row['rps']['change_pct']
+            worse = [row['p95_ms']['change_pct'], -rps_change if rps_change is not None else None]
+            if fail_over is not None and any(pct is not None and pct > fail_over for pct in worse):
+                regressions.append(f"{name}/{scenario}")
+    report['regressions'] = regressions
+    print(json.dumps(report, indent=2))
+    return 1 if regressions else 0
+
+
+# --- Main ---------------------------------------------------------------------------
+
+def run(args, workdir):
+    cluster = None
+    if args.dsn:
+        admin = parse_dsn(args.dsn)
+    else:
+        pg_bin = find_pg_bin(args.pg_bin)
+        if pg_bin is None:
+            raise SystemExit("No initdb found: pass --pg-bin, put PostgreSQL's bin directory on PATH, "
+                             "or use --dsn with an existing server")
+        cluster = DisposableCluster(pg_bin, args.pg_port, args.pg_os_user)
+        admin = cluster.start()
+
+    dbname = f"load_suite_{os.getpid()}"
+    stub = None
+    try:
+        admin_execute(admin, f'CREATE DATABASE "{dbname}"')
+        config = db_config(admin, dbname)
+        conn = admin_connection(config)
+        try:
+            local_search = load_schema(conn)
+            catalog_stats = generate_catalog(conn, args)
+        finally:
+            conn.close()
+
+        stub = start_stub(args.port + 1, args.latency, args.error_rate)
+        app_config = {
+            'db': config,
+            'local_search': local_search,
+            'deezer_rate': args.deezer_rate,
+            'mode': args.mode,
+            'threads': args.threads,
+            'port': args.port,
+            'stub_url': f"http://127.0.0.1:{args.port + 1}",
+        }
+        catalog = Catalog(args)
+        endpoints = {}
+        for name in args.endpoints:
+            proc = start_app(app_config, workdir, name)
+            try:
+                endpoints[name] = asyncio.run(run_endpoint(name, f"http://127.0.0.1:{args.port}", catalog, args))
+            finally:
+                stop_process(proc)
+        return catalog_stats, local_search, endpoints
+    finally:
+        if stub is not None:
+            stop_process(stub)
+        if cluster is not None:
+            cluster.stop()
+        else:
+            admin_execute(admin, f'DROP DATABASE IF EXISTS "{dbname}" WITH (FORCE)')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BENCH, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--endpoints', nargs='+', choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument('--mode', choices=['sync', 'async'], default='sync')
+    parser.add_argument('--seconds', type=float, default=5.0, help="per endpoint and scenario")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=16, help="request threads of the sync server")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every Deezer response")
+    parser.add_argument('--error-rate', type=float, default=0.01, help="fraction of Deezer responses that are 503")
+    parser.add_argument('--deezer-rate', type=float, default=0, help="Deezer calls per second, 0 = unlimited")
+    parser.add_argument('--albums', type=int, default=20000)
+    parser.add_argument('--tracks', type=int, default=10, help="tracks per album")
+    parser.add_argument('--incomplete-share', type=float, default=0.05,
+                        help="albums without tracks/cover/release date")
+    parser.add_argument('--upstream-share', type=float, default=0.2,
+                        help="cold select_album requests for albums not in the catalog")
+    parser.add_argument('--users', type=int, default=64)
+    parser.add_argument('--ratings-per-user', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--dsn', help="existing server to create the throwaway database on")
+    parser.add_argument('--pg-bin', help="directory with initdb and pg_ctl")
+    parser.add_argument('--pg-port', type=int, default=5499, help="port of the disposable cluster's socket")
+    parser.add_argument('--pg-os-user', default='postgres', help="user the cluster runs as when run as root")
+    parser.add_argument('--port', type=int, default=5057, help="app port; the stub uses the next one")
+    parser.add_argument('--out', help="also write the results to this file")
+    parser.add_argument('--keep-workdir', action='store_true', help="keep app logs and caches")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--fail-over', type=float,
+                        help="with --compare: exit 1 if any p95 rises or rps drops by more than this %%")
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(json.loads(args.serve))
+        return
+    if args.compare:
+        sys.exit(compare(*args.compare, fail_over=args.fail_over))
+
+    workdir = tempfile.mkdtemp(prefix='load-suite-')
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    try:
+        catalog_stats, local_search, endpoints = run(args, workdir)
+    finally:
+        if args.keep_workdir:
+            print(f"App logs and caches kept in {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    settings = {key: value for key, value in vars(args).items()
+                if key not in ('serve', 'compare', 'fail_over', 'out', 'keep_workdir', 'dsn')}
+    results = {
+        'started_at': started_at,
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'cpus': os.cpu_count(),
+        'settings': settings,
+        'local_search': local_search,
+        'catalog': catalog_stats,
+        'endpoints': endpoints,
+    }
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Login storm: /api/login throughput and the latency other endpoints see
+while it runs, with password hashing inline vs. in the process pool.
+
+Starts the app on a local threaded werkzeug server. User lookup is served
+from memory, so only hashing cost is measured. --login-threads clients
+log in continuously while one probe client times GET /api/health.
+
+    python bench_login_storm.py --seconds 5 --login-threads 16
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import external_api_service as service  # noqa: E402
+from password_hashing import PasswordHasher  # noqa: E402
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))], 3) if values else None
+
+
+def storm(base_url, seconds, login_threads):
+    stop = threading.Event()
+    logins = []
+    probes = []
+    lock = threading.Lock()
+
+    def login_loop():
+        session = requests.Session()
+        while not stop.is_set():
+            r = session.post(f"{base_url}/api/login", json={'username': 'bench', 'password': 'pw'})
+            with lock:
+                logins.append(r.status_code)
+
+    def probe_loop():
+        session = requests.Session()
+        while not stop.is_set():
+            started = time.perf_counter()
+            session.get(f"{base_url}/api/health")
+            probes.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=login_loop) for _ in range(login_threads)]
+    threads.append(threading.Thread(target=probe_loop))
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+    return {
+        'logins_per_second': round(sum(1 for s in logins if s == 200) / seconds, 2),
+        'login_errors': sum(1 for s in logins if s != 200),
+        'health_p50_ms': percentile(probes, 0.5),
+        'health_p99_ms': percentile(probes, 0.99),
+        'health_mean_ms': round(statistics.fmean(probes), 3) if probes else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--login-threads', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2, help="process pool size for the pooled run")
+    args = parser.parse_args()
+
+    pw_hash = PasswordHasher(service.PASSWORD_HASH_METHOD, workers=0).hash('pw')
+    row = {'user_id': 1, 'user_name': 'bench', 'user_password': pw_hash}
+    service.find_user_by_username = lambda username: service.UserObj(row)
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, service.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {'hash_method': service.PASSWORD_HASH_METHOD}
+    for label, workers in (('inline', 0), ('process_pool', args.workers)):
+        service.PASSWORD_HASHER = PasswordHasher(service.PASSWORD_HASH_METHOD, workers=workers, max_pending=256)
+        if workers:
+            service.PASSWORD_HASHER.verify(pw_hash, 'pw')   # start the worker processes
+        results[label] = storm(base_url, args.seconds, args.login_threads)
+        service.PASSWORD_HASHER.shutdown()
+
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
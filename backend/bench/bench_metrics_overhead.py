@@ -0,0 +1,194 @@
+"""
+Cost of the /api/metrics instrumentation.
+
+- hooks: ns per call of what each instrumented operation adds: the
+  OperationMetrics start()+finish() pair, an observed cursor execute()
+  (query naming, timing and the metrics update) against a no-op cursor,
+  and DeezerClient.record_call() with and without the observer
+- contention: finish() throughput with --threads threads recording at once
+- requests: Flask request latency with METRICS_ENABLED on and off, on
+  /api/ping (nothing but the hooks) and /v1/albums/<id> served from the
+  search cache, alternating runs so drift affects both equally (the album
+  route goes through the failed-DB fallback, so expect more noise there)
+- scrape: time to render /api/metrics with --routes routes' worth of series
+
+No database or Deezer is needed.
+
+    python bench_metrics_overhead.py --requests 5000 --threads 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+
+def ns_per_call(fn, n):
+    started = time.perf_counter_ns()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter_ns() - started) / n
+
+
+def bench_hooks(n):
+    from db_pool import _observed_cursor
+    from deezer_client import DeezerClient
+    from metrics import OperationMetrics
+
+    ops = OperationMetrics('bench_op', 'Bench operations', 'bench_ops_in_flight', ('name',))
+
+    def start_finish():
+        ops.start()
+        ops.finish(('load_album',), 0.0042, True)
+
+    class Connection:
+        observer = ops
+
+    class NoopCursor:
+        connection = Connection()
+
+        def execute(self, query, vars=None):
+            pass
+
+        def executemany(self, query, vars_list):
+            pass
+
+    plain = NoopCursor()
+    observed = _observed_cursor(NoopCursor)()
+
+    def load_album():   # the query label comes from the calling function's name
+        observed.execute("SELECT 1")
+
+    client = DeezerClient(rate_per_second=0, cache=None)
+    observed_client = DeezerClient(rate_per_second=0, cache=None, observer=ops)
+
+    def observed_call():
+        observed_client.call_started()
+        observed_client.record_call('album/{id}', 0.12, True, 0)
+
+    baseline = ns_per_call(lambda: plain.execute("SELECT 1"), n)
+    return {
+        'start_finish_ns': round(ns_per_call(start_finish, n)),
+        'cursor_execute_plain_ns': round(baseline),
+        'cursor_execute_observed_ns': round(ns_per_call(load_album, n)),
+        'deezer_record_call_ns': round(ns_per_call(lambda: client.record_call('album/{id}', 0.12, True, 0), n)),
+        'deezer_record_call_observed_ns': round(ns_per_call(observed_call, n)),
+    }
+
+
+def bench_contention(threads, n):
+    from metrics import OperationMetrics
+
+    ops = OperationMetrics('bench_op', 'Bench operations', 'bench_ops_in_flight', ('name',))
+    labels = [(f"route{i}",) for i in range(8)]
+
+    def worker(k):
+        for i in range(n):
+            ops.start()
+            ops.finish(labels[(i + k) % 8], 0.003, True)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(k,)) for k in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return {'threads': threads, 'operations_per_second': round(threads * n / elapsed)}
+
+
+def bench_requests(n, rounds):
+    import external_api_service as svc
+
+    def no_db():
+        raise ConnectionError("database disabled for benchmark")
+
+    svc.get_db_connection = no_db
+    svc.PREFETCH_ENABLED = False
+    svc.SESSION_CACHE.store('bench:1', [{
+        'deezer_id': '424242', 'title': 'Bench', 'artist_name': 'Bench', 'artist_id': '1',
+        'cover_url': 'https://cdn.example.com/1.jpg', 'release_date': '2020-01-01',
+        'tracks': [{'id': 1, 'title': 'Track', 'track_position': 1}],
+    }])
+    client = svc.app.test_client()
+    # the album route prints its DB fallback on every request
+    devnull = open(os.devnull, 'w')
+
+    def timed(path):
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            started = time.perf_counter()
+            for _ in range(n):
+                client.get(path)
+            return (time.perf_counter() - started) * 1e6 / n
+        finally:
+            sys.stdout = stdout
+
+    results = {}
+    for name, path in (('ping', '/api/ping'), ('album_from_search_cache', '/v1/albums/424242')):
+        timings = {True: [], False: []}
+        timed(path)     # warm up
+        for _ in range(rounds):
+            for enabled in (False, True):
+                svc.METRICS_ENABLED = enabled
+                timings[enabled].append(timed(path))
+        off = statistics.median(timings[False])
+        on = statistics.median(timings[True])
+        results[name] = {
+            'us_per_request_metrics_off': round(off, 1),
+            'us_per_request_metrics_on': round(on, 1),
+            'overhead_us': round(on - off, 1),
+            'overhead_pct': round((on - off) * 100 / off, 1),
+        }
+    svc.METRICS_ENABLED = True
+    svc.SESSION_CACHE.clear()     # nothing for the exit flush to save
+    return results
+
+
+def bench_scrape(routes, n):
+    from metrics import MetricsRegistry
+
+    registry = MetricsRegistry()
+    http = registry.operation('http_request', 'HTTP requests', 'http_requests_in_flight', ('method', 'route'))
+    responses = registry.counter('http_responses_total', 'HTTP responses', ('method', 'route', 'status'))
+    db = registry.operation('db_query', 'Database queries', 'db_queries_in_flight', ('query',))
+    for i in range(routes):
+        for method in ('GET', 'POST'):
+            http.start()
+            http.finish((method, f"/v1/route{i}/<id>"), 0.01 * (i % 7), i % 5 != 0)
+            responses.inc((method, f"/v1/route{i}/<id>", 200))
+        db.start()
+        db.finish((f"query_{i}",), 0.002, True)
+    body = registry.render()
+    return {
+        'series': sum(1 for line in body.splitlines() if not line.startswith('#')),
+        'bytes': len(body),
+        'render_ms': round(ns_per_call(registry.render, n) / 1e6, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--calls', type=int, default=200000, help="iterations per hook micro-benchmark")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=3000, help="requests per timed run")
+    parser.add_argument('--rounds', type=int, default=5, help="alternating on/off runs per route")
+    parser.add_argument('--routes', type=int, default=40, help="routes in the scrape benchmark")
+    args = parser.parse_args()
+
+    results = {
+        'hooks': bench_hooks(args.calls),
+        'contention': bench_contention(args.threads, args.calls // args.threads),
+        'requests': bench_requests(args.requests, args.rounds),
+        'scrape': bench_scrape(args.routes, 200),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Random-album sampling at catalog sizes of 100k and 1M albums.
+
+Always measures the in-memory AlbumIdSampler (id load time, memory, and
+sample latency for the home page's count=6). With --dsn it also loads a
+scratch table with that many albums in a temporary schema and compares
+ORDER BY RANDOM() LIMIT n against the id-array + ANY() lookup that
+get_random_albums now uses.
+
+    python bench_random_albums.py
+    python bench_random_albums.py --dsn "dbname=bench user=postgres host=127.0.0.1"
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from random_sampler import AlbumIdSampler  # noqa: E402
+
+
+def timed(fn, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {'p50_ms': round(statistics.median(timings), 4), 'max_ms': round(max(timings), 4)}
+
+
+def bench_sampler(size, count, runs):
+    sampler = AlbumIdSampler(lambda: range(1, size + 1))
+    started = time.perf_counter()
+    sampler.refresh()
+    load_ms = (time.perf_counter() - started) * 1000
+    return {
+        'load_ids_ms': round(load_ms, 2),
+        'id_array_bytes': sampler._ids.itemsize * len(sampler._ids),
+        'sample': timed(lambda: sampler.sample(count), runs),
+    }
+
+
+def bench_postgres(dsn, size, count, runs):
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    conn.autocommit = True
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA IF EXISTS bench_random CASCADE")
+        cur.execute("CREATE SCHEMA bench_random")
+        cur.execute("SET search_path TO bench_random")
+        cur.execute("CREATE TABLE author (author_id bigint PRIMARY KEY, author_name text NOT NULL)")
+        cur.execute("""
+            CREATE TABLE album (album_id bigint PRIMARY KEY, author_id bigint NOT NULL,
+                                album_name text NOT NULL, cover_url varchar(500))
+        """)
+        cur.execute("INSERT INTO author SELECT g, 'Artist ' || g FROM generate_series(1, 1000) g")
+        cur.execute("""
+            INSERT INTO album
+            SELECT g, 1 + g %% 1000, 'Album ' || g, 'https://example.invalid/' || g
+            FROM generate_series(1, %s) g
+        """, (size,))
+        cur.execute("ANALYZE")
+
+        def order_by_random():
+            cur.execute("""
+                SELECT a.album_id, a.album_name, au.author_name, a.cover_url
+                FROM album a JOIN author au ON a.author_id = au.author_id
+                ORDER BY RANDOM() LIMIT %s
+            """, (count,))
+            cur.fetchall()
+
+        def load_ids():
+            with conn.cursor() as id_cur:
+                id_cur.execute("SELECT album_id FROM album")
+                return [row[0] for row in id_cur]
+
+        sampler = AlbumIdSampler(load_ids)
+        started = time.perf_counter()
+        sampler.refresh()
+        load_ms = (time.perf_counter() - started) * 1000
+
+        def sampled():
+            cur.execute("""
+                SELECT a.album_id, a.album_name, au.author_name, a.cover_url
+                FROM album a JOIN author au ON a.author_id = au.author_id
+                WHERE a.album_id = ANY(%s)
+            """, (sampler.sample(count),))
+            cur.fetchall()
+
+        result = {
+            'order_by_random': timed(order_by_random, runs),
+            'id_array_any': timed(sampled, runs),
+            'id_refresh_ms': round(load_ms, 2),
+        }
+        cur.execute("DROP SCHEMA bench_random CASCADE")
+    conn.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100000,1000000')
+    parser.add_argument('--count', type=int, default=6)
+    parser.add_argument('--runs', type=int, default=50)
+    parser.add_argument('--dsn', help="PostgreSQL DSN for the SQL comparison (scratch schema is dropped after)")
+    args = parser.parse_args()
+
+    results = {}
+    for size in (int(s) for s in args.sizes.split(',')):
+        results[size] = {'sampler': bench_sampler(size, args.count, args.runs)}
+        if args.dsn:
+            results[size]['postgres'] = bench_postgres(args.dsn, size, args.count, min(args.runs, 20))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+"""
+Cross-worker hit rate of the search cache backends (SEARCH_CACHE_URL).
+
+Starts --workers copies of the app as separate processes, as under
+gunicorn -w N, all pointed at the local Deezer stub with the database
+treated as unavailable. Then it replays the search -> album click flow with
+each click landing on a different worker than its search (round robin
+behind a load balancer). Per backend it reports the share of clicks that
+found the album in the search cache, Deezer requests per click and click
+latency. The search prefetch stays on, so with a shared backend the
+searching worker's prefetch also completes the entry the clicked worker reads.
+
+Redis: --redis-url, or a local fakeredis TCP server when fakeredis is
+installed and no URL is given.
+
+    python bench_shared_search_cache.py --workers 4 --searches 100 --latency 0.05
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import httpx
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+sys.path.insert(0, SRC)
+
+from deezer_stub import DeezerStub  # noqa: E402
+
+
+def serve(port, stub_url):
+    """Child process: one app worker; SEARCH_CACHE_URL comes from the environment"""
+    sys.stdout = open(os.devnull, 'w')
+    sys.stderr = open(os.devnull, 'w')
+
+    import external_api_service as svc
+    from deezer_client import DeezerClient
+    from werkzeug.serving import make_server
+
+    def no_db():
+        raise ConnectionError("database disabled for benchmark")
+
+    # no Deezer response cache: its SQLite file would be shared by the workers too
+    svc.set_deezer_client(DeezerClient(base_url=stub_url, rate_per_second=0, cache=None))
+    svc.get_db_connection = no_db
+    svc.save_albums_to_db = lambda albums: [int(album['deezer_id']) for album in albums]
+    # every simulated user comes from 127.0.0.1; don't let one budget cover them all
+    svc.ALBUM_PREFETCH.user_budget = 10 ** 6
+    make_server('127.0.0.1', port, svc.app, threaded=True).serve_forever()
+
+
+def start_workers(count, base_port, stub_url, cache_url):
+    env = dict(os.environ, SEARCH_CACHE_URL=cache_url)
+    procs = [
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve',
+                          '--port', str(base_port + n), '--stub-url', stub_url], env=env)
+        for n in range(count)
+    ]
+    deadline = time.monotonic() + 30
+    for n in range(count):
+        while True:
+            try:
+                httpx.get(f"http://127.0.0.1:{base_port + n}/api/ping", timeout=1)
+                break
+            except httpx.TransportError:
+                if time.monotonic() > deadline:
+                    stop_workers(procs)
+                    raise RuntimeError("workers did not start")
+                time.sleep(0.2)
+    return procs
+
+
+def stop_workers(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        proc.wait(10)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * q))] * 1000, 1) if values else None
+
+
+def run_backend(cache_url, stub, args):
+    procs = start_workers(args.workers, args.port, stub.base_url, cache_url)
+    try:
+        urls = [f"http://127.0.0.1:{args.port + n}" for n in range(args.workers)]
+        click_latencies = []
+        deezer_calls = 0
+        with httpx.Client(timeout=30) as client:
+            for i in range(args.searches):
+                search = client.get(f"{urls[i % len(urls)]}/v1/search/albums",
+                                    params={'q': f"bench {cache_url} {i}"}).json()
+                time.sleep(args.think)      # the user reads the results; prefetch runs meanwhile
+
+                album_id = search['results'][0]['deezer_id']
+                before = stub.requests
+                started = time.monotonic()
+                client.get(f"{urls[(i + 1) % len(urls)]}/v1/albums/{album_id}").raise_for_status()
+                click_latencies.append(time.monotonic() - started)
+                deezer_calls += stub.requests - before
+
+            caches = [client.get(f"{url}/api/stats").json()['search_cache'] for url in urls]
+    finally:
+        stop_workers(procs)
+
+    hits = sum(cache['hits'] for cache in caches)
+    lookups = hits + sum(cache['misses'] for cache in caches)
+    return {
+        'clicks': args.searches,
+        'cache_lookups': lookups,
+        'cross_worker_hit_rate': round(hits / lookups, 3) if lookups else None,
+        'deezer_requests_per_click': round(deezer_calls / args.searches, 2),
+        'click_p50_ms': percentile(click_latencies, 0.50),
+        'click_p95_ms': percentile(click_latencies, 0.95),
+    }
+
+
+def local_redis_url(port):
+    """Start a fakeredis TCP server in this process; None if fakeredis isn't installed"""
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        return None
+
+    class Server(TcpFakeServer):
+        daemon_threads = True
+
+        def get_request(self):
+            # as real Redis does; without it every pipelined reply waits out a delayed ACK
+            sock, address = super().get_request()
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            return sock, address
+
+    server = Server(('127.0.0.1', port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"redis://127.0.0.1:{port}/0"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--searches', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds added to every Deezer response")
+    parser.add_argument('--think', type=float, default=0.3, help="seconds between a search and its click")
+    parser.add_argument('--redis-url', help="Redis-protocol server to use (its search-cache:* keys are cleared)")
+    parser.add_argument('--port', type=int, default=5070)
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--stub-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.stub_url)
+        return
+
+    from search_cache import create_search_cache
+
+    tmpdir = tempfile.mkdtemp(prefix='search-cache-bench-')
+    backends = {
+        'memory': 'memory://',
+        'sqlite': 'sqlite:///' + os.path.join(tmpdir, 'search_cache.sqlite3'),
+    }
+    redis_url = args.redis_url or local_redis_url(args.port + args.workers)
+    if redis_url:
+        backends['redis'] = redis_url
+
+    results = {'workers': args.workers, 'latency_s': args.latency, 'think_s': args.think, 'backends': {}}
+    with DeezerStub(latency=args.latency) as stub:
+        for name, url in backends.items():
+            if name != 'memory':
+                create_search_cache(url, ttl_seconds=60).clear()
+            results['backends'][name] = run_backend(url, stub, args)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Per-request cost of flask-login's user_loader with and without USER_CACHE.
+
+Drives GET /api/me as a logged-in user through Flask's test client. With
+--dsn the lookups hit a real database (pass an existing --user-id);
+without it, each app_user query is replaced by a fake connection that
+sleeps --simulated-query-ms, which stands in for one pooled round trip.
+
+    python bench_user_loader.py --requests 2000
+    python bench_user_loader.py --dsn "dbname=capstonemusic user=cambender host=127.0.0.1" --user-id 1
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import external_api_service as service  # noqa: E402
+
+
+class _FakeCursor:
+    def __init__(self, delay, user_id):
+        self.delay = delay
+        self.user_id = user_id
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        time.sleep(self.delay)
+
+    def fetchone(self):
+        return {'user_id': self.user_id, 'user_name': 'bench', 'user_password': 'x'}
+
+
+class _FakeConnection:
+    def __init__(self, delay, user_id):
+        self.delay = delay
+        self.user_id = user_id
+
+    def cursor(self, **kwargs):
+        return _FakeCursor(self.delay, self.user_id)
+
+    def close(self):
+        pass
+
+
+def run(client, requests):
+    timings = []
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = client.get('/api/me')
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.json['authenticated'], response.json
+    timings.sort()
+    return {
+        'requests': requests,
+        'mean_ms': round(statistics.fmean(timings), 4),
+        'p50_ms': round(timings[len(timings) // 2], 4),
+        'p99_ms': round(timings[int(len(timings) * 0.99) - 1], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--dsn')
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--simulated-query-ms', type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.dsn:
+        service.DB_CONFIG = {'dsn': args.dsn}
+    else:
+        delay = args.simulated_query_ms / 1000
+        service.get_db_connection = lambda: _FakeConnection(delay, args.user_id)
+
+    client = service.app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = str(args.user_id)
+        sess['_fresh'] = True
+
+    ttl = service.USER_CACHE.ttl_seconds
+    service.USER_CACHE.ttl_seconds = 0
+    without_cache = run(client, args.requests)
+    service.USER_CACHE.ttl_seconds = ttl
+    service.USER_CACHE.clear()
+    with_cache = run(client, args.requests)
+
+    print(json.dumps({
+        'backend': 'postgres' if args.dsn else f"simulated {args.simulated_query_ms} ms query",
+        'without_user_cache': without_cache,
+        'with_user_cache': with_cache,
+        'user_cache': service.USER_CACHE.stats(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
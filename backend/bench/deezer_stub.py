@@ -0,0 +1,184 @@
+"""
+Local stand-in for the Deezer API used by the benchmarks.
+
+Serves /search/album, /album/<id> and /album/<id>/tracks with generated,
+deterministic data. Every response is delayed by `latency` seconds and a
+fraction `error_rate` of requests answer 503.
+
+    python deezer_stub.py --port 8081 --latency 0.1
+    DEEZER_BASE_URL=http://127.0.0.1:8081 python ../src/external_api_service.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import socket
+import threading
+import zlib
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_album(album_id):
+    album_id = int(album_id)
+    artist_id = 1000 + album_id % 997
+    return {
+        'id': album_id,
+        'title': f"Album {album_id}",
+        'artist': {'id': artist_id, 'name': f"Artist {artist_id}"},
+        'cover_medium': f"https://example.invalid/cover/{album_id}.jpg",
+        'release_date': f"{1970 + album_id % 50}-01-01",
+        'genre_id': album_id % 20,
+    }
+
+
+def fake_tracks(album_id, count=12):
+    album_id = int(album_id)
+    return {'data': [
+        {
+            'id': album_id * 100 + n,
+            'title': f"Track {n}",
+            'duration': 180 + n,
+            'track_position': n,
+        }
+        for n in range(1, count + 1)
+    ]}
+
+
+def fake_search(query, index, limit, total=100):
+    seed = zlib.crc32(query.encode('utf-8')) % 1_000_000 * 1000
+    ids = range(seed + index, seed + min(index + limit, total))
+    return {'data': [fake_album(i) for i in ids], 'total': total}
+
+
+class DeezerStub:
+    """
+    Stub server on an asyncio loop in a background thread, so each slow
+    request is a sleeping task rather than a thread and a few hundred
+    concurrent callers don't make the stub the bottleneck of a benchmark.
+    Use as a context manager or call start()/stop().
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self._sock = socket.create_server((host, port), backlog=1024)
+        self._loop = None
+        self._stopping = None
+        self._writers = set()
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def _route(self, path, query):
+        m = re.fullmatch(r'/album/(\d+)/tracks', path)
+        if m:
+            return fake_tracks(m.group(1))
+        m = re.fullmatch(r'/album/(\d+)', path)
+        if m:
+            return fake_album(m.group(1))
+        if path == '/search/album':
+            q = query.get('q', [''])[0]
+            index = int(query.get('index', ['0'])[0])
+            limit = int(query.get('limit', ['25'])[0])
+            return fake_search(q, index, limit)
+        return None
+
+    async def _handle(self, target):
+        with self._lock:
+            self.requests += 1
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        url = urlparse(target)
+        body = None if fail else self._route(url.path, parse_qs(url.query))
+        status = 503 if fail else (200 if body is not None else 404)
+        payload = json.dumps(body if body is not None else {'error': {'code': 800, 'message': 'no data'}}).encode()
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\n\r\n")
+        return head.encode('latin-1') + payload
+
+    async def _connection(self, reader, writer):
+        """Keep-alive connection: GET requests only, so there's never a body to read"""
+        self._writers.add(writer)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                parts = request_line.decode('latin-1').split()
+                writer.write(await self._handle(parts[1] if len(parts) > 1 else '/'))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _serve(self, ready):
+        self._stopping = asyncio.Event()
+        server = await asyncio.start_server(self._connection, sock=self._sock)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await self._stopping.wait()
+            # idle keep-alive connections are still waiting for their next request
+            for writer in list(self._writers):
+                writer.close()
+            while self._writers:
+                await asyncio.sleep(0.01)
+
+    def serve_forever(self, ready=None):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve(ready))
+        finally:
+            self._loop.close()
+
+    def start(self):
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self.serve_forever, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._stopping.set)
+        self._thread.join()
+        self._sock.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="fraction of requests that return 503")
+    args = parser.parse_args()
+
+    stub = DeezerStub(args.host, args.port, args.latency, args.error_rate)
+    print(f"Deezer stub listening on {stub.base_url}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,100 @@
+"""
+EXPLAIN check for the hot queries (DB/migrations/001_album_search_index.sql,
+002_user_list_keys.sql, 004_user_list_pagination.sql).
+
+Runs EXPLAIN on each query with sequential scans disabled, so the planner
+picks an index whenever one exists regardless of table size, and fails if
+any plan still has a Seq Scan on the table the query is supposed to hit
+through an index. Nothing is written; upserts are explained inside a
+transaction that is rolled back. The paginated list queries are checked
+as a first page and as a page after a cursor. The SQL is imported from
+external_api_service, so the check follows the service's queries.
+
+    python explain_hot_queries.py --dsn "dbname=capstonemusic user=postgres host=127.0.0.1"
+
+Exit status is 1 if any query regressed, so it can run in CI after migrations.
+"""
+import argparse
+import json
+import os
+import sys
+
+import psycopg2
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import external_api_service as svc  # noqa: E402
+
+# (name, table that must not be seq-scanned, sql)
+HOT_QUERIES = [
+    ("local_search", "album", svc.LOCAL_SEARCH_SQL),
+    ("add_album", "want_to_listen", svc.ADD_TO_LIST_SQL),
+    ("remove_album", "want_to_listen", svc.REMOVE_FROM_LIST_SQL),
+    ("get_my_albums", "want_to_listen", svc.my_albums_sql()),
+    ("get_my_albums_first_page", "want_to_listen", svc.my_albums_sql(paged=True)),
+    ("get_my_albums_after_cursor", "want_to_listen", svc.my_albums_sql(after=True, paged=True)),
+    ("rate_album", "user_rating", svc.SAVE_RATING_SQL),
+    ("get_user_rating", "user_rating", svc.USER_RATING_SQL),
+    ("get_rated_albums", "user_rating", svc.rated_albums_sql()),
+    ("get_rated_albums_first_page", "user_rating", svc.rated_albums_sql(paged=True)),
+    ("get_rated_albums_after_cursor", "user_rating", svc.rated_albums_sql(after=True, paged=True)),
+    ("remove_rating", "user_rating", svc.REMOVE_RATING_SQL),
+    ("select_album", "album", svc.ALBUM_DETAIL_SQL),
+    ("select_album_tracks", "song", svc.ALBUM_TRACKS_SQL),
+    ("find_user_by_username", "app_user", svc.FIND_USER_BY_USERNAME_SQL),
+]
+
+
+def seq_scanned_tables(plan):
+    """Relation names of every Seq Scan node in a JSON plan"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan.get('Relation Name'))
+    for child in plan.get('Plans', []):
+        found.extend(seq_scanned_tables(child))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--dsn', required=True)
+    parser.add_argument('--schema', default='music')
+    args = parser.parse_args()
+
+    params = {'user_id': 1, 'album_id': 1, 'user_name': 'bench', 'rating': 4,
+              'after_name': 'M', 'after_id': 1, 'after_rating': 3.5,
+              **svc.local_search_params('bench', 1, 5)}
+    params['limit'] = 51
+    conn = psycopg2.connect(args.dsn)
+    results = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET search_path TO %s, public" % args.schema)
+            cur.execute("SET enable_seqscan = off")
+            for name, table, sql in HOT_QUERIES:
+                cur.execute("SAVEPOINT explain")
+                try:
+                    cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                except psycopg2.Error as e:     # e.g. similarity() without migration 001
+                    cur.execute("ROLLBACK TO SAVEPOINT explain")
+                    results.append({'query': name, 'table': table, 'ok': False,
+                                    'error': str(e).strip()})
+                    continue
+                plan = cur.fetchone()[0][0]['Plan']
+                scanned = seq_scanned_tables(plan)
+                results.append({
+                    'query': name,
+                    'table': table,
+                    'ok': table not in scanned,
+                    'seq_scans': scanned,
+                })
+        conn.rollback()
+    finally:
+        conn.close()
+
+    print(json.dumps(results, indent=2))
+    return 0 if all(r['ok'] for r in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AlbumBackfillWorker:
+    """
+    Background job that fills in missing album metadata (cover_url,
+    release_date) from Deezer, so request handlers never wait on it.
+
+    Work comes from two places:
+    - enqueue(ids): albums a handler just served with missing data
+    - a periodic scan: find_missing(after_id, limit) pages through every
+      incomplete album in the table (ascending album_id > after_id), every
+      scan_interval seconds
+
+    Each batch is fetched with fetch(album_id) on `workers` threads and
+    written back with one write_updates(rows) call, where rows are
+    (album_id, cover_url, release_date). After an attempt an album waits
+    retry_after seconds (three scans by default) before the next one,
+    doubling with every attempt up to max_retry_after: an album still incomplete afterwards (Deezer has no
+    cover for it, or doesn't know it) is skipped by the following scans and
+    home page loads instead of being refetched on each of them.
+    """
+
+    def __init__(self, fetch, find_missing, write_updates, workers=4, batch_size=50,
+                 scan_interval=600, retry_after=None, max_retry_after=7 * 24 * 3600,
+                 max_queue=5000):
+        self.fetch = fetch
+        self.find_missing = find_missing
+        self.write_updates = write_updates
+        self.workers = workers
+        self.batch_size = batch_size
+        self.scan_interval = scan_interval
+        self.retry_after = 3 * scan_interval if retry_after is None else retry_after
+        self.max_retry_after = max_retry_after
+        self.max_queue = max_queue
+
+        self._cond = threading.Condition()
+        self._queue = {}            # album_id -> None, insertion ordered
+        self._attempted = {}        # album_id -> (monotonic time it may be retried, attempts)
+        self._thread = None
+        self._stopping = False
+        self._scan_after_id = None  # None = no scan running
+        self._next_scan_at = 0.0
+
+        self._enqueued = 0
+        self._fetched = 0
+        self._updated = 0
+        self._fetch_errors = 0
+        self._write_errors = 0
+        self._skipped_backoff = 0
+        self._batches = 0
+        self._scans_completed = 0
+        self._last_batch_ms = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="album-backfill", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _backing_off(self, album_id, now):
+        """Whether album_id was attempted and isn't due for a retry yet; caller holds the lock"""
+        attempt = self._attempted.get(album_id)
+        if attempt is None or now >= attempt[0]:
+            return False
+        self._skipped_backoff += 1
+        return True
+
+    def enqueue(self, album_ids):
+        """Queue albums for backfill; never blocks, ignores recent attempts and overflow"""
+        self.start()
+        now = time.monotonic()
+        with self._cond:
+            for album_id in album_ids:
+                album_id = int(album_id)
+                if self._backing_off(album_id, now):
+                    continue
+                if album_id in self._queue or len(self._queue) >= self.max_queue:
+                    continue
+                self._queue[album_id] = None
+                self._enqueued += 1
+            self._cond.notify_all()
+
+    def _next_batch(self):
+        """Queued ids first; otherwise the next page of the table scan (if one is due)"""
+        now = time.monotonic()
+        with self._cond:
+            if self._queue:
+                ids = list(self._queue)[:self.batch_size]
+                for album_id in ids:
+                    del self._queue[album_id]
+                return ids
+            if self._scan_after_id is None:
+                if now < self._next_scan_at:
+                    return []
+                self._scan_after_id = 0
+            after_id = self._scan_after_id
+
+        ids = list(self.find_missing(after_id, self.batch_size))
+        with self._cond:
+            if len(ids) < self.batch_size:
+                self._scan_after_id = None
+                self._next_scan_at = time.monotonic() + self.scan_interval
+                self._scans_completed += 1
+            else:
+                self._scan_after_id = ids[-1]
+            return [album_id for album_id in ids if not self._backing_off(album_id, now)]
+
+    def _fetch_one(self, album_id):
+        try:
+            data = self.fetch(album_id)
+            return album_id, data.get('cover_medium') or None, data.get('release_date') or None
+        except Exception as e:
+            print(f"Error backfilling album {album_id}: {e}")
+            return None
+
+    def _process(self, executor, ids):
+        started = time.monotonic()
+        with self._cond:
+            for album_id in ids:
+                _, attempts = self._attempted.get(album_id, (0.0, 0))
+                backoff = min(self.retry_after * 2 ** min(attempts, 32), self.max_retry_after)
+                self._attempted[album_id] = (started + backoff, attempts + 1)
+            # Forget albums due for a retry a full scan ago: no scan found
+            # them incomplete since, so the map doesn't grow forever
+            if len(self._attempted) > 4 * self.max_queue:
+                cutoff = started - max(self.scan_interval, self.retry_after)
+                self._attempted = {k: a for k, a in self._attempted.items() if a[0] >= cutoff}
+
+        results = list(executor.map(self._fetch_one, ids))
+        rows = [row for row in results if row is not None and (row[1] or row[2])]
+        fetch_errors = sum(1 for row in results if row is None)
+
+        write_error = False
+        if rows:
+            try:
+                self.write_updates(rows)
+            except Exception as e:
+                write_error = True
+                print(f"Error writing album backfill batch: {e}")
+
+        with self._cond:
+            self._batches += 1
+            self._fetched += len(ids) - fetch_errors
+            self._fetch_errors += fetch_errors
+            if write_error:
+                self._write_errors += 1
+            else:
+                self._updated += len(rows)
+            self._last_batch_ms = (time.monotonic() - started) * 1000
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="album-backfill-fetch") as executor:
+            while True:
+                with self._cond:
+                    if self._stopping:
+                        return
+                try:
+                    ids = self._next_batch()
+                except Exception as e:
+                    print(f"Error scanning for albums to backfill: {e}")
+                    with self._cond:
+                        self._scan_after_id = None
+                        self._next_scan_at = time.monotonic() + self.scan_interval
+                    ids = []
+
+                if ids:
+                    self._process(executor, ids)
+                    continue
+
+                with self._cond:
+                    if not self._queue and not self._stopping and self._scan_after_id is None:
+                        wait = self._next_scan_at - time.monotonic()
+                        if wait > 0:
+                            self._cond.wait(wait)
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._queue),
+                'scan_in_progress': self._scan_after_id is not None,
+                'scan_position': self._scan_after_id,
+                'scans_completed': self._scans_completed,
+                'enqueued': self._enqueued,
+                'fetched': self._fetched,
+                'updated': self._updated,
+                'fetch_errors': self._fetch_errors,
+                'write_errors': self._write_errors,
+                'skipped_backoff': self._skipped_backoff,
+                'batches': self._batches,
+                'last_batch_ms': round(self._last_batch_ms, 3),
+            }
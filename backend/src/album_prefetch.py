@@ -0,0 +1,139 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AlbumPrefetcher:
+    """
+    Speculatively loads full album details for the top search results in the
+    background, so the detail page the user clicks next is already local.
+
+    - schedule(user_key, album_ids) queues the first top_n ids
+    - at most `workers` loads run at once; at most max_pending may wait
+    - each user_key gets user_budget prefetches per budget_window seconds
+    - admit(), if given, is asked right before each load; a False skips it
+      (e.g. to leave the upstream rate budget to user requests)
+    - record_request(album_id) is called by the album-detail route; a
+      request for an album we prefetched counts as a hit, which gives the
+      hit rate of prefetched entries
+    """
+
+    def __init__(self, load, top_n=3, workers=4, user_budget=30, budget_window=60,
+                 max_pending=100, remember=5000, admit=None):
+        self.load = load
+        self.admit = admit
+        self.top_n = top_n
+        self.workers = workers
+        self.user_budget = user_budget
+        self.budget_window = budget_window
+        self.max_pending = max_pending
+        self.remember = remember
+
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+        self._prefetched = OrderedDict()    # album_id -> monotonic time loaded
+        self._budgets = {}                  # user_key -> [window_start, used]
+
+        self._scheduled = 0
+        self._completed = 0
+        self._errors = 0
+        self._skipped_budget = 0
+        self._skipped_busy = 0
+        self._skipped_admit = 0
+        self._hits = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="album-prefetch")
+        return self._executor
+
+    def _take_budget(self, user_key, wanted, now):
+        """How many of `wanted` prefetches user_key may still spend; caller holds the lock"""
+        window = self._budgets.get(user_key)
+        if window is None or now - window[0] >= self.budget_window:
+            if len(self._budgets) > 10000:
+                self._budgets = {k: w for k, w in self._budgets.items()
+                                 if now - w[0] < self.budget_window}
+            window = self._budgets[user_key] = [now, 0]
+        allowed = max(0, min(wanted, self.user_budget - window[1]))
+        window[1] += allowed
+        return allowed
+
+    def schedule(self, user_key, album_ids):
+        """Queue background loads for the top results; returns how many were queued"""
+        now = time.monotonic()
+        with self._lock:
+            candidates = []
+            for album_id in album_ids[:self.top_n]:
+                album_id = str(album_id)
+                if album_id in self._pending or album_id in self._prefetched:
+                    continue
+                candidates.append(album_id)
+
+            room = max(0, self.max_pending - len(self._pending))
+            wanted = min(len(candidates), room)
+            allowed = self._take_budget(user_key, wanted, now) if wanted else 0
+            self._skipped_busy += len(candidates) - wanted
+            self._skipped_budget += wanted - allowed
+            to_load = candidates[:allowed]
+            self._pending.update(to_load)
+            self._scheduled += len(to_load)
+            executor = self._get_executor() if to_load else None
+
+        for album_id in to_load:
+            executor.submit(self._run, album_id)
+        return len(to_load)
+
+    def _run(self, album_id):
+        if self.admit is not None and not self.admit():
+            with self._lock:
+                self._pending.discard(album_id)
+                self._skipped_admit += 1
+            return
+        try:
+            self.load(album_id)
+        except Exception as e:
+            print(f"Error prefetching album {album_id}: {e}")
+            with self._lock:
+                self._pending.discard(album_id)
+                self._errors += 1
+            return
+
+        with self._lock:
+            self._pending.discard(album_id)
+            self._completed += 1
+            self._prefetched[album_id] = time.monotonic()
+            while len(self._prefetched) > self.remember:
+                self._prefetched.popitem(last=False)
+
+    def record_request(self, album_id):
+        """Album-detail request seen; returns True if it was served by a prefetch"""
+        with self._lock:
+            if self._prefetched.pop(str(album_id), None) is None:
+                return False
+            self._hits += 1
+            return True
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'top_n': self.top_n,
+                'workers': self.workers,
+                'pending': len(self._pending),
+                'scheduled': self._scheduled,
+                'completed': self._completed,
+                'errors': self._errors,
+                'skipped_budget': self._skipped_budget,
+                'skipped_busy': self._skipped_busy,
+                'skipped_admit': self._skipped_admit,
+                'hits': self._hits,
+                'hit_rate': round(self._hits / self._completed, 4) if self._completed else 0.0,
+            }
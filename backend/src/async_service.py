@@ -0,0 +1,476 @@
+"""
+Async serving mode.
+
+    uvicorn async_service:app --host 127.0.0.1 --port 5000
+    python async_service.py
+
+The Deezer-facing routes (/v1/search/albums, /v1/albums/<id> and
+/v1/albums/random) run as coroutines on httpx (AsyncDeezerClient) and
+asyncpg, so a slow Deezer response holds a coroutine, not a thread. Every
+other route is the Flask app from external_api_service, run on a pool of
+ASYNC_WSGI_THREADS threads. Routes, JSON bodies and cache headers are the same as under
+app.run(). Both halves share the process's caches, rate limiter, persist
+queue and background workers.
+"""
+import asyncio
+import functools
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+from urllib.parse import parse_qsl
+
+import asyncpg
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from werkzeug.http import parse_accept_header, parse_etags
+
+import external_api_service as svc
+from deezer_async import AsyncDeezerClient
+
+ASYNC_DB_POOL_MIN_SIZE = 1
+ASYNC_DB_POOL_MAX_SIZE = 20
+ASYNC_DB_RETRY_SECONDS = 5.0        # after a failed connect, fail fast for this long
+ASYNC_DEEZER_MAX_CONNECTIONS = 100
+ASYNC_WSGI_THREADS = 16             # threads running the Flask routes (login, lists, ratings, ...)
+
+_PARAM = re.compile(r'%\((\w+)\)s')
+
+
+@functools.lru_cache(maxsize=None)
+def to_asyncpg(sql):
+    """Turn a psycopg2 query with %(name)s parameters into ($n query, [names])"""
+    names = []
+
+    def number(match):
+        name = match.group(1)
+        if name not in names:
+            names.append(name)
+        return f"${names.index(name) + 1}"
+
+    return _PARAM.sub(number, sql), names
+
+
+LOCAL_SEARCH = to_asyncpg(svc.LOCAL_SEARCH_SQL)
+ALBUM_TRACKS = to_asyncpg(svc.ALBUM_TRACKS_SQL)
+RANDOM_ALBUMS = to_asyncpg(svc.RANDOM_ALBUMS_SQL)
+
+
+async def fetch(conn, query, params):
+    """Run a to_asyncpg() query; timed like the psycopg2 queries, labelled by the calling function"""
+    sql, names = query
+    args = [params[name] for name in names]
+    if not svc.METRICS_ENABLED:
+        return await conn.fetch(sql, *args)
+    labels = (sys._getframe(1).f_code.co_name,)
+    svc.DB_METRICS.start()
+    started = time.perf_counter()
+    ok = False
+    try:
+        rows = await conn.fetch(sql, *args)
+        ok = True
+        return rows
+    finally:
+        svc.DB_METRICS.finish(labels, time.perf_counter() - started, ok)
+
+
+_db_pool = None
+_db_pool_lock = None
+_db_failed_at = None
+_deezer = None
+
+
+async def get_async_db_pool():
+    """The asyncpg pool, created on first use; fails fast for a while after a failed connect"""
+    global _db_pool, _db_pool_lock, _db_failed_at
+    if _db_pool is not None:
+        return _db_pool
+    if _db_pool_lock is None:
+        _db_pool_lock = asyncio.Lock()
+    async with _db_pool_lock:
+        if _db_pool is None:
+            loop = asyncio.get_running_loop()
+            if _db_failed_at is not None and loop.time() - _db_failed_at < ASYNC_DB_RETRY_SECONDS:
+                raise ConnectionError("database unavailable")
+            try:
+                _db_pool = await asyncpg.create_pool(
+                    host=svc.DB_CONFIG['host'],
+                    port=int(svc.DB_CONFIG['port']),
+                    user=svc.DB_CONFIG['user'],
+                    password=svc.DB_CONFIG['password'],
+                    database=svc.DB_CONFIG['dbname'],
+                    min_size=ASYNC_DB_POOL_MIN_SIZE,
+                    max_size=ASYNC_DB_POOL_MAX_SIZE,
+                    server_settings={'search_path': 'music, public'}
+                )
+            except Exception:
+                _db_failed_at = loop.time()
+                raise
+            _db_failed_at = None
+    return _db_pool
+
+
+def get_async_deezer_client():
+    global _deezer
+    if _deezer is None:
+        _deezer = AsyncDeezerClient(svc.get_deezer_client(), max_connections=ASYNC_DEEZER_MAX_CONNECTIONS)
+    return _deezer
+
+
+class Request:
+    """The bits of an ASGI HTTP scope the async routes need"""
+
+    def __init__(self, scope):
+        self.method = scope['method']
+        self.path = scope['path']
+        self.headers = {k.decode('latin-1').lower(): v.decode('latin-1') for k, v in scope['headers']}
+        self.args = {}
+        for key, value in parse_qsl(scope.get('query_string', b'').decode('latin-1'), keep_blank_values=True):
+            self.args.setdefault(key, value)     # first value wins, like request.args.get
+        client = scope.get('client')
+        self.remote_addr = client[0] if client else None
+
+
+class JsonResponse:
+    def __init__(self, payload, status=200, cache_control=None, validate=False):
+        self.payload = payload
+        self.status = status
+        self.cache_control = cache_control
+        self.validate = validate
+
+    def render(self, request):
+        """(status, headers, body), with the same validators/compression as the Flask routes"""
+        body = (svc.app.json.dumps(self.payload, separators=(",", ":")) + "\n").encode('utf-8')
+        headers = [(b'content-type', b'application/json')]
+        if self.cache_control:
+            headers.append((b'cache-control', self.cache_control.encode('latin-1')))
+
+        status = self.status
+        etag = None
+        if self.validate and status == 200:
+            etag, not_modified = svc.HTTP_CACHE.check(
+                body, parse_etags(request.headers.get('if-none-match')))
+            if not_modified:
+                headers = [h for h in headers if h[0] != b'content-type']
+                headers.append((b'vary', b'Accept-Encoding'))
+                headers.append((b'etag', f'"{etag}"'.encode('latin-1')))
+                return 304, headers, b''
+
+        if status == 200:
+            headers.append((b'vary', b'Accept-Encoding'))
+            body, encoding = svc.HTTP_CACHE.encode(
+                body, parse_accept_header(request.headers.get('accept-encoding')))
+            if encoding is not None:
+                headers.append((b'content-encoding', encoding.encode('latin-1')))
+                if etag is not None:
+                    etag = f"{etag}-{encoding}"
+        if etag is not None:
+            headers.append((b'etag', f'"{etag}"'.encode('latin-1')))
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        return status, headers, body
+
+
+async def search_albums(request):
+    """Async /v1/search/albums; same behaviour as external_api_service.search_albums"""
+    query = request.args.get('q', '')
+    page = int(request.args.get('page', 1))
+    limit = int(request.args.get('limit', 5))
+
+    if not query:
+        return JsonResponse({'error': 'Query parameter "q" is required'}, 400)
+
+    local_albums, local_total = [], 0
+    if svc.LOCAL_SEARCH_ENABLED and len(query.strip()) >= svc.LOCAL_SEARCH_MIN_QUERY_LENGTH:
+        try:
+            pool = await get_async_db_pool()
+            async with pool.acquire() as conn:
+                rows = await fetch(conn, LOCAL_SEARCH, svc.local_search_params(query.strip(), page, limit))
+            local_albums, local_total = svc.local_search_results(rows)
+        except Exception as e:
+            print(f"Error searching local albums: {e}")
+            svc.count_search('local_errors')
+
+    deezer_response = None
+    if len(local_albums) >= limit:
+        svc.count_search('local')
+    else:
+        svc.count_search('merged' if local_albums else 'upstream')
+        try:
+            index, deezer_limit = svc.deezer_search_window(page, limit, local_albums, local_total)
+            deezer_response = await get_async_deezer_client().search_albums(
+                query, index=index, limit=deezer_limit)
+        except Exception as e:
+            print(f"Error fetching from Deezer: {e}")
+            deezer_response = {'data': [], 'total': 0}
+    session_data, display_results, total = svc.merge_search_results(
+        local_albums, local_total, deezer_response, limit)
+
+    if session_data:
+        # can block briefly on the persist queue when it's full
+        await asyncio.to_thread(svc.store_search_session, f"{query}:{page}", session_data)
+
+    # No flask-login session here, so prefetch budgets are per client address
+    if svc.PREFETCH_ENABLED and session_data:
+        svc.ALBUM_PREFETCH.schedule(f"addr:{request.remote_addr}",
+                                    [album['deezer_id'] for album in session_data])
+
+    return JsonResponse({
+        'query': query,
+        'page': page,
+        'total': total,
+        'results': display_results
+    }, cache_control=svc.SEARCH_CACHE_CONTROL, validate=True)
+
+
+async def _fetch_album_details(album_id, album_data):
+    """Async fetch_album_details: /album/{id} (if needed) and its tracks in parallel, then save"""
+    client = get_async_deezer_client()
+    tracks_call = client.album_tracks(album_id)
+    if svc.album_needs_info(album_data):
+        full_album, tracks_data = await asyncio.gather(client.album(album_id), tracks_call,
+                                                       return_exceptions=True)
+        if isinstance(tracks_data, BaseException):
+            raise tracks_data
+        if isinstance(full_album, BaseException):
+            if not album_data:
+                raise full_album
+            print(f"Error fetching additional album info for {album_id}: {full_album}")
+        elif not album_data:
+            album_data = svc.album_from_deezer(full_album)
+        else:
+            svc.fill_album_info(album_data, full_album)
+    else:
+        tracks_data = await tracks_call
+
+    album_data['tracks'] = svc.format_tracks(tracks_data)
+    # Writes stay on the shared psycopg2 path (one upsert implementation)
+    await asyncio.to_thread(svc.save_album_to_db, album_data)
+    return album_data
+
+
+async def _load_album(album_id, partial):
+    """Async _load_album_from_deezer; coalesced with sync loads of the same album in ALBUM_LOADS"""
+    album_data, _ = await svc.ALBUM_LOADS.do_async(
+        str(album_id), lambda: _fetch_album_details(album_id, partial))
+    return album_data
+
+
+async def select_album(request, album_id):
+    """Async /v1/albums/<album_id>; same behaviour as external_api_service.select_album"""
+    album_data = None
+    needs_deezer_fetch = False
+    community = {'rating_average': None, 'rating_count': 0}
+    svc.ALBUM_PREFETCH.record_request(album_id)
+
+    def respond(data):
+        return JsonResponse({**data, **community}, cache_control=svc.ALBUM_CACHE_CONTROL, validate=True)
+
+    try:
+        pool = await get_async_db_pool()
+        async with pool.acquire() as conn:
+            rows = await fetch(conn, to_asyncpg(svc.album_detail_sql()), {'album_id': int(album_id)})
+            if rows:
+                album_row = rows[0]
+                community = svc.community_rating(album_row)
+                tracks = await fetch(conn, ALBUM_TRACKS, {'album_id': int(album_id)})
+                album_data = svc.album_detail(album_row, tracks)
+                needs_deezer_fetch = svc.album_missing_data(album_id, album_row, tracks)
+                if not needs_deezer_fetch:
+                    return respond(album_data)
+    except Exception as e:
+        print(f"Error checking database for album {album_id}: {e}")
+
+    if not album_data:
+        # the persist queue submit can block for PERSIST_PUT_TIMEOUT when it's full
+        album_data, needs_deezer_fetch = await asyncio.to_thread(svc.album_from_search_cache, album_id)
+
+    if needs_deezer_fetch:
+        try:
+            return respond(await _load_album(album_id, album_data))
+        except Exception as e:
+            print(f"Error fetching from Deezer: {e}")
+            if album_data:
+                return respond(album_data)
+            return JsonResponse({'error': 'Failed to fetch album details'}, 500)
+
+    if album_data:
+        return respond(album_data)
+    return JsonResponse({'error': 'Album not found'}, 404)
+
+
+async def get_random_albums(request):
+    """Async /v1/albums/random; same behaviour as external_api_service.get_random_albums"""
+    try:
+        count = int(request.args.get('count', 6))
+        pool = await get_async_db_pool()
+
+        albums = []
+        seen = set()
+        async with pool.acquire() as conn:
+            for _ in range(3):
+                # sample() reloads the id list from the DB when it's due
+                ids = await asyncio.to_thread(svc.RANDOM_ALBUM_IDS.sample, count - len(albums), seen)
+                if not ids:
+                    break
+                seen.update(ids)
+                rows = {row['deezer_id']: row for row in await fetch(conn, RANDOM_ALBUMS, {'ids': ids})}
+                albums.extend(rows[album_id] for album_id in ids if album_id in rows)
+                if len(albums) >= count:
+                    break
+
+        missing = [album['deezer_id'] for album in albums if not album['cover_url']]
+        if missing:
+            svc.ALBUM_BACKFILL.enqueue(missing)
+
+        return JsonResponse([svc.random_album_result(album) for album in albums],
+                            cache_control='no-store')
+
+    except Exception as e:
+        print(f"Error fetching random albums: {e}")
+        return JsonResponse({'error': 'Failed to fetch random albums'}, 500)
+
+
+_ALBUM_PATH = re.compile(r'^/v1/albums/([^/]+)$')
+
+
+def route(request):
+    """(Flask URL rule, async handler call) for a request, or None to hand it to Flask"""
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if request.path == '/v1/search/albums':
+        return '/v1/search/albums', search_albums(request)
+    if request.path == '/v1/albums/random':
+        return '/v1/albums/random', get_random_albums(request)
+    match = _ALBUM_PATH.match(request.path)
+    if match:
+        return '/v1/albums/<album_id>', select_album(request, match.group(1))
+    return None
+
+
+WSGI_EXECUTOR = ThreadPoolExecutor(max_workers=ASYNC_WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+class WsgiRequest(WsgiToAsgiInstance):
+    """
+    One request to the Flask app, run on WSGI_EXECUTOR. Only asgiref's
+    build_environ() is reused: its own run_wsgi_app puts every request on
+    one thread-sensitive thread, which runs the Flask routes one at a time
+    and under concurrent load fails requests with "CurrentThreadExecutor
+    already quit or is broken". The response is buffered and sent from the
+    event loop; the Flask routes return whole JSON bodies, not streams.
+    """
+
+    async def __call__(self, scope, receive, send):
+        self.scope = scope
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message['type'] != 'http.request':
+                    return      # client disconnected before sending the whole body
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            status, headers, content = await self.run_wsgi_app(body)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def run_wsgi_app(self, body):
+        """(status, headers, body) of the Flask app's response to the request"""
+        try:
+            environ = self.build_environ(self.scope, body)
+        except ValueError:
+            return 400, [(b'content-type', b'text/plain')], b"Bad Request: Too many duplicate headers"
+        run = sync_to_async(self._call_app, thread_sensitive=False, executor=WSGI_EXECUTOR)
+        return await run(environ)
+
+    def _call_app(self, environ):
+        response = []
+
+        def start_response(status, response_headers, exc_info=None):
+            response[:] = [int(status.split(' ', 1)[0]),
+                           [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                            for name, value in response_headers]]
+
+        try:
+            result = self.wsgi_application(environ, start_response)
+            try:
+                content = b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+        except Exception as e:
+            print(f"UNHANDLED EXCEPTION: {e}")
+            return 500, [(b'content-type', b'text/plain')], b"Internal Server Error"
+        return response[0], response[1], content
+
+
+class AsyncService:
+    """ASGI app: async routes first, everything else to the wrapped WSGI app"""
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        request = Request(scope)
+        routed = route(request)
+        if routed is None:
+            # timed by the Flask request hooks
+            return await WsgiRequest(self.wsgi_app)(scope, receive, send)
+        rule, handler = routed
+
+        observed = svc.METRICS_ENABLED
+        if observed:
+            svc.HTTP_METRICS.start()
+        started = time.perf_counter()
+        status = 500
+        try:
+            try:
+                response = await handler
+            except Exception as e:
+                # same as the Flask app's catch-all error handler
+                print(f"UNHANDLED EXCEPTION: {e}")
+                response = JsonResponse({'error': str(e)}, 500)
+            status, headers, body = response.render(request)
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            await send({'type': 'http.response.body', 'body': b'' if request.method == 'HEAD' else body})
+        finally:
+            if observed:
+                svc.observe_request(request.method, rule, status, time.perf_counter() - started)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await asyncio.to_thread(svc.check_database)
+                svc.restore_search_cache()
+                svc.ALBUM_BACKFILL.start()
+                svc.RATING_AGGREGATE_CHECK.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+async def shutdown():
+    global _db_pool, _deezer
+    if _deezer is not None:
+        await _deezer.aclose()
+        _deezer = None
+    if _db_pool is not None:
+        await _db_pool.close()
+        _db_pool = None
+
+
+app = AsyncService(svc.app)
+
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=5000)
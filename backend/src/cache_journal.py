@@ -0,0 +1,269 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:     # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _lock_exclusive(fd):
+    """Non-blocking exclusive lock on fd, released when it's closed; OSError if it's held"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+
+class CacheJournal:
+    """
+    Append-only local journal of search cache writes, so albums that are
+    cached but not yet in the database survive a crash or SIGKILL.
+
+    One compact JSON array per line:
+
+        ["s", key, expires_at, albums]    a page was stored (wall-clock expiry)
+        ["u", deezer_id, fields]          fields were merged into a cached album
+        ["q", albums]                     albums waiting to be saved outside the cache
+        ["p", [deezer_id, ...]]           these albums were saved to the database
+
+    Each record is a single write() on an O_APPEND file, so it is in the OS
+    page cache before the request returns: a killed process loses nothing,
+    a power cut can lose what wasn't synced yet (fsync=True syncs every
+    record, at the cost of a disk flush per search). A torn last line from a
+    crash mid-write is skipped on replay.
+
+    replay() rebuilds the pages that haven't expired and the albums that were
+    written but never checkpointed by a "p" record. compact() rewrites the
+    file from a snapshot of live state; appends trigger it through
+    snapshot() once the file is past compact_bytes and twice its size after
+    the previous compaction.
+
+    The journal belongs to one process: open() takes an exclusive lock on
+    path + '.lock' (flock, or msvcrt.locking on Windows) and returns False
+    if another process holds it.
+    """
+
+    def __init__(self, path, compact_bytes=32 * 1024 * 1024, snapshot=None, fsync=False):
+        self.path = path
+        self.compact_bytes = compact_bytes
+        self.snapshot = snapshot    # () -> (pages, queued), see compact()
+        self.fsync = fsync
+
+        self._lock = threading.RLock()
+        self._fd = None
+        self._lock_fd = None
+        self._size = 0
+        self._compact_at = compact_bytes
+        self._dirty = set()         # deezer_ids written since their last checkpoint
+
+        self._appended = 0
+        self._appended_bytes = 0
+        self._compactions = 0
+        self._last_compact_ms = 0.0
+        self._replayed = 0
+        self._corrupt = 0
+        self._last_replay_ms = 0.0
+
+    def open(self):
+        """Lock and open the journal for appending; False if another process has it"""
+        with self._lock:
+            if self._fd is not None:
+                return True
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            lock_fd = os.open(self.path + '.lock', os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                _lock_exclusive(lock_fd)
+            except OSError:
+                os.close(lock_fd)
+                return False
+            self._lock_fd = lock_fd
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._size = os.fstat(self._fd).st_size
+            self._compact_at = max(self.compact_bytes, 2 * self._size)
+            return True
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)     # releases the lock
+                self._lock_fd = None
+
+    @property
+    def is_open(self):
+        return self._fd is not None
+
+    @staticmethod
+    def _encode(record):
+        return (json.dumps(record, separators=(',', ':'), default=str) + '\n').encode()
+
+    def _append(self, record, dirty=(), clean=()):
+        line = self._encode(record)
+        compact = False
+        with self._lock:
+            if self._fd is None:
+                return
+            os.write(self._fd, line)
+            if self.fsync:
+                os.fsync(self._fd)
+            self._size += len(line)
+            self._appended += 1
+            self._appended_bytes += len(line)
+            self._dirty.update(dirty)
+            self._dirty.difference_update(clean)
+            compact = self.snapshot is not None and self._size > self._compact_at
+            if compact:
+                self._compact_at = float('inf')     # one compaction at a time
+        if compact:
+            try:
+                self.compact(*self.snapshot())
+            except Exception as e:
+                print(f"Error compacting cache journal: {e}")
+                with self._lock:
+                    self._compact_at = 2 * self._size
+
+    def record_store(self, key, albums, ttl_seconds):
+        # copies: a prefetch may merge fields into the cached dicts meanwhile
+        albums = [dict(album) for album in albums]
+        self._append(['s', key, round(time.time() + ttl_seconds, 3), albums],
+                     dirty=[str(album.get('deezer_id')) for album in albums])
+
+    def record_update(self, deezer_id, fields):
+        self._append(['u', str(deezer_id), fields], dirty=[str(deezer_id)])
+
+    def record_persisted(self, deezer_ids):
+        deezer_ids = [str(deezer_id) for deezer_id in deezer_ids if deezer_id is not None]
+        if deezer_ids:
+            self._append(['p', deezer_ids], clean=deezer_ids)
+
+    def unsaved(self, deezer_ids):
+        """The subset of deezer_ids written since their last checkpoint"""
+        with self._lock:
+            return {str(deezer_id) for deezer_id in deezer_ids} & self._dirty
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        self._corrupt += 1      # torn tail of a write cut short by a crash
+        except FileNotFoundError:
+            return
+
+    def replay(self):
+        """
+        Rebuild state from the journal: (pages, unsaved) where pages is a
+        list of (key, albums, seconds_left) that haven't expired yet and
+        unsaved the albums never checkpointed that aren't on any of them.
+        """
+        started = time.monotonic()
+        pages = {}      # key -> (albums, expires_at)
+        index = {}      # deezer_id -> {key: album}
+        dirty = {}      # deezer_id -> latest album data
+        records = 0
+
+        for record in self._read():
+            records += 1
+            kind = record[0]
+            if kind == 's':
+                _, key, expires_at, albums = record
+                old = pages.get(key)
+                if old is not None:
+                    for album in old[0]:
+                        index.get(str(album.get('deezer_id')), {}).pop(key, None)
+                pages[key] = (albums, expires_at)
+                for album in albums:
+                    deezer_id = str(album.get('deezer_id'))
+                    index.setdefault(deezer_id, {})[key] = album
+                    dirty[deezer_id] = album
+            elif kind == 'u':
+                _, deezer_id, fields = record
+                copies = list(index.get(deezer_id, {}).values())
+                for album in copies:
+                    album.update(fields)
+                if deezer_id in dirty:
+                    dirty[deezer_id].update(fields)
+                elif copies:
+                    dirty[deezer_id] = copies[-1]   # changed since it was saved
+            elif kind == 'q':
+                for album in record[1]:
+                    dirty[str(album.get('deezer_id'))] = album
+            elif kind == 'p':
+                for deezer_id in record[1]:
+                    dirty.pop(deezer_id, None)
+
+        now = time.time()
+        live = [(key, albums, expires_at - now)
+                for key, (albums, expires_at) in pages.items() if expires_at > now]
+        live_ids = {str(album.get('deezer_id')) for _, albums, _ in live for album in albums}
+        unsaved = [album for deezer_id, album in dirty.items() if deezer_id not in live_ids]
+
+        with self._lock:
+            self._dirty = set(dirty)
+            self._replayed = records
+            self._last_replay_ms = (time.monotonic() - started) * 1000
+        return live, unsaved
+
+    def compact(self, pages, queued=()):
+        """
+        Replace the journal with a snapshot: pages as (key, albums,
+        seconds_left) and queued, albums still waiting to be saved outside
+        the cache. Which of them are already saved is carried over, so a
+        replay of the new file gives the same answer as one of the old.
+        """
+        started = time.monotonic()
+        now = time.time()
+        tmp_path = self.path + '.tmp'
+        with self._lock:
+            if self._fd is None:
+                return
+            written = set()
+            with open(tmp_path, 'wb') as f:
+                for key, albums, seconds_left in pages:
+                    albums = [dict(album) for album in albums]
+                    f.write(self._encode(['s', key, round(now + seconds_left, 3), albums]))
+                    written.update(str(album.get('deezer_id')) for album in albums)
+                queued = [album for album in queued if str(album.get('deezer_id')) in self._dirty]
+                if queued:
+                    f.write(self._encode(['q', queued]))
+                    written.update(str(album.get('deezer_id')) for album in queued)
+                clean = written - self._dirty
+                if clean:
+                    f.write(self._encode(['p', sorted(clean)]))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+            os.close(self._fd)
+            self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+            self._size = os.fstat(self._fd).st_size
+            self._compact_at = max(self.compact_bytes, 2 * self._size)
+            # albums in neither the cache nor the queue can't be recovered any more
+            self._dirty &= written
+            self._compactions += 1
+            self._last_compact_ms = (time.monotonic() - started) * 1000
+
+    def stats(self):
+        with self._lock:
+            return {
+                'open': self._fd is not None,
+                'bytes': self._size,
+                'compact_at_bytes': self._compact_at,
+                'unsaved_albums': len(self._dirty),
+                'appended_records': self._appended,
+                'appended_bytes': self._appended_bytes,
+                'compactions': self._compactions,
+                'last_compact_ms': round(self._last_compact_ms, 3),
+                'replayed_records': self._replayed,
+                'corrupt_records': self._corrupt,
+                'last_replay_ms': round(self._last_replay_ms, 3),
+            }
@@ -0,0 +1,325 @@
+import functools
+import sys
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+def _query_name():
+    """Name of the function that ran the query, skipping psycopg2 helpers like execute_values"""
+    frame = sys._getframe(2)
+    while frame is not None and frame.f_globals.get('__name__', '').startswith('psycopg2'):
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else 'unknown'
+
+
+@functools.lru_cache(maxsize=None)
+def _observed_cursor(base):
+    """Subclass of cursor class base whose execute()/executemany() report to connection.observer"""
+
+    def observed(method):
+        def wrapper(self, query, *args, **kwargs):
+            observer = self.connection.observer
+            labels = (_query_name(),)
+            observer.start()
+            started = time.perf_counter()
+            ok = False
+            try:
+                result = method(self, query, *args, **kwargs)
+                ok = True
+                return result
+            finally:
+                observer.finish(labels, time.perf_counter() - started, ok)
+        return wrapper
+
+    return type(f"Observed{base.__name__}", (base,), {
+        'execute': observed(base.execute),
+        'executemany': observed(base.executemany),
+    })
+
+
+class ObservedConnection(extensions.connection):
+    """
+    psycopg2 connection whose cursors, whatever cursor_factory they ask
+    for, report every execute to observer.start() / observer.finish(
+    (query_name,), seconds, ok). query_name is the calling function.
+    """
+
+    observer = None
+
+    def cursor(self, *args, **kwargs):
+        base = kwargs.get('cursor_factory') or self.cursor_factory or extensions.cursor
+        kwargs['cursor_factory'] = _observed_cursor(base)
+        return super().cursor(*args, **kwargs)
+
+
+class PooledConnection:
+    """
+    Thin wrapper around a psycopg2 connection borrowed from a ConnectionPool.
+    Works like a normal connection (cursor(), commit(), rollback(), ...) but
+    close() and leaving a `with` block hand the connection back to the pool
+    instead of tearing down the socket.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+
+    def __getattr__(self, name):
+        if self._conn is None:
+            raise psycopg2.InterfaceError("connection already returned to pool")
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same transaction semantics as psycopg2's own `with conn:` block,
+        # plus the connection goes back to the pool afterwards.
+        try:
+            if self._conn is not None and not self._conn.closed:
+                if exc_type is None:
+                    self._conn.commit()
+                else:
+                    self._conn.rollback()
+        finally:
+            self.close()
+        return False
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.putconn(conn)
+
+    @property
+    def closed(self):
+        return self._conn is None or self._conn.closed
+
+
+class ConnectionPool:
+    """
+    Thread-safe PostgreSQL connection pool.
+
+    - keeps between min_size and max_size physical connections
+    - getconn() waits up to checkout_timeout seconds for a free connection
+    - idle connections are health checked on borrow (SELECT 1) when they have
+      been sitting unused for longer than health_check_interval seconds
+    - init_sql (e.g. SET search_path) runs once per physical connection
+    - observer (e.g. metrics.OperationMetrics) times every query run on
+      the pool's connections, see ObservedConnection
+    """
+
+    def __init__(self, connect_kwargs, min_size=1, max_size=10, checkout_timeout=5.0,
+                 health_check_interval=30.0, init_sql=None, observer=None):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("invalid pool size: min=%s max=%s" % (min_size, max_size))
+        self.connect_kwargs = dict(connect_kwargs)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.init_sql = init_sql
+        self.observer = observer
+
+        self._lock = threading.Condition()
+        self._idle = deque()        # (conn, last_used_monotonic)
+        self._size = 0              # physical connections open or being opened
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._connects = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+
+    def _connect(self):
+        if self.observer is None:
+            conn = psycopg2.connect(**self.connect_kwargs)
+        else:
+            conn = psycopg2.connect(connection_factory=ObservedConnection, **self.connect_kwargs)
+            conn.observer = self.observer
+        try:
+            if self.init_sql:
+                with conn.cursor() as cur:
+                    cur.execute(self.init_sql)
+                conn.commit()
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _is_healthy(self, conn, last_used):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+            return False
+        if self.health_check_interval is None:
+            return True
+        if time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def fill(self):
+        """Open connections until min_size is reached"""
+        while True:
+            with self._lock:
+                if self._closed or self._size >= self.min_size:
+                    return
+                self._size += 1
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._connects += 1
+                self._idle.append((conn, time.monotonic()))
+                self._lock.notify()
+
+    def getconn(self, timeout=None):
+        """Borrow a raw connection; must be given back with putconn()"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        while True:
+            conn = None
+            last_used = None
+            must_connect = False
+
+            with self._lock:
+                while True:
+                    if self._closed:
+                        raise psycopg2.InterfaceError("connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self._in_use += 1
+                        must_connect = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            "no database connection available after %.1fs "
+                            "(max_size=%d)" % (timeout, self.max_size)
+                        )
+                    self._waiting += 1
+                    try:
+                        self._lock.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            if must_connect:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._in_use -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._connects += 1
+            elif not self._is_healthy(conn, last_used):
+                self._close_quietly(conn)
+                with self._lock:
+                    self._size -= 1
+                    self._in_use -= 1
+                    self._health_check_failures += 1
+                    self._discarded += 1
+                    self._lock.notify()
+                continue
+
+            waited = time.monotonic() - started
+            with self._lock:
+                self._checkouts += 1
+                self._wait_time_total += waited
+                if waited > self._wait_time_max:
+                    self._wait_time_max = waited
+            return conn
+
+    def putconn(self, conn, discard=False):
+        """Return a raw connection to the pool"""
+        if not discard and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                discard = True
+
+        with self._lock:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed:
+                self._size -= 1
+                self._discarded += 1
+                to_close = conn
+            else:
+                self._idle.append((conn, time.monotonic()))
+                to_close = None
+            self._lock.notify()
+
+        if to_close is not None:
+            self._close_quietly(to_close)
+
+    def connection(self, timeout=None):
+        """Borrow a connection wrapped so `with` / close() return it to the pool"""
+        return PooledConnection(self, self.getconn(timeout))
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._lock.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'waiting': self._waiting,
+                'checkouts': self._checkouts,
+                'timeouts': self._timeouts,
+                'connects': self._connects,
+                'discarded': self._discarded,
+                'health_check_failures': self._health_check_failures,
+                'wait_time_total_ms': round(self._wait_time_total * 1000, 3),
+                'wait_time_avg_ms': round(self._wait_time_total * 1000 / self._checkouts, 3)
+                                    if self._checkouts else 0.0,
+                'wait_time_max_ms': round(self._wait_time_max * 1000, 3),
+            }
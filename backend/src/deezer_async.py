@@ -0,0 +1,154 @@
+import asyncio
+import itertools
+import random
+import time
+
+import httpx
+
+from deezer_cache import cache_key
+from deezer_client import DeezerError, endpoint_name, _RETRYABLE_DEEZER_CODES, _RETRYABLE_STATUS
+
+
+class AsyncDeezerClient:
+    """
+    asyncio counterpart of DeezerClient for the ASGI serving mode
+    (async_service.py), on one httpx.AsyncClient connection pool.
+
+    It wraps the process's DeezerClient and shares its settings, token
+    bucket, response cache and stats, so sync and async handlers draw on
+    one Deezer rate budget and show up together in /api/stats. Waiting for
+    the rate limiter, retry backoff and the request itself never block the
+    event loop. The response cache is a local SQLite file whose lock the sync
+    request threads take too, so its reads and writes run via
+    asyncio.to_thread rather than on the loop.
+
+    max_connections is spread over pools of at most CONNECTIONS_PER_POOL
+    used round-robin: httpcore scans a whole pool on every request, which
+    at a few hundred connections costs more CPU than the requests do.
+    """
+
+    CONNECTIONS_PER_POOL = 32
+
+    def __init__(self, sync_client, max_connections=100, transport=None):
+        self.sync = sync_client
+        pools = 1 if transport is not None else -(-max_connections // self.CONNECTIONS_PER_POOL)
+        per_pool = -(-max_connections // pools)
+        ssl_context = httpx.create_ssl_context()    # loading the CA bundle is slow; do it once
+        self._pools = [
+            httpx.AsyncClient(
+                base_url=sync_client.base_url,
+                timeout=sync_client.timeout,
+                limits=httpx.Limits(max_connections=per_pool, max_keepalive_connections=per_pool),
+                verify=ssl_context,
+                transport=transport
+            )
+            for _ in range(pools)
+        ]
+        self._next_pool = itertools.cycle(self._pools)
+        self._refreshing = set()
+        self._tasks = set()     # keep background refresh tasks referenced until done
+
+    async def _acquire(self):
+        limiter = self.sync.limiter
+        if limiter is None:
+            return
+        started = time.monotonic()
+        while True:
+            sleep_for = limiter.try_acquire()
+            if not sleep_for:
+                break
+            if time.monotonic() + sleep_for - started > self.sync.rate_limit_timeout:
+                raise TimeoutError("rate limiter wait exceeded %.1fs" % self.sync.rate_limit_timeout)
+            await asyncio.sleep(sleep_for)
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.sync.record_rate_limit_wait(waited)
+
+    async def get(self, path, params=None):
+        """GET base_url/path and return the decoded JSON body (served from cache when possible)"""
+        endpoint = endpoint_name(path)
+        cache = self.sync.cache
+        if cache is None or not cache.ttl_for(endpoint):
+            return await self._fetch(path, params, endpoint)
+
+        key = cache_key(path, params)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            data, fresh = cached
+            if not fresh and key not in self._refreshing:
+                self._refreshing.add(key)
+                task = asyncio.create_task(self._refresh(key, path, params, endpoint))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return data
+
+        data = await self._fetch(path, params, endpoint)
+        await asyncio.to_thread(cache.set, key, endpoint, data)
+        return data
+
+    async def _refresh(self, key, path, params, endpoint):
+        try:
+            data = await self._fetch(path, params, endpoint)
+            await asyncio.to_thread(self.sync.cache.set, key, endpoint, data)
+        except Exception as e:
+            print(f"Error refreshing cached Deezer response {key}: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def _fetch(self, path, params, endpoint):
+        """Network GET with rate limiting and retries"""
+        started = time.monotonic()
+        attempt = 0
+        self.sync.call_started()
+
+        try:
+            while True:
+                try:
+                    await self._acquire()
+                    response = await next(self._next_pool).get('/' + path.lstrip('/'), params=params)
+                    if response.status_code in _RETRYABLE_STATUS and attempt < self.sync.max_retries:
+                        raise httpx.HTTPStatusError(f"{response.status_code} from Deezer",
+                                                    request=response.request, response=response)
+                    response.raise_for_status()
+                    data = response.json()
+                    if isinstance(data, dict) and data.get('error'):
+                        error = data['error']
+                        raise DeezerError(error.get('message', 'Deezer error'), error.get('code'))
+                    self.sync.record_call(endpoint, time.monotonic() - started, True, attempt)
+                    return data
+
+                except (httpx.TransportError, httpx.HTTPStatusError, DeezerError) as e:
+                    retryable = (
+                        isinstance(e, httpx.TransportError)
+                        or (isinstance(e, httpx.HTTPStatusError)
+                            and e.response.status_code in _RETRYABLE_STATUS)
+                        or (isinstance(e, DeezerError) and e.code in _RETRYABLE_DEEZER_CODES)
+                    )
+                    if not retryable or attempt >= self.sync.max_retries:
+                        self.sync.record_call(endpoint, time.monotonic() - started, False, attempt)
+                        raise
+                    await asyncio.sleep(random.uniform(0, self.sync.backoff * (2 ** attempt)))
+                    attempt += 1
+
+                except Exception:
+                    self.sync.record_call(endpoint, time.monotonic() - started, False, attempt)
+                    raise
+        except asyncio.CancelledError:
+            # a request that gave up on us; the call is over all the same
+            self.sync.record_call(endpoint, time.monotonic() - started, False, attempt)
+            raise
+
+    async def search_albums(self, query, index=0, limit=5):
+        return await self.get('search/album', params={'q': query, 'index': index, 'limit': limit})
+
+    async def album(self, album_id):
+        return await self.get(f'album/{album_id}')
+
+    async def album_tracks(self, album_id):
+        return await self.get(f'album/{album_id}/tracks')
+
+    async def aclose(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for pool in self._pools:
+            await pool.aclose()
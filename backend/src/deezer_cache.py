@@ -0,0 +1,133 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+
+def cache_key(path, params=None):
+    """Normalized cache key: path without slashes at the ends + sorted query string"""
+    key = path.strip('/')
+    if params:
+        key += '?' + urlencode(sorted((str(k), str(v)) for k, v in params.items()))
+    return key
+
+
+class ResponseCache:
+    """
+    Disk-backed (SQLite) cache for Deezer JSON responses, so warm restarts
+    and repeated album views don't hit the network.
+
+    - ttls maps endpoint names (see deezer_client.endpoint_name) to seconds;
+      endpoints without a TTL are not cached
+    - an expired entry is still served for stale_seconds more while the
+      caller refreshes it in the background (stale-while-revalidate)
+    - at most max_entries rows; least recently used rows are evicted
+    """
+
+    def __init__(self, path, ttls, stale_seconds=3600, max_entries=20000):
+        self.path = path
+        self.ttls = dict(ttls)
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                body TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+        self._fresh_hits = 0
+        self._stale_hits = 0
+        self._misses = 0
+        self._evicted = 0
+
+    def ttl_for(self, endpoint):
+        return self.ttls.get(endpoint)
+
+    def get(self, key):
+        """Return (data, is_fresh), or None when missing or too stale to serve"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT body, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] + self.stale_seconds <= now:
+                self._misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            fresh = row[1] > now
+            if fresh:
+                self._fresh_hits += 1
+            else:
+                self._stale_hits += 1
+        return json.loads(row[0]), fresh
+
+    def set(self, key, endpoint, data, ttl=None):
+        ttl = self.ttl_for(endpoint) if ttl is None else ttl
+        if not ttl:
+            return
+        now = time.time()
+        body = json.dumps(data)
+        with self._lock:
+            existed = self._db.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, body, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, endpoint, body, now + ttl, now)
+            )
+            if not existed:
+                self._count += 1
+            if self._count > self.max_entries:
+                self._evict(now)
+
+    def _evict(self, now):
+        """Drop everything past its stale window, then LRU rows down to 90% of max_entries"""
+        cur = self._db.execute(
+            "DELETE FROM responses WHERE expires_at + ? <= ?", (self.stale_seconds, now)
+        )
+        removed = cur.rowcount
+        self._count -= removed
+        excess = self._count - int(self.max_entries * 0.9)
+        if excess > 0:
+            cur = self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access LIMIT ?)", (excess,)
+            )
+            removed += cur.rowcount
+            self._count -= cur.rowcount
+        self._evicted += removed
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._count = 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'path': self.path,
+                'entries': self._count,
+                'max_entries': self.max_entries,
+                'fresh_hits': self._fresh_hits,
+                'stale_hits': self._stale_hits,
+                'misses': self._misses,
+                'evicted': self._evicted,
+            }
@@ -0,0 +1,249 @@
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from deezer_cache import cache_key
+
+
+class DeezerError(Exception):
+    """Error payload returned by the Deezer API (it answers 200 with {"error": {...}})"""
+
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+# Deezer error codes worth retrying: 4 = quota exceeded, 700 = service busy
+_RETRYABLE_DEEZER_CODES = {4, 700}
+_RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Process-wide rate limiter. Callers block in acquire() until a token is
+    available, so bursts queue up locally instead of being throttled by Deezer.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)          # tokens added per second
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def available(self):
+        """Tokens in the bucket right now, without taking one"""
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+    def try_acquire(self):
+        """Take one token if available; returns 0, or the seconds until one will be"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Take one token; returns seconds spent waiting, raises TimeoutError on timeout"""
+        started = time.monotonic()
+        while True:
+            sleep_for = self.try_acquire()
+            if not sleep_for:
+                return time.monotonic() - started
+            if timeout is not None and time.monotonic() + sleep_for - started > timeout:
+                raise TimeoutError("rate limiter wait exceeded %.1fs" % timeout)
+            time.sleep(sleep_for)
+
+
+def endpoint_name(path):
+    """Collapse ids so stats group by endpoint: album/302127/tracks -> album/{id}/tracks"""
+    return re.sub(r'/\d+', '/{id}', '/' + path.strip('/'))[1:]
+
+
+class DeezerClient:
+    """
+    Shared client for the Deezer API.
+
+    - one requests.Session with a keep-alive connection pool
+    - retries with full-jitter exponential backoff on connection errors,
+      timeouts, 429/5xx and Deezer's quota/busy error payloads
+    - token-bucket rate limit shared by every caller in the process
+    - per-endpoint latency/error counters in stats(); an observer (e.g.
+      metrics.OperationMetrics) also gets start() / finish((endpoint,),
+      seconds, ok) for every call
+    - optional ResponseCache: fresh hits skip the network, stale hits are
+      returned immediately and refreshed in a background thread
+
+    base_url (and session) can be injected so tests can point the client at
+    a local stub server.
+    """
+
+    def __init__(self, base_url="https://api.deezer.com", timeout=10, max_retries=3,
+                 backoff=0.25, rate_per_second=10, burst=50, rate_limit_timeout=30,
+                 pool_maxsize=20, session=None, cache=None, observer=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.rate_limit_timeout = rate_limit_timeout
+        self.limiter = TokenBucket(rate_per_second, burst) if rate_per_second else None
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        self.cache = cache
+        self.observer = observer
+
+        self._stats_lock = threading.Lock()
+        self._endpoints = {}
+        self._rate_limit_wait = 0.0
+        self._refreshing = set()    # cache keys with a background refresh running
+
+    def record_rate_limit_wait(self, waited):
+        with self._stats_lock:
+            self._rate_limit_wait += waited
+
+    def call_started(self):
+        if self.observer is not None:
+            self.observer.start()
+
+    def record_call(self, endpoint, elapsed, ok, retries):
+        """Once per call_started(), when the call (retries included) is over"""
+        if self.observer is not None:
+            self.observer.finish((endpoint,), elapsed, ok)
+        with self._stats_lock:
+            stat = self._endpoints.get(endpoint)
+            if stat is None:
+                stat = self._endpoints[endpoint] = {
+                    'requests': 0, 'errors': 0, 'retries': 0,
+                    'total_ms': 0.0, 'max_ms': 0.0
+                }
+            stat['requests'] += 1
+            stat['retries'] += retries
+            if not ok:
+                stat['errors'] += 1
+            ms = elapsed * 1000
+            stat['total_ms'] += ms
+            if ms > stat['max_ms']:
+                stat['max_ms'] = ms
+
+    def _sleep_before_retry(self, attempt):
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, path, params=None):
+        """GET base_url/path and return the decoded JSON body (served from cache when possible)"""
+        endpoint = endpoint_name(path)
+        if self.cache is None or not self.cache.ttl_for(endpoint):
+            return self._fetch(path, params, endpoint)
+
+        key = cache_key(path, params)
+        cached = self.cache.get(key)
+        if cached is not None:
+            data, fresh = cached
+            if not fresh:
+                self._refresh_in_background(key, path, params, endpoint)
+            return data
+
+        data = self._fetch(path, params, endpoint)
+        self.cache.set(key, endpoint, data)
+        return data
+
+    def _refresh_in_background(self, key, path, params, endpoint):
+        with self._stats_lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.cache.set(key, endpoint, self._fetch(path, params, endpoint))
+            except Exception as e:
+                print(f"Error refreshing cached Deezer response {key}: {e}")
+            finally:
+                with self._stats_lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name="deezer-refresh", daemon=True).start()
+
+    def _fetch(self, path, params, endpoint):
+        """Network GET with rate limiting and retries"""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        started = time.monotonic()
+        attempt = 0
+        self.call_started()
+
+        while True:
+            try:
+                if self.limiter is not None:
+                    waited = self.limiter.acquire(self.rate_limit_timeout)
+                    if waited:
+                        self.record_rate_limit_wait(waited)
+                response = self.session.get(url, params=params, timeout=self.timeout)
+                if response.status_code in _RETRYABLE_STATUS and attempt < self.max_retries:
+                    raise requests.HTTPError(f"{response.status_code} from Deezer", response=response)
+                response.raise_for_status()
+                data = response.json()
+                if isinstance(data, dict) and data.get('error'):
+                    error = data['error']
+                    raise DeezerError(error.get('message', 'Deezer error'), error.get('code'))
+                self.record_call(endpoint, time.monotonic() - started, True, attempt)
+                return data
+
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError, DeezerError) as e:
+                retryable = (
+                    isinstance(e, (requests.ConnectionError, requests.Timeout))
+                    or (isinstance(e, requests.HTTPError) and e.response is not None
+                        and e.response.status_code in _RETRYABLE_STATUS)
+                    or (isinstance(e, DeezerError) and e.code in _RETRYABLE_DEEZER_CODES)
+                )
+                if not retryable or attempt >= self.max_retries:
+                    self.record_call(endpoint, time.monotonic() - started, False, attempt)
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+
+            except Exception:
+                self.record_call(endpoint, time.monotonic() - started, False, attempt)
+                raise
+
+    def search_albums(self, query, index=0, limit=5):
+        return self.get('search/album', params={'q': query, 'index': index, 'limit': limit})
+
+    def album(self, album_id):
+        return self.get(f'album/{album_id}')
+
+    def album_tracks(self, album_id):
+        return self.get(f'album/{album_id}/tracks')
+
+    def stats(self):
+        with self._stats_lock:
+            endpoints = {}
+            for endpoint, stat in self._endpoints.items():
+                endpoints[endpoint] = {
+                    'requests': stat['requests'],
+                    'errors': stat['errors'],
+                    'retries': stat['retries'],
+                    'avg_ms': round(stat['total_ms'] / stat['requests'], 3) if stat['requests'] else 0.0,
+                    'max_ms': round(stat['max_ms'], 3),
+                }
+            return {
+                'base_url': self.base_url,
+                'rate_limit_wait_ms': round(self._rate_limit_wait * 1000, 3),
+                'endpoints': endpoints,
+                'cache': self.cache.stats() if self.cache is not None else None,
+            }
@@ -1,14 +1,32 @@
-import requests
-from flask import Flask, request, jsonify, session
+import os
+from flask import Flask, request, jsonify, session, g
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import atexit
-from datetime import datetime, timedelta
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
 from flask_cors import CORS, cross_origin 
 #Added for login token
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
-from werkzeug.security import generate_password_hash, check_password_hash
 from traceback import format_exc
+from db_pool import ConnectionPool
+from search_cache import create_search_cache
+from persist_worker import WriteBehindQueue
+from cache_journal import CacheJournal
+from deezer_client import DeezerClient
+from deezer_cache import ResponseCache
+from single_flight import SingleFlight
+from random_sampler import AlbumIdSampler
+from album_backfill import AlbumBackfillWorker
+from user_cache import UserCache
+from password_hashing import PasswordHasher, HashingBusy
+from album_prefetch import AlbumPrefetcher
+from periodic_job import PeriodicJob
+from pagination import InvalidCursor, encode_cursor, decode_cursor
+from http_caching import HttpCache
+from metrics import MetricsRegistry
 
 app = Flask(__name__)
 # --- AUTH/SESSION CONFIG (ADD) ---
@@ -30,16 +48,229 @@ DB_CONFIG = {
     'port': '5432'
 }
 
-SESSION_CACHE = {}
+# Password hashing runs in its own process pool. Changing the method (cost)
+# rehashes each user's password the next time they log in.
+PASSWORD_HASH_METHOD = "scrypt:32768:8:1"
+PASSWORD_HASH_WORKERS = 2           # 0 = hash inline on the request thread
+PASSWORD_HASH_MAX_PENDING = 32      # queued + running hash jobs before logins get a 503
+
+# Identity cache for flask-login's user_loader
+USER_CACHE_TTL_SECONDS = 60
+USER_CACHE_MAX_ENTRIES = 10000
+
+# Connection pool sizing. search_path is set once per physical connection.
+DB_POOL_MIN_SIZE = 1
+DB_POOL_MAX_SIZE = 10
+DB_POOL_CHECKOUT_TIMEOUT = 5.0          # seconds to wait for a free connection
+DB_POOL_HEALTH_CHECK_INTERVAL = 30.0    # idle seconds before SELECT 1 on borrow
+
 CACHE_EXPIRY_MINUTES = 5
+SEARCH_CACHE_MAX_ENTRIES = 10000               # query:page entries
+SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024      # approx. JSON size of cached albums
+# memory:// is per process; sqlite:////dev/shm/search_cache.sqlite3 (one host) or
+# redis://host:6379/0 lets every worker process see every other worker's searches
+SEARCH_CACHE_URL = os.environ.get("SEARCH_CACHE_URL", "memory://")
+
+# Browser caching of album responses (ETag + 304s) and compression
+ALBUM_CACHE_CONTROL = "private, max-age=60"     # detail pages include the live community rating
+ALBUM_PAGE_CACHE_CONTROL = "private, no-cache"  # per-user; revalidated by ETag on every view
+SEARCH_CACHE_CONTROL = f"private, max-age={CACHE_EXPIRY_MINUTES * 60}"
+HTTP_COMPRESS_MIN_BYTES = 1024                  # smaller JSON bodies are sent as-is
+
+# Albums leaving the search cache are saved by a background worker, not the request.
+PERSIST_QUEUE_MAX_PENDING = 5000    # albums waiting to be saved
+PERSIST_BATCH_SIZE = 50
+PERSIST_FLUSH_INTERVAL = 2.0        # seconds
+PERSIST_PUT_TIMEOUT = 0.5           # seconds a full queue may block a request before dropping
+
+# Local journal of search cache writes (memory:// backend only), replayed at
+# startup so cached albums that weren't saved yet survive a crash; "" disables.
+SEARCH_JOURNAL_PATH = os.environ.get(
+    "SEARCH_JOURNAL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "search_cache.journal")
+)
+SEARCH_JOURNAL_COMPACT_BYTES = 32 * 1024 * 1024
+SEARCH_JOURNAL_FSYNC = False        # True also survives power loss, at a disk flush per search
+
+# Shutdown flush of the search cache: parallel batches under a deadline; what
+# misses it stays in the journal and is saved after the next start.
+SHUTDOWN_FLUSH_WORKERS = 4          # keep at or below DB_POOL_MAX_SIZE
+SHUTDOWN_FLUSH_DEADLINE = float(os.environ.get("SHUTDOWN_FLUSH_DEADLINE", "10"))   # seconds
+
+# Deezer allows 50 requests / 5 seconds; stay under it and queue bursts locally.
+DEEZER_BASE_URL = os.environ.get("DEEZER_BASE_URL", "https://api.deezer.com")
+DEEZER_TIMEOUT = 10
+DEEZER_MAX_RETRIES = 3
+DEEZER_RATE_PER_SECOND = 10
+DEEZER_BURST = 50
+
+# On-disk cache of Deezer responses (survives restarts). TTLs in seconds per
+# endpoint; endpoints not listed here (e.g. search) are always fetched live.
+DEEZER_CACHE_PATH = os.environ.get(
+    "DEEZER_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "deezer_cache.sqlite3")
+)
+DEEZER_CACHE_TTLS = {
+    'album/{id}': 6 * 60 * 60,
+    'album/{id}/tracks': 6 * 60 * 60,
+}
+DEEZER_CACHE_STALE_SECONDS = 24 * 60 * 60   # serve expired entries this long while refreshing
+DEEZER_CACHE_MAX_ENTRIES = 50000
+UPSTREAM_FETCH_WORKERS = 16     # threads for parallel Deezer requests within a request
+
+# Search our own catalog first (needs DB/migrations/001_album_search_index.sql);
+# Deezer is only asked when the local page has fewer than `limit` results.
+LOCAL_SEARCH_ENABLED = True
+LOCAL_SEARCH_MIN_QUERY_LENGTH = 3   # trigram indexes can't help with shorter patterns
+
+# Batch library/rating endpoints (/v1/albums/batch/*)
+BATCH_MAX_ITEMS = 5000                  # items per request; larger bodies get a 413
+BATCH_STATEMENT_TIMEOUT_MS = 10000      # per statement, so one huge batch can't hold locks forever
+
+# /v1/me/albums and /v1/me/rated-albums page sizes (only when ?limit= or ?cursor= is
+# given; without them the whole list is returned as before)
+USER_LIST_PAGE_DEFAULT = 50
+USER_LIST_PAGE_MAX = 200
+
+RANDOM_ALBUMS_REFRESH_SECONDS = 300     # how often the in-memory album id list is reloaded
+
+# After a search, load full details for the top results in the background
+PREFETCH_ENABLED = True
+PREFETCH_TOP_N = 3
+PREFETCH_WORKERS = 4
+PREFETCH_USER_BUDGET = 30       # prefetches per user per PREFETCH_BUDGET_WINDOW
+PREFETCH_BUDGET_WINDOW = 60     # seconds
+PREFETCH_RATE_RESERVE = 20      # Deezer tokens left to user requests; prefetches are skipped below it
+
+# Background job that fills in missing cover_url/release_date from Deezer
+BACKFILL_WORKERS = 4            # concurrent Deezer fetches
+BACKFILL_BATCH_SIZE = 50
+BACKFILL_SCAN_INTERVAL = 600    # seconds between full scans of the album table
+
+# DB/migrations the code expects, with what breaks without them. Applied
+# versions are read from music.schema_migrations when the pool is created;
+# missing ones are logged at startup.
+DB_MIGRATIONS = {
+    1: "album_search_index: local search fails (no pg_trgm), every search goes to Deezer",
+    2: "user_list_keys: rating and list upserts fail (ON CONFLICT needs the keys)",
+    3: "album_rating_aggregates: album ratings are computed from user_rating on every view",
+    4: "user_list_pagination: paginated /v1/me lists scan instead of using an index",
+}
+
+# album.rating_count/rating_sum are maintained by triggers (DB/migrations/003);
+# this job recomputes them from user_rating in case anything drifted.
+RATING_AGGREGATE_CHECK_INTERVAL = 24 * 60 * 60  # seconds
+
+# Prometheus-text metrics at /api/metrics: latency histograms, error counts and
+# in-flight gauges for routes, DB queries and Deezer calls; cache hit/miss counts
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+
+HTTP_CACHE = HttpCache(min_bytes=HTTP_COMPRESS_MIN_BYTES)
+
+METRICS = MetricsRegistry()
+HTTP_METRICS = METRICS.operation("http_request", "HTTP requests (errors are 5xx responses)",
+                                 "http_requests_in_flight", ("method", "route"))
+HTTP_RESPONSES = METRICS.counter("http_responses_total", "HTTP responses by status", ("method", "route", "status"))
+DB_METRICS = METRICS.operation("db_query", "Database queries by calling function",
+                               "db_queries_in_flight", ("query",))
+DEEZER_METRICS = METRICS.operation("deezer_request", "Deezer API calls, retries included",
+                                   "deezer_requests_in_flight", ("endpoint",))
+SEARCH_CACHE_EXPIRE_TIME = METRICS.histogram("search_cache_expire_duration_seconds",
+                                             "Search cache expiry sweeps: latency in seconds")
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def get_db_pool():
+    """Return the process-wide connection pool, creating it on first use"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                pool = ConnectionPool(
+                    DB_CONFIG,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    checkout_timeout=DB_POOL_CHECKOUT_TIMEOUT,
+                    health_check_interval=DB_POOL_HEALTH_CHECK_INTERVAL,
+                    init_sql="SET search_path TO music, public;",
+                    observer=DB_METRICS if METRICS_ENABLED else None
+                )
+                pool.fill()
+                with pool.connection() as conn:
+                    check_schema(conn)
+                _db_pool = pool
+    return _db_pool
+
+APPLIED_MIGRATIONS = None   # versions from music.schema_migrations; None until checked
+
+def check_schema(conn):
+    """Record which DB_MIGRATIONS are applied and log loudly about the missing ones"""
+    global APPLIED_MIGRATIONS
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('music.schema_migrations') IS NOT NULL")
+            applied = set()
+            if cur.fetchone()[0]:
+                cur.execute("SELECT version FROM music.schema_migrations")
+                applied = {row[0] for row in cur.fetchall()}
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"Schema check failed: {e}")
+        return
+    APPLIED_MIGRATIONS = applied
+    for version, effect in sorted(DB_MIGRATIONS.items()):
+        if version not in applied:
+            print(f"WARNING: DB/migrations/{version:03d} is not applied - {effect}")
+
+def check_database():
+    """Open the pool (and check the schema) at startup rather than on the first request"""
+    try:
+        get_db_pool()
+    except Exception as e:
+        print(f"Database not reachable at startup: {e}")
+
+_deezer_client = None
+UPSTREAM_EXECUTOR = ThreadPoolExecutor(max_workers=UPSTREAM_FETCH_WORKERS, thread_name_prefix="deezer-fetch")
+ALBUM_LOADS = SingleFlight()
+
+def get_deezer_client():
+    """Return the shared Deezer client used by every upstream call"""
+    global _deezer_client
+    if _deezer_client is None:
+        cache = None
+        try:
+            cache = ResponseCache(
+                DEEZER_CACHE_PATH,
+                DEEZER_CACHE_TTLS,
+                stale_seconds=DEEZER_CACHE_STALE_SECONDS,
+                max_entries=DEEZER_CACHE_MAX_ENTRIES
+            )
+        except Exception as e:
+            print(f"Deezer response cache disabled: {e}")
+        set_deezer_client(DeezerClient(
+            DEEZER_BASE_URL,
+            timeout=DEEZER_TIMEOUT,
+            max_retries=DEEZER_MAX_RETRIES,
+            rate_per_second=DEEZER_RATE_PER_SECOND,
+            burst=DEEZER_BURST,
+            cache=cache
+        ))
+    return _deezer_client
+
+def set_deezer_client(client):
+    """Swap the shared Deezer client (e.g. one pointed at a local stub server)"""
+    global _deezer_client
+    if METRICS_ENABLED and client.observer is None:
+        client.observer = DEEZER_METRICS
+    _deezer_client = client
 
 def get_db_connection():
-    """Create database connection with music schema set"""
-    conn = psycopg2.connect(**DB_CONFIG)
-    with conn.cursor() as cur:
-        cur.execute("SET search_path TO music, public;")
-    conn.commit()
-    return conn
+    """
+    Borrow a pooled database connection with music schema set.
+    Use as `with get_db_connection() as conn:` (commits/rolls back, then
+    returns the connection to the pool) or call conn.close() when done.
+    """
+    return get_db_pool().connection()
 
 class UserObj(UserMixin):
     def __init__(self, row):
@@ -51,32 +282,53 @@ class UserObj(UserMixin):
 def _row_to_user(row):
     return UserObj(row) if row else None
 
+PASSWORD_HASHER = PasswordHasher(
+    PASSWORD_HASH_METHOD,
+    workers=PASSWORD_HASH_WORKERS,
+    max_pending=PASSWORD_HASH_MAX_PENDING
+)
+
 login_manager = LoginManager()
 login_manager.init_app(app)
 
+USER_CACHE = UserCache(ttl_seconds=USER_CACHE_TTL_SECONDS, max_entries=USER_CACHE_MAX_ENTRIES)
+
 @login_manager.user_loader
 def load_user(user_id: str):
     try:
-        return find_user_by_id(int(user_id))
+        return find_user_by_id(int(user_id), cached=True)
     except Exception:
         return None
 
+def invalidate_cached_user(user_id):
+    """Drop a user from USER_CACHE; call on logout and whenever their app_user row changes"""
+    USER_CACHE.invalidate(int(user_id))
+
+# Module-level so bench/explain_hot_queries.py checks the plans of this exact text
+FIND_USER_BY_USERNAME_SQL = """
+    SELECT user_id, user_name, user_password
+    FROM app_user
+    WHERE lower(user_name) = lower(%(user_name)s)
+    LIMIT 1
+"""
+
 def find_user_by_username(username: str):
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT user_id, user_name, user_password
-                FROM app_user
-                WHERE lower(user_name) = lower(%s)
-                LIMIT 1
-            """, (username,))
+            cur.execute(FIND_USER_BY_USERNAME_SQL, {'user_name': username})
             row = cur.fetchone()
             return _row_to_user(row)
     finally:
         conn.close()
 
-def find_user_by_id(user_id: int):
+def find_user_by_id(user_id: int, cached: bool = False):
+    """cached=True serves the user from USER_CACHE when possible (used by load_user)"""
+    if cached:
+        row = USER_CACHE.get(user_id)
+        if row is not None:
+            return _row_to_user(row)
+
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -87,13 +339,26 @@ def find_user_by_id(user_id: int):
                 LIMIT 1
             """, (user_id,))
             row = cur.fetchone()
+            if cached and row:
+                USER_CACHE.set(user_id, row)
             return _row_to_user(row)
     finally:
         conn.close()
 
+def update_user_password_hash(user_id, pw_hash: str):
+    """Store a new password hash for a user and drop their cached row"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE app_user
+                SET user_password = %s
+                WHERE user_id = %s
+            """, (pw_hash, int(user_id)))
+    invalidate_cached_user(user_id)
+
 def create_user(username: str, password: str):
-    """Uses DB identity to auto-generate user_id; stores bcrypt hash."""
-    pw_hash = generate_password_hash(password)
+    """Uses DB identity to auto-generate user_id; stores a werkzeug (scrypt) hash."""
+    pw_hash = PASSWORD_HASHER.hash(password)
     conn = get_db_connection()
     try:
         with conn.cursor(cursor_factory=RealDictCursor) as cur:
@@ -109,41 +374,130 @@ def create_user(username: str, password: str):
         conn.close()
 
 
+def _save_albums_batch(albums):
+    """Write-behind flush: save a batch of albums, return how many were saved"""
+    return sum(1 for album_id in save_albums_to_db(albums) if album_id is not None)
+
+PERSIST_QUEUE = WriteBehindQueue(
+    _save_albums_batch,
+    max_pending=PERSIST_QUEUE_MAX_PENDING,
+    batch_size=PERSIST_BATCH_SIZE,
+    flush_interval=PERSIST_FLUSH_INTERVAL,
+    put_timeout=PERSIST_PUT_TIMEOUT
+)
+
+def _on_cache_remove(key, albums, reason):
+    """Albums leaving the search cache (expired or evicted) are queued for saving to the database"""
+    # Expiry runs on the request path, once per page: no waiting on a full
+    # queue here, or one search could stall put_timeout per expired page
+    PERSIST_QUEUE.submit(albums, block=False)
+    print(f"Cleaned up {reason} cache entry: {key}")
+
+SESSION_CACHE = create_search_cache(
+    SEARCH_CACHE_URL,
+    ttl_seconds=CACHE_EXPIRY_MINUTES * 60,
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=SEARCH_CACHE_MAX_BYTES,
+    on_remove=_on_cache_remove
+)
+
+def _journal_snapshot():
+    return SESSION_CACHE.items_with_ttl(), PERSIST_QUEUE.pending()
+
+# A shared backend outlives any one process and needs no local journal
+SEARCH_JOURNAL = CacheJournal(
+    SEARCH_JOURNAL_PATH,
+    compact_bytes=SEARCH_JOURNAL_COMPACT_BYTES,
+    snapshot=_journal_snapshot,
+    fsync=SEARCH_JOURNAL_FSYNC
+) if SEARCH_JOURNAL_PATH and not SESSION_CACHE.shared else None
+
+_journal_start_lock = threading.Lock()
+_journal_started = False
+
+def restore_search_cache():
+    """
+    Replay the search cache journal into this process's cache and queue
+    albums that were cached but never saved; journaling starts here. Runs
+    once per process: at startup from __main__ and the ASGI lifespan, and
+    under any other WSGI host (gunicorn, flask run) on the first search
+    cache write. Only one process can hold the journal.
+    """
+    global _journal_started
+    if SEARCH_JOURNAL is None:
+        return
+    with _journal_start_lock:
+        if _journal_started:
+            return
+        _journal_started = True
+        try:
+            opened = SEARCH_JOURNAL.open()
+        except OSError as e:
+            print(f"WARNING: cannot open search cache journal {SEARCH_JOURNAL_PATH} ({e}), not journaling")
+            return
+        if not opened:
+            print(f"WARNING: search cache journal {SEARCH_JOURNAL_PATH} is held by another process, not journaling")
+            return
+        pages, unsaved = SEARCH_JOURNAL.replay()
+        for key, albums, seconds_left in pages:
+            SESSION_CACHE.store(key, albums, ttl_seconds=seconds_left)
+        if unsaved:
+            PERSIST_QUEUE.submit(unsaved)
+        SEARCH_JOURNAL.compact(*_journal_snapshot())
+        print(f"Restored {len(pages)} search cache pages from the journal, queued {len(unsaved)} unsaved albums")
+
 def store_search_session(key, data):
-    """Store search results temporarily in memory with timestamp"""
-    SESSION_CACHE[key] = {
-        'data': data,
-        'timestamp': datetime.now()
-    }
+    """Store search results temporarily in the search cache (expire after CACHE_EXPIRY_MINUTES)"""
+    if SEARCH_JOURNAL is not None and not _journal_started:
+        restore_search_cache()
+    SESSION_CACHE.store(key, data)
+    if SEARCH_JOURNAL is not None:
+        SEARCH_JOURNAL.record_store(key, data, SESSION_CACHE.ttl_seconds)
 
 def get_from_search_session(album_id):
     """Retrieve album data from session cache by deezer_id"""
     clean_expired_cache()
-    
-    for key, cache_entry in SESSION_CACHE.items():
-        for album in cache_entry['data']:
-            if str(album['deezer_id']) == str(album_id):
-                return album
-    return None
+    return SESSION_CACHE.get_album(album_id)
 
 def clean_expired_cache():
-    """Remove expired cache entries and save them to database"""
-    now = datetime.now()
-    expired_keys = []
-    
-    for key, cache_entry in SESSION_CACHE.items():
-        if now - cache_entry['timestamp'] > timedelta(minutes=CACHE_EXPIRY_MINUTES):
-            expired_keys.append(key)
-            for album in cache_entry['data']:
-                save_album_to_db(album)
-    
-    for key in expired_keys:
-        del SESSION_CACHE[key]
-        print(f"Cleaned up expired cache entry: {key}")
+    """Remove expired cache entries and queue them to be saved to database"""
+    if not METRICS_ENABLED:
+        SESSION_CACHE.expire()
+        return
+    started = time.perf_counter()
+    SESSION_CACHE.expire()
+    SEARCH_CACHE_EXPIRE_TIME.observe((), time.perf_counter() - started)
 #added to just check if it is alive
 @app.get("/api/ping")
 def api_ping():
     return "pong", 200, {"Content-Type": "text/plain"}
+@app.after_request
+def _compress_response(response):
+    return HTTP_CACHE.compress(response)
+
+def observe_request(method, route, status, seconds):
+    """Record one finished request; route is the URL rule, e.g. /v1/albums/<album_id>"""
+    HTTP_METRICS.finish((method, route), seconds, status < 500)
+    HTTP_RESPONSES.inc((method, route, status))
+
+@app.before_request
+def _start_request_metrics():
+    if METRICS_ENABLED:
+        g.metrics_started = time.perf_counter()
+        HTTP_METRICS.start()
+
+@app.after_request
+def _record_response_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+@app.teardown_request
+def _finish_request_metrics(exc):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe_request(request.method, route, g.pop('metrics_status', 500), time.perf_counter() - started)
+
 def _json_error(msg: str, code: int = 500):
     # Always return JSON on errors so the frontend can show messages
     return jsonify({"error": msg}), code
@@ -159,155 +513,371 @@ def _handle_unhandled(e):
 def api_health():
     return jsonify({"ok": True})
 
-def fetch_deezer_albums(query, page, limit):
+def _cache_counts():
+    """(cache, hits, misses) for the caches that count their lookups"""
+    search = SESSION_CACHE.stats()
+    users = USER_CACHE.stats()
+    http = HTTP_CACHE.stats()
+    counts = [
+        ('search', search['hits'], search['misses']),
+        ('user', users['hits'], users['misses']),
+        # conditional GETs answered with a 304
+        ('http_validation', http['not_modified'], http['validated_responses'] - http['not_modified']),
+    ]
+    deezer_cache = _deezer_client.cache if _deezer_client is not None else None
+    if deezer_cache is not None:
+        responses = deezer_cache.stats()
+        counts.append(('deezer_response', responses['fresh_hits'] + responses['stale_hits'], responses['misses']))
+    return counts
+
+def _cache_hit_ratios():
+    return [((name,), round(hits / (hits + misses), 4) if hits + misses else None)
+            for name, hits, misses in _cache_counts()]
+
+def _db_pool_connections():
+    if _db_pool is None:
+        return []
+    pool = _db_pool.stats()
+    return [(('in_use',), pool['in_use']), (('idle',), pool['idle']), (('waiting',), pool['waiting'])]
+
+METRICS.callback("cache_hits_total", "counter", "Cache lookups answered from the cache", ("cache",),
+                 lambda: [((name,), hits) for name, hits, _ in _cache_counts()])
+METRICS.callback("cache_misses_total", "counter", "Cache lookups that missed", ("cache",),
+                 lambda: [((name,), misses) for name, _, misses in _cache_counts()])
+METRICS.callback("cache_hit_ratio", "gauge", "Share of cache lookups that hit, since start", ("cache",),
+                 _cache_hit_ratios)
+METRICS.callback("search_cache_entries", "gauge", "Pages in the search cache", (),
+                 lambda: [((), SESSION_CACHE.stats()['entries'])])
+METRICS.callback("persist_queue_depth", "gauge", "Albums waiting for the write-behind worker", (),
+                 lambda: [((), PERSIST_QUEUE.stats()['queue_depth'])])
+METRICS.callback("db_pool_connections", "gauge", "Database pool connections (waiting: borrowers queued)",
+                 ("state",), _db_pool_connections)
+
+@app.get("/api/metrics")
+def api_metrics():
+    """Prometheus text format; scrape this instead of polling /api/stats"""
+    return METRICS.render(), 200, {"Content-Type": MetricsRegistry.CONTENT_TYPE}
+
+@app.get("/api/stats")
+def api_stats():
+    """Runtime stats used for sizing the pool/caches under load"""
+    return jsonify({
+        "db_pool": _db_pool.stats() if _db_pool is not None else None,
+        "search_cache": SESSION_CACHE.stats(),
+        "persist_queue": PERSIST_QUEUE.stats(),
+        "search_journal": SEARCH_JOURNAL.stats() if SEARCH_JOURNAL is not None else None,
+        "deezer": get_deezer_client().stats(),
+        "album_loads": ALBUM_LOADS.stats(),
+        "random_albums": RANDOM_ALBUM_IDS.stats(),
+        "album_backfill": ALBUM_BACKFILL.stats(),
+        "user_cache": USER_CACHE.stats(),
+        "password_hashing": PASSWORD_HASHER.stats(),
+        "album_prefetch": ALBUM_PREFETCH.stats(),
+        "album_search": _search_stats(),
+        "rating_aggregate_check": RATING_AGGREGATE_CHECK.stats(),
+        "http_cache": HTTP_CACHE.stats()
+    })
+
+def deezer_search_window(page, limit, local_albums, local_total):
+    """
+    (index, limit) of the Deezer results on a search page. Pages list all
+    local hits first and Deezer's results after them, so Deezer's part
+    starts where the local hits left off rather than at (page - 1) * limit.
+    """
+    return max(0, (page - 1) * limit - local_total), limit - len(local_albums)
+
+def fetch_deezer_albums(query, index, limit):
     """Fetch albums from Deezer API"""
-    url = f"https://api.deezer.com/search/album?q={query}&index={(page-1)*limit}&limit={limit}"
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.json()
+        return get_deezer_client().search_albums(query, index=index, limit=limit)
     except Exception as e:
         print(f"Error fetching from Deezer: {e}")
         return {'data': [], 'total': 0}
 
-def get_or_create_author(cursor, artist_name, artist_id):
-    """Get existing author or create new one using Deezer artist_id"""
-    cursor.execute(
-        "SELECT author_id FROM author WHERE author_id = %s LIMIT 1",
-        (int(artist_id),)
-    )
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    # Create new artist in database using the artist_id we get from Deezer.
-    cursor.execute(
-        "INSERT INTO author (author_id, author_name) VALUES (%s, %s) RETURNING author_id",
-        (int(artist_id), artist_name)
+_search_counts_lock = threading.Lock()
+_search_counts = {'local': 0, 'merged': 0, 'upstream': 0, 'local_errors': 0}
+
+def count_search(outcome):
+    with _search_counts_lock:
+        _search_counts[outcome] += 1
+
+def _search_stats():
+    with _search_counts_lock:
+        counts = dict(_search_counts)
+    searches = counts['local'] + counts['merged'] + counts['upstream']
+    counts['local_ratio'] = round(counts['local'] / searches, 4) if searches else 0.0
+    return counts
+
+# Shared with the async serving mode (async_service.py)
+LOCAL_SEARCH_SQL = """
+    WITH matches AS (
+        SELECT album_id FROM album WHERE album_name ILIKE %(pattern)s
+        UNION
+        SELECT a.album_id
+        FROM author au
+        JOIN album a ON a.author_id = au.author_id
+        WHERE au.author_name ILIKE %(pattern)s
     )
-    return cursor.fetchone()[0]
+    SELECT a.album_id, a.album_name, a.cover_url, au.author_id, au.author_name,
+           COUNT(*) OVER () AS total
+    FROM matches m
+    JOIN album a ON a.album_id = m.album_id
+    JOIN author au ON au.author_id = a.author_id
+    ORDER BY GREATEST(similarity(a.album_name, %(query)s),
+                      similarity(au.author_name, %(query)s)) DESC,
+             a.album_id
+    LIMIT %(limit)s OFFSET %(offset)s
+"""
+
+def local_search_params(query, page, limit):
+    pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    return {'pattern': pattern, 'query': query, 'limit': limit, 'offset': (page - 1) * limit}
+
+def local_search_results(rows):
+    """(albums, total) from LOCAL_SEARCH_SQL rows; albums use the Deezer search result keys"""
+    albums = [{
+        'deezer_id': str(row['album_id']),
+        'title': row['album_name'],
+        'artist_name': row['author_name'],
+        'artist_id': str(row['author_id']),
+        'cover_url': row['cover_url'],
+        'release_date': None
+    } for row in rows]
+    return albums, (rows[0]['total'] if rows else 0)
+
+def search_local_albums(query, page, limit):
+    """
+    Search album titles and artist names in our own catalog.
+    Returns (albums, total) ranked by trigram similarity.
+    """
+    with get_db_connection() as conn:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(LOCAL_SEARCH_SQL, local_search_params(query, page, limit))
+            return local_search_results(cur.fetchall())
 
-def get_or_create_genre(cursor, genre_id, genre_name='Unknown'):
-    """Get existing genre or create new one using Deezer genre_id"""
-    if not genre_id:
-        genre_id = 0   # Need to figure out where to get genre information on Deezer.
-    
-    cursor.execute(
-        "SELECT genre_id FROM genre WHERE genre_id = %s LIMIT 1",
-        (int(genre_id),)
-    )
-    result = cursor.fetchone()
-    
-    if result:
-        return result[0]
-    
-    # Create new genre with Deezer genre_id
-    cursor.execute(
-        "INSERT INTO genre (genre_id, genre_name) VALUES (%s, %s) RETURNING genre_id",
-        (int(genre_id), genre_name)
+def merge_search_results(local_albums, local_total, deezer_response, limit):
+    """
+    Local hits first, then Deezer results not already listed, up to limit.
+    Returns (session_data, display_results, total); session_data holds the
+    full data of the Deezer results, which still need the search cache.
+    total is local plus Deezer results, the length of the list pages walk.
+    """
+    session_data = []
+    total = local_total
+    if deezer_response is not None:
+        total += deezer_response.get('total', 0)
+        seen = {album['deezer_id'] for album in local_albums}
+        for album in deezer_response.get('data', []):
+            full_album_data = {
+                'deezer_id': str(album['id']),
+                'title': album['title'],
+                'artist_name': album['artist']['name'],
+                'artist_id': str(album['artist']['id']),
+                'cover_url': album.get('cover_medium'),
+                'release_date': None  # Will be fetched when user clicks on album
+            }
+            if full_album_data['deezer_id'] not in seen:
+                seen.add(full_album_data['deezer_id'])
+                session_data.append(full_album_data)
+        session_data = session_data[:limit - len(local_albums)]
+
+    display_results = [{
+        'deezer_id': album['deezer_id'],
+        'title': album['title'],
+        'artist_name': album['artist_name'],
+        'cover_url': album['cover_url']
+    } for album in local_albums + session_data]
+    return session_data, display_results, total
+
+def _album_rows(albums):
+    """
+    Build de-duplicated row tuples for author, genre, album and song from
+    album dicts. Later albums win on duplicate ids (a single multi-row
+    INSERT ... ON CONFLICT can't touch the same row twice), and rows are
+    sorted by key so concurrent batches lock rows in the same order.
+    """
+    authors = {}
+    genres = {}
+    album_rows = {}
+    song_rows = {}
+
+    for album_data in albums:
+        deezer_album_id = int(album_data['deezer_id'])
+        deezer_artist_id = int(album_data['artist_id'])
+        deezer_genre_id = int(album_data.get('genre_id') or 0)  # Need to figure out where to get genre information on Deezer.
+
+        authors[deezer_artist_id] = album_data['artist_name']
+        genres.setdefault(deezer_genre_id, 'Unknown')
+        previous = album_rows.get(deezer_album_id)
+        album_rows[deezer_album_id] = (
+            deezer_album_id,
+            deezer_artist_id,
+            deezer_genre_id,
+            album_data['title'],
+            None,
+            album_data.get('release_date') or (previous[5] if previous else None),
+            album_data.get('cover_url') or (previous[6] if previous else '')
+        )
+        for track in album_data.get('tracks') or []:
+            deezer_track_id = int(track['id'])
+            song_rows[deezer_track_id] = (
+                deezer_track_id,
+                deezer_artist_id,
+                deezer_album_id,
+                track['title'],
+                track.get('track_position', 0)
+            )
+
+    return (
+        sorted(authors.items()),
+        sorted((genre_id, name) for genre_id, name in genres.items()),
+        [album_rows[k] for k in sorted(album_rows)],
+        [song_rows[k] for k in sorted(song_rows)]
     )
-    return cursor.fetchone()[0]
 
-def save_album_to_db(album_data):
-    """Save album and its songs to the database using Deezer IDs"""
+def _upsert_albums(cur, albums):
+    """Write albums and their tracks with one multi-row statement per table"""
+    authors, genres, album_rows, song_rows = _album_rows(albums)
+
+    execute_values(cur, """
+        INSERT INTO author (author_id, author_name)
+        VALUES %s
+        ON CONFLICT (author_id) DO NOTHING
+    """, authors)
+
+    execute_values(cur, """
+        INSERT INTO genre (genre_id, genre_name)
+        VALUES %s
+        ON CONFLICT (genre_id) DO NOTHING
+    """, genres)
+
+    # Existing albums only get missing data filled in (cover_url, release_date)
+    execute_values(cur, """
+        INSERT INTO album (album_id, author_id, genre_id, album_name, album_rating, release_date, cover_url)
+        VALUES %s
+        ON CONFLICT (album_id) DO UPDATE
+        SET cover_url = COALESCE(NULLIF(EXCLUDED.cover_url, ''), album.cover_url),
+            release_date = COALESCE(EXCLUDED.release_date, album.release_date)
+    """, album_rows, page_size=500)
+
+    if song_rows:
+        execute_values(cur, """
+            INSERT INTO song (song_id, author_id, album_id, song_name, song_num)
+            VALUES %s
+            ON CONFLICT (song_id) DO NOTHING
+        """, song_rows, page_size=1000)
+
+    return len(album_rows), len(song_rows)
+
+def save_albums_to_db(albums):
+    """
+    Save many albums and their songs in one transaction.
+    Returns a list of album_ids in the same order as albums (None for albums
+    that could not be saved). If the batch fails as a whole, albums are
+    retried one by one so a single bad record doesn't lose the rest.
+    """
+    albums = list(albums)
+    if not albums:
+        return []
+
     try:
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                deezer_album_id = int(album_data['deezer_id'])
-                deezer_artist_id = int(album_data['artist_id'])
-                deezer_genre_id = album_data.get('genre_id', 0)
-                release_date = album_data.get('release_date', None)
-                cover_url = album_data.get('cover_url', '')
-                
-                author_id = get_or_create_author(
-                    cur, 
-                    album_data['artist_name'],
-                    deezer_artist_id
-                )
-                
-                genre_id = get_or_create_genre(
-                    cur, 
-                    deezer_genre_id,
-                    'Unknown'
-                )
-                
-                cur.execute(
-                    "SELECT album_id FROM album WHERE album_id = %s",
-                    (deezer_album_id,)
-                )
-                existing = cur.fetchone()
-                
-                if existing:
-                    album_id = existing[0]
-                    print(f"Album '{album_data['title']}' already exists with ID: {album_id}")
-                    
-                    # Update the existing album with new data (cover_url, release_date, etc.)
-                    cur.execute(
-                        """
-                        UPDATE album 
-                        SET cover_url = COALESCE(%s, cover_url),
-                            release_date = COALESCE(%s, release_date)
-                        WHERE album_id = %s
-                        """,
-                        (cover_url, release_date, album_id)
-                    )
-                    print(f"Updated album '{album_data['title']}' with new data")
-                else:
-                    # Insert new album
-                    cur.execute(
-                        """
-                        INSERT INTO album (album_id, author_id, genre_id, album_name, album_rating, release_date, cover_url)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        RETURNING album_id
-                        """,
-                        (deezer_album_id, author_id, genre_id, album_data['title'], None, release_date, cover_url)
-                    )
-                    album_id = cur.fetchone()[0]
-                    print(f"Saved album '{album_data['title']}' with ID: {album_id}")
-                
-                if 'tracks' in album_data and album_data['tracks']:
-                    for track in album_data['tracks']:
-                        deezer_track_id = int(track['id'])
-                        
-                        cur.execute(
-                            "SELECT song_id FROM song WHERE song_id = %s",
-                            (deezer_track_id,)
-                        )
-                        if cur.fetchone():
-                            continue  
-                        
-                        cur.execute(
-                            """
-                            INSERT INTO song (song_id, author_id, album_id, song_name, song_num)
-                            VALUES (%s, %s, %s, %s, %s)
-                            """,
-                            (
-                                deezer_track_id,
-                                author_id,
-                                album_id,
-                                track['title'],
-                                track.get('track_position', 0)
-                            )
-                        )
-                    print(f"Saved {len(album_data['tracks'])} tracks for album ID: {album_id}")
-                
-                conn.commit()
-                return album_id
-                
+                album_count, song_count = _upsert_albums(cur, albums)
+        print(f"Saved {album_count} albums and {song_count} tracks to database")
+        album_ids = [int(album['deezer_id']) for album in albums]
+        if SEARCH_JOURNAL is not None:
+            SEARCH_JOURNAL.record_persisted(album_ids)
+        return album_ids
+
     except Exception as e:
-        print(f"Error saving album to database: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+        if len(albums) == 1:
+            print(f"Error saving album to database: {e}")
+            import traceback
+            traceback.print_exc()
+            return [None]
+
+        print(f"Error saving batch of {len(albums)} albums, retrying one by one: {e}")
+        return [save_albums_to_db([album])[0] for album in albums]
+
+def save_album_to_db(album_data):
+    """Save album and its songs to the database using Deezer IDs"""
+    return save_albums_to_db([album_data])[0]
+
+def _save_in_parallel(albums, workers, deadline):
+    """
+    Save albums in PERSIST_BATCH_SIZE batches on `workers` threads until
+    time.monotonic() passes deadline; returns the albums not known to be
+    saved. Daemon threads rather than an executor: this runs from atexit,
+    after executors stop taking work, and a batch still running at the
+    deadline must not hold up the exit.
+    """
+    batches = iter([albums[i:i + PERSIST_BATCH_SIZE] for i in range(0, len(albums), PERSIST_BATCH_SIZE)])
+    saved = set()
+    lock = threading.Lock()
+
+    def worker():
+        while time.monotonic() < deadline:
+            with lock:
+                batch = next(batches, None)
+            if batch is None:
+                return
+            album_ids = save_albums_to_db(batch)
+            with lock:
+                saved.update(str(album_id) for album_id in album_ids if album_id is not None)
+
+    threads = [threading.Thread(target=worker, name=f"shutdown-flush-{n}", daemon=True)
+               for n in range(min(workers, -(-len(albums) // PERSIST_BATCH_SIZE)))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    with lock:
+        return [album for album in albums if str(album.get('deezer_id')) not in saved]
+
+def save_all_cache_to_db(timeout=None):
+    """
+    Save cached and queued albums to the database before shutdown, in
+    parallel batches, within SHUTDOWN_FLUSH_DEADLINE seconds. Albums the
+    journal shows were saved since they last changed are skipped; those
+    that miss the deadline stay in the journal for the next start.
+    """
+    if multiprocessing.parent_process() is not None:
+        return  # password hashing worker processes import this module too
+    timeout = SHUTDOWN_FLUSH_DEADLINE if timeout is None else timeout
+    started = time.monotonic()
+    deadline = started + timeout
+    if SESSION_CACHE.shared:
+        # A shared cache outlives this worker; its pages are saved by whichever
+        # process expires or evicts them, not by every worker on its way out
+        PERSIST_QUEUE.stop(flush=True, timeout=timeout)
+        return
+    journal = SEARCH_JOURNAL if SEARCH_JOURNAL is not None and SEARCH_JOURNAL.is_open else None
 
-def save_all_cache_to_db():
-    """Save all cached albums to database before shutdown"""
     print("Saving all cached albums to database...")
-    for key, cache_entry in SESSION_CACHE.items():
-        for album in cache_entry['data']:
-            save_album_to_db(album)
-    print("All cached albums saved to database")
+    albums = {}     # one copy each: the same album is often on several pages
+    for album in PERSIST_QUEUE.drain():
+        albums[str(album.get('deezer_id'))] = album
+    for key, page in SESSION_CACHE.items():
+        for album in page:
+            albums[str(album.get('deezer_id'))] = album
+    if journal is not None:
+        unsaved_ids = journal.unsaved(albums)
+        albums = {deezer_id: album for deezer_id, album in albums.items() if deezer_id in unsaved_ids}
+
+    unsaved = _save_in_parallel(list(albums.values()), SHUTDOWN_FLUSH_WORKERS, deadline)
+    # Batches the write-behind worker had already taken
+    PERSIST_QUEUE.stop(flush=True, timeout=max(0.0, deadline - time.monotonic()))
+
+    if journal is not None:
+        journal.compact(SESSION_CACHE.items_with_ttl(), unsaved + PERSIST_QUEUE.pending())
+        journal.close()
+    elapsed = time.monotonic() - started
+    if unsaved:
+        left = "left in the journal" if journal is not None else "not saved"
+        print(f"Shutdown flush deadline ({timeout}s) reached: {len(unsaved)} albums {left}")
+    else:
+        print(f"Saved {len(albums)} cached albums to database in {elapsed:.2f}s")
 
 
 
@@ -329,9 +899,12 @@ def api_register():
         user = create_user(username, password)
         if not user:
             return _json_error("Failed to create user", 500)
+        invalidate_cached_user(user.id)
 
         login_user(user, remember=True)
         return jsonify({"ok": True, "user": {"id": user.id, "user_name": user.user_name}})
+    except HashingBusy:
+        return _json_error("Server busy, please try again", 503)
     except Exception as e:
         print("REGISTER ERROR:\n", format_exc())
         return _json_error(f"register_failed: {e}", 500)
@@ -348,11 +921,20 @@ def api_login():
             return _json_error("username and password required", 400)
 
         user = find_user_by_username(username)
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not PASSWORD_HASHER.verify(user.password_hash, password):
             return _json_error("Invalid credentials", 401)
 
+        # Upgrade hashes made with an older PASSWORD_HASH_METHOD now that we know the password
+        if PASSWORD_HASHER.needs_rehash(user.password_hash):
+            try:
+                update_user_password_hash(user.id, PASSWORD_HASHER.hash(password))
+            except Exception as e:
+                print(f"Password rehash failed for user {user.id}: {e}")
+
         login_user(user, remember=True)
         return jsonify({"ok": True})
+    except HashingBusy:
+        return _json_error("Server busy, please try again", 503)
     except Exception as e:
         print("LOGIN ERROR:\n", format_exc())
         return _json_error(f"login_failed: {e}", 500)
@@ -362,6 +944,8 @@ def api_login():
 @login_required
 def api_logout():
     try:
+        invalidate_cached_user(current_user.id)
+
         # Tell flask-login to forget the user
         logout_user()
 
@@ -410,10 +994,18 @@ def add_cors_headers(resp):
 
 
 @app.route('/v1/search/albums', methods=['GET'])
+@HTTP_CACHE.cached(SEARCH_CACHE_CONTROL)
 def search_albums():
     """
-    Search for albums via Deezer API.
-    Returns minimal display data and caches full data in memory.
+    Search for albums in the local catalog, falling back to the Deezer API.
+    Returns minimal display data and caches full data of Deezer results in memory.
+
+    Pages walk one list: every local hit, then Deezer's results, so the page
+    where local hits run out is topped up from Deezer's first results and
+    later pages continue from there. A Deezer result that is also a local
+    hit on the same page is skipped, so a page can be short; one that is a
+    local hit on another page is listed again. Pages served only from local
+    hits don't ask Deezer, so their total counts local hits only.
     """
     query = request.args.get('q', '')
     page = int(request.args.get('page', 1))
@@ -421,108 +1013,293 @@ def search_albums():
     
     if not query:
         return jsonify({'error': 'Query parameter "q" is required'}), 400
-    
-    deezer_response = fetch_deezer_albums(query, page, limit)
-    
-    session_data = []
-    display_results = []
-    
-    for album in deezer_response.get('data', []):
-        full_album_data = {
-            'deezer_id': str(album['id']),
-            'title': album['title'],
-            'artist_name': album['artist']['name'],
-            'artist_id': str(album['artist']['id']),
-            'cover_url': album.get('cover_medium'),
-            'release_date': None  # Will be fetched when user clicks on album
-        }
-        session_data.append(full_album_data)
-        
-        display_data = {
-            'deezer_id': str(album['id']),
-            'title': album['title'],
-            'artist_name': album['artist']['name'],
-            'cover_url': album.get('cover_medium')
-        }
-        display_results.append(display_data)
-    
-    session_key = f"{query}:{page}"
-    store_search_session(session_key, session_data)
+
+    local_albums, local_total = [], 0
+    if LOCAL_SEARCH_ENABLED and len(query.strip()) >= LOCAL_SEARCH_MIN_QUERY_LENGTH:
+        try:
+            local_albums, local_total = search_local_albums(query.strip(), page, limit)
+        except Exception as e:
+            print(f"Error searching local albums: {e}")
+            count_search('local_errors')
+
+    deezer_response = None
+    if len(local_albums) >= limit:
+        count_search('local')
+    else:
+        count_search('merged' if local_albums else 'upstream')
+        deezer_response = fetch_deezer_albums(
+            query, *deezer_search_window(page, limit, local_albums, local_total))
+    session_data, display_results, total = merge_search_results(
+        local_albums, local_total, deezer_response, limit)
+
+    # Local albums are already in the DB; only upstream results need the session cache
+    if session_data:
+        session_key = f"{query}:{page}"
+        store_search_session(session_key, session_data)
+
+    # Warm up the albums the user is most likely to open next
+    if PREFETCH_ENABLED and session_data:
+        ALBUM_PREFETCH.schedule(_prefetch_user_key(), [album['deezer_id'] for album in session_data])
     
     return jsonify({
         'query': query,
         'page': page,
-        'total': deezer_response.get('total', 0),
+        'total': total,
         'results': display_results
     })
 
 
-@app.route('/v1/albums/<album_id>', methods=['GET'])
-def select_album(album_id):
+def album_from_deezer(full_album):
+    """Convert a Deezer /album/{id} response to our album dict"""
+    return {
+        'deezer_id': str(full_album['id']),
+        'title': full_album['title'],
+        'artist_name': full_album['artist']['name'],
+        'artist_id': str(full_album['artist']['id']),
+        'cover_url': full_album.get('cover_medium', ''),
+        'release_date': full_album.get('release_date'),
+        'genre_id': full_album.get('genre_id', 0)
+    }
+
+def fetch_album_details(album_id, album_data=None):
     """
-    Get full album details including tracklist.
-    First checks database, then cache, then fetches from Deezer if needed.
-    Also fetches missing data from Deezer if database record is incomplete.
+    Fetch whatever is missing for an album from Deezer and return album_data
+    with 'tracks' filled in. /album/{id} is only requested when there is no
+    album_data or it lacks release_date/cover_url; it and /album/{id}/tracks
+    are requested once each, in parallel.
+    """
+    client = get_deezer_client()
+    needs_info = album_needs_info(album_data)
+
+    info_future = UPSTREAM_EXECUTOR.submit(client.album, album_id) if needs_info else None
+    tracks_future = UPSTREAM_EXECUTOR.submit(client.album_tracks, album_id)
+
+    if info_future is not None:
+        try:
+            full_album = info_future.result()
+        except Exception as e:
+            if not album_data:
+                raise
+            print(f"Error fetching additional album info for {album_id}: {e}")
+        else:
+            if not album_data:
+                album_data = album_from_deezer(full_album)
+            else:
+                fill_album_info(album_data, full_album)
+
+    album_data['tracks'] = format_tracks(tracks_future.result())
+    return album_data
+
+def format_tracks(tracks_data):
+    """Deezer /album/{id}/tracks response -> our track dicts"""
+    formatted_tracks = []
+    for track in tracks_data.get('data', []):
+        formatted_tracks.append({
+            'id': str(track['id']),
+            'title': track['title'],
+            'duration': track['duration'],
+            'track_position': track.get('track_position', 0)
+        })
+    return formatted_tracks
+
+def album_needs_info(album_data):
+    """True if /album/{id} has to be fetched to complete album_data"""
+    return not album_data or not album_data.get('release_date') or not album_data.get('cover_url')
+
+def fill_album_info(album_data, full_album):
+    """Fill in release_date and/or cover_url from a Deezer /album/{id} response"""
+    if not album_data.get('release_date'):
+        album_data['release_date'] = full_album.get('release_date')
+    if not album_data.get('cover_url'):
+        album_data['cover_url'] = full_album.get('cover_medium', '')
+
+
+def _prefetch_album(album_id):
+    """Fetch full details for a search result and complete its search-cache entry"""
+    album = fetch_album_details(album_id)
+    fields = {
+        'release_date': album.get('release_date'),
+        'genre_id': album.get('genre_id', 0),
+        'tracks': album['tracks']
+    }
+    if SESSION_CACHE.update_album(album_id, fields) and SEARCH_JOURNAL is not None:
+        SEARCH_JOURNAL.record_update(album_id, fields)
+
+def _prefetch_admit():
+    """Prefetches share the Deezer token bucket with user requests and only get what's above the reserve"""
+    limiter = get_deezer_client().limiter
+    return limiter is None or limiter.available() > PREFETCH_RATE_RESERVE
+
+def _prefetch_user_key():
+    """Prefetch budgets are per logged-in user, or per client address otherwise"""
+    if current_user.is_authenticated:
+        return f"user:{current_user.id}"
+    return f"addr:{request.remote_addr}"
+
+ALBUM_PREFETCH = AlbumPrefetcher(
+    _prefetch_album,
+    top_n=PREFETCH_TOP_N,
+    workers=PREFETCH_WORKERS,
+    user_budget=PREFETCH_USER_BUDGET,
+    budget_window=PREFETCH_BUDGET_WINDOW,
+    admit=_prefetch_admit
+)
+
+ALBUM_DETAIL_SQL = """
+    SELECT 
+        a.album_id as deezer_id,
+        a.album_name as title,
+        au.author_name as artist_name,
+        au.author_id as artist_id,
+        a.release_date,
+        a.genre_id,
+        a.cover_url,
+        a.album_rating,
+        a.rating_count
+    FROM album a
+    JOIN author au ON a.author_id = au.author_id
+    WHERE a.album_id = %(album_id)s
+    LIMIT 1
+"""
+
+# Before migration 003 there are no rating_count/rating_sum columns to read
+ALBUM_DETAIL_SQL_WITHOUT_AGGREGATES = """
+    SELECT 
+        a.album_id as deezer_id,
+        a.album_name as title,
+        au.author_name as artist_name,
+        au.author_id as artist_id,
+        a.release_date,
+        a.genre_id,
+        a.cover_url,
+        r.album_rating,
+        r.rating_count
+    FROM album a
+    JOIN author au ON a.author_id = au.author_id
+    CROSS JOIN LATERAL (
+        SELECT AVG(user_rating)::real AS album_rating, COUNT(user_rating)::integer AS rating_count
+        FROM user_rating
+        WHERE album_id = a.album_id
+    ) r
+    WHERE a.album_id = %(album_id)s
+    LIMIT 1
+"""
+
+def album_detail_sql():
+    """ALBUM_DETAIL_SQL, or the pre-003 form if the schema check found no rating aggregates"""
+    if APPLIED_MIGRATIONS is not None and 3 not in APPLIED_MIGRATIONS:
+        return ALBUM_DETAIL_SQL_WITHOUT_AGGREGATES
+    return ALBUM_DETAIL_SQL
+
+ALBUM_TRACKS_SQL = """
+    SELECT 
+        song_id as id,
+        song_name as title,
+        0 as duration,
+        song_num as track_position
+    FROM song
+    WHERE album_id = %(album_id)s
+    ORDER BY song_num
+"""
+
+def community_rating(album_row):
+    return {
+        'rating_average': album_row['album_rating'],
+        'rating_count': album_row['rating_count']
+    }
+
+def album_detail(album_row, tracks):
+    """Album detail response (without community rating) from ALBUM_DETAIL_SQL/ALBUM_TRACKS_SQL rows"""
+    return {
+        'deezer_id': str(album_row['deezer_id']),
+        'title': album_row['title'],
+        'artist_name': album_row['artist_name'],
+        'artist_id': str(album_row['artist_id']),
+        'release_date': album_row['release_date'],
+        'cover_url': album_row['cover_url'] or '',
+        'tracks': [dict(track) for track in tracks]
+    }
+
+ALBUM_USER_STATE_SQL = """
+    SELECT
+        (SELECT user_rating FROM user_rating
+         WHERE user_id = %(user_id)s AND album_id = %(album_id)s) AS user_rating,
+        EXISTS (SELECT 1 FROM want_to_listen
+                WHERE user_id = %(user_id)s AND album_id = %(album_id)s) AS in_list
+"""
+
+def album_missing_data(album_id, album_row, tracks):
+    """Whether an album found in the database needs completing from Deezer (no tracks, release_date or cover)"""
+    if not tracks or not album_row['release_date'] or not album_row['cover_url']:
+        print(f"Album {album_id} found in DB but missing data. Will fetch from Deezer.")
+        return True
+    return False
+
+def album_from_search_cache(album_id):
+    """
+    (album_data, needs_deezer_fetch) for an album that isn't in the
+    database, from the search cache; albums the search prefetch already
+    completed are queued to be saved and need no Deezer fetch.
+    """
+    stored_album_data = get_from_search_session(album_id)
+    # If not in cache either, we'll fetch from Deezer
+    if not stored_album_data:
+        return None, True
+    if stored_album_data.get('tracks') and stored_album_data.get('release_date'):
+        PERSIST_QUEUE.submit([stored_album_data])
+        return stored_album_data, False
+    return stored_album_data, True  # Always fetch tracks from Deezer
+
+def _load_album_from_deezer(album_id, partial=None):
+    """Fetch an album from Deezer and save it; concurrent loads of one album share a fetch+save"""
+    def load():
+        loaded = fetch_album_details(album_id, partial)
+        # Save/update in database for future use
+        save_album_to_db(loaded)
+        return loaded
+
+    album_data, _ = ALBUM_LOADS.do(str(album_id), load)
+    return album_data
+
+def load_album(album_id, user_id=None):
+    """
+    (album, user_state): full album details including tracklist and
+    community rating (None if they couldn't be loaded), and for user_id
+    their rating and whether the album is in their list, read on the same
+    connection ({'user_rating': None, 'in_list': False} without a user_id).
+
+    Checks the database first, then the search cache, then fetches from
+    Deezer if needed; also fetches missing data from Deezer if the
+    database record is incomplete.
     """
-    
     album_data = None
     needs_deezer_fetch = False
+    # Community rating; albums that aren't in the DB yet have no ratings
+    community = {'rating_average': None, 'rating_count': 0}
+    # ...and no ratings or list entries of this user either
+    user_state = {'user_rating': None, 'in_list': False}
+    ALBUM_PREFETCH.record_request(album_id)
     
     # First, try to get album from database
     try:
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Get album details
-                cur.execute("""
-                    SELECT 
-                        a.album_id as deezer_id,
-                        a.album_name as title,
-                        au.author_name as artist_name,
-                        au.author_id as artist_id,
-                        a.release_date,
-                        a.genre_id,
-                        a.cover_url
-                    FROM album a
-                    JOIN author au ON a.author_id = au.author_id
-                    WHERE a.album_id = %s
-                    LIMIT 1
-                """, (album_id,))
-                
+                cur.execute(album_detail_sql(), {'album_id': album_id})
                 album_row = cur.fetchone()
                 
                 if album_row:
+                    community = community_rating(album_row)
+
+                    if user_id is not None:
+                        cur.execute(ALBUM_USER_STATE_SQL, {'user_id': user_id, 'album_id': album_id})
+                        user_state = dict(cur.fetchone())
+
                     # Album exists in database, get its tracks
-                    cur.execute("""
-                        SELECT 
-                            song_id as id,
-                            song_name as title,
-                            0 as duration,
-                            song_num as track_position
-                        FROM song
-                        WHERE album_id = %s
-                        ORDER BY song_num
-                    """, (album_id,))
-                    
+                    cur.execute(ALBUM_TRACKS_SQL, {'album_id': album_id})
                     tracks = cur.fetchall()
+                    album_data = album_detail(album_row, tracks)
                     
-                    # Format response
-                    album_data = {
-                        'deezer_id': str(album_row['deezer_id']),
-                        'title': album_row['title'],
-                        'artist_name': album_row['artist_name'],
-                        'artist_id': str(album_row['artist_id']),
-                        'release_date': album_row['release_date'],
-                        'cover_url': album_row['cover_url'] or '',
-                        'tracks': [dict(track) for track in tracks]
-                    }
-                    
-                    # Check if we need to fetch from Deezer (missing tracks, release_date, or cover)
-                    if not tracks or not album_row['release_date'] or not album_row['cover_url']:
-                        needs_deezer_fetch = True
-                        print(f"Album {album_id} found in DB but missing data. Will fetch from Deezer.")
-                    else:
-                        # Data is complete, return it
-                        return jsonify(album_data), 200
+                    needs_deezer_fetch = album_missing_data(album_id, album_row, tracks)
     
     except Exception as e:
         print(f"Error checking database for album {album_id}: {e}")
@@ -531,134 +1308,107 @@ def select_album(album_id):
     
     # If not in database, check cache
     if not album_data:
-        stored_album_data = get_from_search_session(album_id)
-        
-        # If not in cache either, we'll fetch from Deezer
-        if not stored_album_data:
-            needs_deezer_fetch = True
-        else:
-            album_data = stored_album_data
-            needs_deezer_fetch = True  # Always fetch tracks from Deezer
+        album_data, needs_deezer_fetch = album_from_search_cache(album_id)
     
     # Fetch from Deezer if needed
     if needs_deezer_fetch:
         try:
-            # Fetch basic album info from Deezer if we don't have album_data yet
-            if not album_data:
-                full_album_url = f"https://api.deezer.com/album/{album_id}"
-                full_album_response = requests.get(full_album_url, timeout=10)
-                full_album_response.raise_for_status()
-                full_album = full_album_response.json()
-                
-                album_data = {
-                    'deezer_id': str(full_album['id']),
-                    'title': full_album['title'],
-                    'artist_name': full_album['artist']['name'],
-                    'artist_id': str(full_album['artist']['id']),
-                    'cover_url': full_album.get('cover_medium', ''),
-                    'release_date': full_album.get('release_date'),
-                    'genre_id': full_album.get('genre_id', 0)
-                }
-            
-            # Fetch release_date and/or cover_url if missing
-            if not album_data.get('release_date') or not album_data.get('cover_url'):
-                try:
-                    full_album_url = f"https://api.deezer.com/album/{album_id}"
-                    full_album_response = requests.get(full_album_url, timeout=10)
-                    full_album_response.raise_for_status()
-                    full_album = full_album_response.json()
-                    
-                    if not album_data.get('release_date'):
-                        album_data['release_date'] = full_album.get('release_date')
-                    if not album_data.get('cover_url'):
-                        album_data['cover_url'] = full_album.get('cover_medium', '')
-                except Exception as e:
-                    print(f"Error fetching additional album info for {album_id}: {e}")
-            
-            # Fetch tracks from Deezer
-            tracks_url = f"https://api.deezer.com/album/{album_id}/tracks"
-            tracks_response = requests.get(tracks_url, timeout=10)
-            tracks_response.raise_for_status()
-            tracks_data = tracks_response.json()
-            
-            formatted_tracks = []
-            for track in tracks_data.get('data', []):
-                formatted_tracks.append({
-                    'id': str(track['id']),
-                    'title': track['title'],
-                    'duration': track['duration'],
-                    'track_position': track.get('track_position', 0)
-                })
-            
-            album_data['tracks'] = formatted_tracks
-            
-            # Save/update in database for future use
-            save_album_to_db(album_data)
-            
-            return jsonify(album_data)
-            
+            album_data = _load_album_from_deezer(album_id, album_data)
         except Exception as e:
             print(f"Error fetching from Deezer: {e}")
             import traceback
             traceback.print_exc()
-            
             # If we have partial data from database, return it anyway
-            if album_data:
-                return jsonify(album_data), 200
-            
-            return jsonify({
-                'error': 'Failed to fetch album details'
-            }), 500
-    
-    # Shouldn't reach here, but just in case
-    if album_data:
-        return jsonify(album_data), 200
-    
-    return jsonify({'error': 'Album not found'}), 404
+
+    return ({**album_data, **community} if album_data else None), user_state
+
+@app.route('/v1/albums/<album_id>', methods=['GET'])
+@HTTP_CACHE.cached(ALBUM_CACHE_CONTROL)
+def select_album(album_id):
+    """Get full album details including tracklist and community rating"""
+    album, _ = load_album(album_id)
+    if album is None:
+        return jsonify({'error': 'Failed to fetch album details'}), 500
+    return jsonify(album), 200
+
+@app.route('/v1/albums/<album_id>/page', methods=['GET'])
+@HTTP_CACHE.cached(ALBUM_PAGE_CACHE_CONTROL)
+def get_album_page(album_id):
+    """
+    Everything the album page shows in one call: album details with
+    tracklist and community rating, plus the current user's rating
+    ("user_rating") and whether the album is in their list ("in_list").
+    Anonymous callers get user_rating null and in_list false.
+    """
+    user_id = int(current_user.id) if current_user.is_authenticated else None
+    album, user_state = load_album(album_id, user_id)
+    if album is None:
+        return jsonify({'error': 'Failed to fetch album details'}), 500
+    return jsonify({**album, **user_state}), 200
+
+def persist_album(album_id):
+    """
+    Save an album that isn't in the database yet so it can be added or
+    rated: from the search cache if it's there, otherwise from Deezer's
+    /album/{id} (tracks are filled in when its details are loaded).
+    Returns False if the album couldn't be found or saved.
+    """
+    album_data = get_from_search_session(album_id)
+    if not album_data:
+        try:
+            album_data = album_from_deezer(get_deezer_client().album(album_id))
+        except Exception as e:
+            print(f"Error fetching album {album_id} from Deezer: {e}")
+            return False
+    return save_album_to_db(album_data) is not None
+
+# Album check and insert in one statement; the primary key
+# on (user_id, album_id) turns a repeat add into a no-op
+ADD_TO_LIST_SQL = """
+    WITH target AS (
+        SELECT album_id FROM album WHERE album_id = %(album_id)s
+    ), inserted AS (
+        INSERT INTO want_to_listen (user_id, album_id)
+        SELECT %(user_id)s, album_id FROM target
+        ON CONFLICT (user_id, album_id) DO NOTHING
+        RETURNING 1
+    )
+    SELECT EXISTS (SELECT 1 FROM target), EXISTS (SELECT 1 FROM inserted)
+"""
+
+REMOVE_FROM_LIST_SQL = """
+    DELETE FROM want_to_listen
+    WHERE user_id = %(user_id)s AND album_id = %(album_id)s
+"""
+
+def _add_to_list(user_id, album_id):
+    """(album_exists, inserted) for adding album_id to user_id's want_to_listen list"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(ADD_TO_LIST_SQL, {'user_id': user_id, 'album_id': album_id})
+            album_exists, inserted = cur.fetchone()
+
+        conn.commit()
+    return album_exists, inserted
 
 @app.post("/v1/albums/<album_id>/add")
 @login_required
 def add_album(album_id):
     """
     Add album to the current user's want_to_listen list.
-    Album should already exist in DB.
+    An album that isn't in the DB yet is saved first (see persist_album).
     """
     try:
         user_id = int(current_user.id)
 
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
+        album_exists, inserted = _add_to_list(user_id, album_id)
+        if not album_exists and persist_album(album_id):
+            album_exists, inserted = _add_to_list(user_id, album_id)
 
-                # Verify album exists
-                cur.execute("""
-                    SELECT album_id
-                    FROM album
-                    WHERE album_id = %s
-                    LIMIT 1
-                """, (album_id,))
-                row = cur.fetchone()
-                if not row:
-                    return _json_error("Album not found in DB", 404)
-
-                # Check if already exists
-                cur.execute("""
-                    SELECT 1
-                    FROM want_to_listen
-                    WHERE user_id = %s AND album_id = %s
-                    LIMIT 1
-                """, (user_id, album_id))
-                exists = cur.fetchone()
-
-                if exists:
-                    return jsonify({"ok": True, "message": "Album already in list"})
-
-                # Insert new
-                cur.execute("""
-                    INSERT INTO want_to_listen (user_id, album_id)
-                    VALUES (%s, %s)
-                """, (user_id, album_id))
-
-            conn.commit()
+        if not album_exists:
+            return _json_error("Album not found", 404)
+        if not inserted:
+            return jsonify({"ok": True, "message": "Album already in list"})
 
         return jsonify({"ok": True, "message": "Album added to your list"})
 
@@ -678,13 +1428,7 @@ def remove_album(album_id):
 
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    DELETE FROM want_to_listen
-                    WHERE user_id = %s AND album_id = %s
-                    """,
-                    (user_id, album_id),
-                )
+                cur.execute(REMOVE_FROM_LIST_SQL, {'user_id': user_id, 'album_id': album_id})
 
             conn.commit()
 
@@ -694,31 +1438,109 @@ def remove_album(album_id):
         print("REMOVE ALBUM ERROR:", e)
         return _json_error(f"remove_album_failed: {e}", 500)
 
+# The user list queries; the keyset predicate is added only after a cursor
+# and LIMIT only for a page, see my_albums_sql()/rated_albums_sql()
+MY_ALBUMS_SQL = """
+    SELECT
+        a.album_id   AS deezer_id,
+        a.album_name AS title,
+        au.author_name AS artist_name,
+        a.cover_url
+    FROM want_to_listen w
+    JOIN album a ON w.album_id = a.album_id
+    JOIN author au ON a.author_id = au.author_id
+    WHERE w.user_id = %(user_id)s
+"""
+MY_ALBUMS_AFTER_SQL = """
+      AND (a.album_name, a.album_id) > (%(after_name)s, %(after_id)s)
+"""
+MY_ALBUMS_ORDER_SQL = """
+    ORDER BY a.album_name, a.album_id
+"""
+
+RATED_ALBUMS_SQL = """
+    SELECT
+        a.album_id   AS deezer_id,
+        a.album_name AS title,
+        au.author_name AS artist_name,
+        a.cover_url,
+        ur.user_rating AS rating
+    FROM user_rating ur
+    JOIN album a ON ur.album_id = a.album_id
+    JOIN author au ON a.author_id = au.author_id
+    WHERE ur.user_id = %(user_id)s
+      -- NULL ratings aren't ratings; they'd also sort first and break the cursor
+      AND ur.user_rating IS NOT NULL
+"""
+RATED_ALBUMS_AFTER_SQL = """
+      AND (ur.user_rating < %(after_rating)s::real
+           OR (ur.user_rating = %(after_rating)s::real
+               AND (a.album_name, a.album_id) > (%(after_name)s, %(after_id)s)))
+"""
+RATED_ALBUMS_ORDER_SQL = """
+    ORDER BY ur.user_rating DESC, a.album_name, a.album_id
+"""
+
+PAGE_LIMIT_SQL = "LIMIT %(limit)s"
+
+def my_albums_sql(after=False, paged=False):
+    return MY_ALBUMS_SQL + (MY_ALBUMS_AFTER_SQL if after else "") + MY_ALBUMS_ORDER_SQL + (PAGE_LIMIT_SQL if paged else "")
+
+def rated_albums_sql(after=False, paged=False):
+    return RATED_ALBUMS_SQL + (RATED_ALBUMS_AFTER_SQL if after else "") + RATED_ALBUMS_ORDER_SQL + (PAGE_LIMIT_SQL if paged else "")
+
+def _page_request():
+    """
+    (limit, cursor) for a paginated list request, or None when neither
+    ?limit= nor ?cursor= is given (the unpaginated list the frontend uses).
+    Raises ValueError for a bad limit.
+    """
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return None
+    limit = int(request.args.get('limit', USER_LIST_PAGE_DEFAULT))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return min(limit, USER_LIST_PAGE_MAX), request.args.get('cursor') or None
+
+def _page_response(rows, limit, sort_key):
+    """One page of rows (fetched with limit + 1) and the cursor for the next one"""
+    next_cursor = encode_cursor(sort_key(rows[limit - 1])) if len(rows) > limit else None
+    return jsonify({
+        'items': [dict(row) for row in rows[:limit]],
+        'next_cursor': next_cursor,
+        'limit': limit
+    }), 200
+
 @app.get("/v1/me/albums")
 @login_required
 def get_my_albums():
     """
-    Return all albums saved in want_to_listen for the current user.
+    Return the albums saved in want_to_listen for the current user, by title.
+    With ?limit= and/or ?cursor= returns one page:
+    {"items": [...], "next_cursor": ..., "limit": n}; without them, the whole list.
     """
+    try:
+        page = _page_request()
+        after = decode_cursor(page[1], (str, int)) if page and page[1] else None
+    except (ValueError, InvalidCursor) as e:
+        return _json_error(f"Invalid pagination parameters: {e}", 400)
+
     try:
         user_id = int(current_user.id)
 
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT
-                        a.album_id   AS deezer_id,
-                        a.album_name AS title,
-                        au.author_name AS artist_name,
-                        a.cover_url
-                    FROM want_to_listen w
-                    JOIN album a ON w.album_id = a.album_id
-                    JOIN author au ON a.author_id = au.author_id
-                    WHERE w.user_id = %s
-                    ORDER BY a.album_name
-                """, (user_id,))
+                cur.execute(my_albums_sql(after is not None, page is not None), {
+                    'user_id': user_id,
+                    'after_name': after[0] if after else None,
+                    'after_id': after[1] if after else None,
+                    'limit': page[0] + 1 if page else None
+                })
                 rows = cur.fetchall()
 
+        if page:
+            return _page_response(rows, page[0], lambda row: (row['title'], row['deezer_id']))
+
         # convert RealDictRow -> plain dict so it’s JSON serializable
         return jsonify([dict(row) for row in rows]), 200
 
@@ -726,71 +1548,118 @@ def get_my_albums():
         print("GET MY ALBUMS ERROR:", e)
         return _json_error(f"get_my_albums_failed: {e}", 500)
 
+def _load_album_ids():
+    """All album ids, streamed with a server-side cursor"""
+    with get_db_connection() as conn:
+        with conn.cursor(name="album_ids") as cur:
+            cur.itersize = 50000
+            cur.execute("SELECT album_id FROM album")
+            for (album_id,) in cur:
+                yield album_id
+
+RANDOM_ALBUM_IDS = AlbumIdSampler(_load_album_ids, refresh_interval=RANDOM_ALBUMS_REFRESH_SECONDS)
+
+RANDOM_ALBUMS_SQL = """
+    SELECT 
+        a.album_id as deezer_id,
+        a.album_name as title,
+        au.author_name as artist_name,
+        a.cover_url
+    FROM album a
+    JOIN author au ON a.author_id = au.author_id
+    WHERE a.album_id = ANY(%(ids)s)
+"""
+
+def random_album_result(album):
+    return {
+        'deezer_id': str(album['deezer_id']),
+        'title': album['title'],
+        'artist_name': album['artist_name'],
+        'cover_url': album['cover_url'] or ''
+    }
+
+def _select_random_albums(cur, count):
+    """
+    Fetch `count` distinct random albums. Ids that were deleted since the
+    last id refresh are topped up with another draw.
+    """
+    albums = []
+    seen = set()
+    for _ in range(3):
+        ids = RANDOM_ALBUM_IDS.sample(count - len(albums), exclude=seen)
+        if not ids:
+            break
+        seen.update(ids)
+        cur.execute(RANDOM_ALBUMS_SQL, {'ids': ids})
+        rows = {row['deezer_id']: row for row in cur.fetchall()}
+        albums.extend(rows[album_id] for album_id in ids if album_id in rows)
+        if len(albums) >= count:
+            break
+    return albums
+
+def _find_albums_missing_metadata(after_id, limit):
+    """Next page of album ids with no cover_url or release_date, in id order"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT album_id
+                FROM album
+                WHERE album_id > %s
+                  AND (cover_url IS NULL OR cover_url = '' OR release_date IS NULL OR release_date = '')
+                ORDER BY album_id
+                LIMIT %s
+            """, (after_id, limit))
+            return [row[0] for row in cur.fetchall()]
+
+def _write_album_metadata(rows):
+    """Bulk-fill cover_url/release_date from (album_id, cover_url, release_date) rows"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                UPDATE album AS a
+                SET cover_url = COALESCE(NULLIF(a.cover_url, ''), v.cover_url),
+                    release_date = COALESCE(NULLIF(a.release_date, ''), v.release_date)
+                FROM (VALUES %s) AS v (album_id, cover_url, release_date)
+                WHERE a.album_id = v.album_id
+            """, rows, template="(%s::bigint, %s::varchar, %s::varchar)")
+    print(f"Backfilled metadata for {len(rows)} albums")
+
+ALBUM_BACKFILL = AlbumBackfillWorker(
+    lambda album_id: get_deezer_client().album(album_id),
+    _find_albums_missing_metadata,
+    _write_album_metadata,
+    workers=BACKFILL_WORKERS,
+    batch_size=BACKFILL_BATCH_SIZE,
+    scan_interval=BACKFILL_SCAN_INTERVAL
+)
+
 @app.route('/v1/albums/random', methods=['GET'])
 def get_random_albums():
     """
     Get random albums from the database.
     Returns a specified number of random albums.
-    Fetches missing cover URLs from Deezer and updates the database.
+    Albums with a missing cover URL are queued for the backfill worker.
     """
     try:
         count = int(request.args.get('count', 6))
         
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                # Query to get random albums with their artist information
-                cur.execute("""
-                    SELECT 
-                        a.album_id as deezer_id,
-                        a.album_name as title,
-                        au.author_name as artist_name,
-                        a.cover_url
-                    FROM album a
-                    JOIN author au ON a.author_id = au.author_id
-                    ORDER BY RANDOM()
-                    LIMIT %s
-                """, (count,))
-                
-                albums = cur.fetchall()
-                
-                # Format the response and fetch missing covers
-                result = []
-                for album in albums:
-                    cover_url = album['cover_url']
-                    
-                    # If cover_url is missing, fetch it from Deezer
-                    if not cover_url:
-                        try:
-                            deezer_url = f"https://api.deezer.com/album/{album['deezer_id']}"
-                            deezer_response = requests.get(deezer_url, timeout=10)
-                            deezer_response.raise_for_status()
-                            deezer_data = deezer_response.json()
-                            cover_url = deezer_data.get('cover_medium', '')
-                            
-                            # Update the database with the new cover URL
-                            if cover_url:
-                                cur.execute("""
-                                    UPDATE album
-                                    SET cover_url = %s
-                                    WHERE album_id = %s
-                                """, (cover_url, album['deezer_id']))
-                                print(f"Updated cover for album {album['title']}")
-                        except Exception as e:
-                            print(f"Error fetching cover for album {album['deezer_id']}: {e}")
-                            cover_url = ''
-                    
-                    result.append({
-                        'deezer_id': str(album['deezer_id']),
-                        'title': album['title'],
-                        'artist_name': album['artist_name'],
-                        'cover_url': cover_url or ''
-                    })
-                
-                # Commit any cover URL updates
-                conn.commit()
-                
-                return jsonify(result), 200
+                # Random albums with their artist information, picked from the
+                # in-memory id list instead of ORDER BY RANDOM() over the whole table
+                albums = _select_random_albums(cur, count)
                 
+        # Missing covers are filled in by the backfill worker, not this request
+        missing = [album['deezer_id'] for album in albums if not album['cover_url']]
+        if missing:
+            ALBUM_BACKFILL.enqueue(missing)
+
+        result = [random_album_result(album) for album in albums]
+        
+        response = jsonify(result)
+        response.headers['Cache-Control'] = 'no-store'  # a new pick on every load
+        return response, 200
+
     except Exception as e:
         print(f"Error fetching random albums: {e}")
         import traceback
@@ -798,9 +1667,43 @@ def get_random_albums():
         return jsonify({'error': 'Failed to fetch random albums'}), 500
 
 
+# xmax = 0 only for a freshly inserted row, not an updated one
+SAVE_RATING_SQL = """
+    INSERT INTO user_rating (user_id, album_id, user_rating)
+    SELECT %(user_id)s, album_id, %(rating)s
+    FROM album
+    WHERE album_id = %(album_id)s
+    ON CONFLICT (user_id, album_id) DO UPDATE
+        SET user_rating = EXCLUDED.user_rating
+    RETURNING (xmax = 0) AS inserted
+"""
+
+USER_RATING_SQL = """
+    SELECT user_rating
+    FROM user_rating
+    WHERE user_id = %(user_id)s AND album_id = %(album_id)s
+    LIMIT 1
+"""
+
+REMOVE_RATING_SQL = """
+    DELETE FROM user_rating
+    WHERE user_id = %(user_id)s AND album_id = %(album_id)s
+"""
+
+def _save_rating(user_id, album_id, rating):
+    """True if the rating was inserted, False if updated, None if the album isn't in the DB"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(SAVE_RATING_SQL, {'user_id': user_id, 'album_id': album_id, 'rating': rating})
+            row = cur.fetchone()
+
+        conn.commit()
+    return row[0] if row else None
+
 @app.post("/v1/albums/<album_id>/rate")
 @login_required
 def rate_album(album_id):
+    """Rate an album 1-5; an album that isn't in the DB yet is saved first (see persist_album)"""
     try:
         user_id = int(current_user.id)
         data = request.get_json(force=True)
@@ -812,41 +1715,13 @@ def rate_album(album_id):
         if rating < 1 or rating > 5:
             return _json_error("Rating must be between 1 and 5", 400)
 
-        with get_db_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT album_id
-                    FROM album
-                    WHERE album_id = %s
-                    LIMIT 1
-                """, (album_id,))
-                row = cur.fetchone()
-                if not row:
-                    return _json_error("Album not found in DB", 404)
-
-                cur.execute("""
-                    SELECT user_rating
-                    FROM user_rating
-                    WHERE user_id = %s AND album_id = %s
-                    LIMIT 1
-                """, (user_id, album_id))
-                exists = cur.fetchone()
-
-                if exists:
-                    cur.execute("""
-                        UPDATE user_rating
-                        SET user_rating = %s
-                        WHERE user_id = %s AND album_id = %s
-                    """, (rating, user_id, album_id))
-                    message = "Rating updated"
-                else:
-                    cur.execute("""
-                        INSERT INTO user_rating (user_id, album_id, user_rating)
-                        VALUES (%s, %s, %s)
-                    """, (user_id, album_id, rating))
-                    message = "Rating saved"
+        inserted = _save_rating(user_id, album_id, rating)
+        if inserted is None and persist_album(album_id):
+            inserted = _save_rating(user_id, album_id, rating)
 
-            conn.commit()
+        if inserted is None:
+            return _json_error("Album not found", 404)
+        message = "Rating saved" if inserted else "Rating updated"
 
         return jsonify({"ok": True, "message": message})
 
@@ -863,12 +1738,7 @@ def get_user_rating(album_id):
 
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT user_rating
-                    FROM user_rating
-                    WHERE user_id = %s AND album_id = %s
-                    LIMIT 1
-                """, (user_id, album_id))
+                cur.execute(USER_RATING_SQL, {'user_id': user_id, 'album_id': album_id})
                 row = cur.fetchone()
 
         if row:
@@ -884,26 +1754,34 @@ def get_user_rating(album_id):
 @app.get("/v1/me/rated-albums")
 @login_required
 def get_rated_albums():
+    """
+    Return the current user's rated albums, highest rating first.
+    Paginated the same way as /v1/me/albums.
+    """
+    try:
+        page = _page_request()
+        after = decode_cursor(page[1], (float, str, int)) if page and page[1] else None
+    except (ValueError, InvalidCursor) as e:
+        return _json_error(f"Invalid pagination parameters: {e}", 400)
+
     try:
         user_id = int(current_user.id)
 
         with get_db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT
-                        a.album_id   AS deezer_id,
-                        a.album_name AS title,
-                        au.author_name AS artist_name,
-                        a.cover_url,
-                        ur.user_rating AS rating
-                    FROM user_rating ur
-                    JOIN album a ON ur.album_id = a.album_id
-                    JOIN author au ON a.author_id = au.author_id
-                    WHERE ur.user_id = %s
-                    ORDER BY ur.user_rating DESC, a.album_name
-                """, (user_id,))
+                cur.execute(rated_albums_sql(after is not None, page is not None), {
+                    'user_id': user_id,
+                    'after_rating': after[0] if after else None,
+                    'after_name': after[1] if after else None,
+                    'after_id': after[2] if after else None,
+                    'limit': page[0] + 1 if page else None
+                })
                 rows = cur.fetchall()
 
+        if page:
+            return _page_response(rows, page[0],
+                                  lambda row: (row['rating'], row['title'], row['deezer_id']))
+
         return jsonify([dict(row) for row in rows]), 200
 
     except Exception as e:
@@ -919,10 +1797,7 @@ def remove_rating(album_id):
 
         with get_db_connection() as conn:
             with conn.cursor() as cur:
-                cur.execute("""
-                    DELETE FROM user_rating
-                    WHERE user_id = %s AND album_id = %s
-                """, (user_id, album_id))
+                cur.execute(REMOVE_RATING_SQL, {'user_id': user_id, 'album_id': album_id})
 
             conn.commit()
 
@@ -933,5 +1808,249 @@ def remove_rating(album_id):
         return _json_error(f"remove_rating_failed: {e}", 500)
 
 
+def _batch_items(key):
+    """The list under `key` in the JSON body, or an error response"""
+    data = request.get_json(force=True, silent=True) or {}
+    items = data.get(key)
+    if not isinstance(items, list):
+        return None, _json_error(f'"{key}" must be a list', 400)
+    if len(items) > BATCH_MAX_ITEMS:
+        return None, _json_error(f"At most {BATCH_MAX_ITEMS} items per batch", 413)
+    return items, None
+
+BIGINT_MAX = 2 ** 63 - 1
+
+def _parse_album_id(value):
+    """
+    A batch item's album id: a positive integer that fits album_id (bigint),
+    given as a JSON integer, an integral float or a string of digits; None
+    for anything else (bools, 12.7, "1e3", ...), which the item reports as invalid.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        album_id = value
+    elif isinstance(value, float):
+        if not value.is_integer():
+            return None
+        album_id = int(value)
+    elif isinstance(value, str):
+        value = value.strip()
+        if not (value.isascii() and value.isdigit()):
+            return None
+        album_id = int(value)
+    else:
+        return None
+    return album_id if 0 < album_id <= BIGINT_MAX else None
+
+def _batch_response(results):
+    counts = {}
+    for item in results:
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    return jsonify({"ok": True, "results": results, "counts": counts})
+
+def _batch_cursor(conn):
+    cur = conn.cursor()
+    cur.execute("SET LOCAL statement_timeout = %s", (BATCH_STATEMENT_TIMEOUT_MS,))
+    return cur
+
+@app.post("/v1/albums/batch/add")
+@login_required
+def batch_add_albums():
+    """
+    Add many albums to the current user's want_to_listen list in one transaction.
+    Body: {"album_ids": [...]}. Each id gets a status: added, already_in_list,
+    not_found (album isn't in the DB) or invalid.
+    """
+    items, error = _batch_items("album_ids")
+    if error:
+        return error
+    try:
+        user_id = int(current_user.id)
+        album_ids = list(dict.fromkeys(a for a in map(_parse_album_id, items) if a is not None))
+
+        statuses = {}
+        if album_ids:
+            with get_db_connection() as conn:
+                with _batch_cursor(conn) as cur:
+                    cur.execute("""
+                        WITH input AS (
+                            SELECT unnest(%(album_ids)s::bigint[]) AS album_id
+                        ), target AS (
+                            SELECT i.album_id FROM input i JOIN album a ON a.album_id = i.album_id
+                        ), inserted AS (
+                            INSERT INTO want_to_listen (user_id, album_id)
+                            SELECT %(user_id)s, album_id FROM target
+                            ON CONFLICT (user_id, album_id) DO NOTHING
+                            RETURNING album_id
+                        )
+                        SELECT i.album_id, t.album_id IS NOT NULL, ins.album_id IS NOT NULL
+                        FROM input i
+                        LEFT JOIN target t ON t.album_id = i.album_id
+                        LEFT JOIN inserted ins ON ins.album_id = i.album_id
+                    """, {'user_id': user_id, 'album_ids': album_ids})
+                    for album_id, found, inserted in cur.fetchall():
+                        statuses[album_id] = ("added" if inserted else "already_in_list") if found else "not_found"
+                conn.commit()
+
+        results = []
+        for value in items:
+            album_id = _parse_album_id(value)
+            results.append({"album_id": value if album_id is None else album_id,
+                            "status": statuses.get(album_id, "invalid")})
+        return _batch_response(results)
+
+    except Exception as e:
+        print("BATCH ADD ALBUMS ERROR:", e)
+        return _json_error(f"batch_add_albums_failed: {e}", 500)
+
+@app.post("/v1/albums/batch/remove")
+@login_required
+def batch_remove_albums():
+    """
+    Remove many albums from the current user's want_to_listen list in one transaction.
+    Body: {"album_ids": [...]}. Statuses: removed, not_in_list or invalid.
+    """
+    items, error = _batch_items("album_ids")
+    if error:
+        return error
+    try:
+        user_id = int(current_user.id)
+        album_ids = list(dict.fromkeys(a for a in map(_parse_album_id, items) if a is not None))
+
+        removed = set()
+        if album_ids:
+            with get_db_connection() as conn:
+                with _batch_cursor(conn) as cur:
+                    cur.execute("""
+                        DELETE FROM want_to_listen
+                        WHERE user_id = %s AND album_id = ANY(%s::bigint[])
+                        RETURNING album_id
+                    """, (user_id, album_ids))
+                    removed = {row[0] for row in cur.fetchall()}
+                conn.commit()
+
+        results = []
+        for value in items:
+            album_id = _parse_album_id(value)
+            if album_id is None:
+                results.append({"album_id": value, "status": "invalid"})
+            else:
+                results.append({"album_id": album_id,
+                                "status": "removed" if album_id in removed else "not_in_list"})
+        return _batch_response(results)
+
+    except Exception as e:
+        print("BATCH REMOVE ALBUMS ERROR:", e)
+        return _json_error(f"batch_remove_albums_failed: {e}", 500)
+
+@app.post("/v1/albums/batch/rate")
+@login_required
+def batch_rate_albums():
+    """
+    Set or clear many of the current user's ratings in one transaction.
+    Body: {"ratings": [{"album_id": ..., "rating": 1-5 or null}, ...]};
+    a null rating removes it. If an album appears more than once the last
+    entry wins. Statuses: saved, updated, removed, not_rated, not_found
+    or invalid.
+    """
+    items, error = _batch_items("ratings")
+    if error:
+        return error
+    try:
+        user_id = int(current_user.id)
+
+        parsed = []     # album_id per item, None = invalid
+        wanted = {}     # album_id -> rating (None = remove), last entry wins
+        for item in items:
+            album_id = _parse_album_id(item.get("album_id")) if isinstance(item, dict) else None
+            rating = item.get("rating") if album_id is not None else None
+            if album_id is not None and rating is not None and (
+                    isinstance(rating, bool) or not isinstance(rating, (int, float)) or not 1 <= rating <= 5):
+                album_id = None
+            parsed.append(album_id)
+            if album_id is not None:
+                wanted[album_id] = rating
+
+        to_rate = [(album_id, rating) for album_id, rating in wanted.items() if rating is not None]
+        to_remove = [album_id for album_id, rating in wanted.items() if rating is None]
+
+        statuses = {}
+        if wanted:
+            with get_db_connection() as conn:
+                with _batch_cursor(conn) as cur:
+                    if to_rate:
+                        cur.execute("""
+                            WITH input AS (
+                                SELECT * FROM unnest(%(album_ids)s::bigint[], %(ratings)s::real[])
+                                    AS i(album_id, rating)
+                            ), upserted AS (
+                                INSERT INTO user_rating (user_id, album_id, user_rating)
+                                SELECT %(user_id)s, i.album_id, i.rating
+                                FROM input i
+                                JOIN album a ON a.album_id = i.album_id
+                                ON CONFLICT (user_id, album_id) DO UPDATE
+                                    SET user_rating = EXCLUDED.user_rating
+                                RETURNING album_id, (xmax = 0) AS inserted
+                            )
+                            SELECT i.album_id, u.inserted
+                            FROM input i
+                            LEFT JOIN upserted u ON u.album_id = i.album_id
+                        """, {'user_id': user_id,
+                              'album_ids': [album_id for album_id, _ in to_rate],
+                              'ratings': [rating for _, rating in to_rate]})
+                        for album_id, inserted in cur.fetchall():
+                            statuses[album_id] = "not_found" if inserted is None else ("saved" if inserted else "updated")
+                    if to_remove:
+                        cur.execute("""
+                            DELETE FROM user_rating
+                            WHERE user_id = %s AND album_id = ANY(%s::bigint[])
+                            RETURNING album_id
+                        """, (user_id, to_remove))
+                        removed = {row[0] for row in cur.fetchall()}
+                        for album_id in to_remove:
+                            statuses[album_id] = "removed" if album_id in removed else "not_rated"
+                conn.commit()
+
+        results = []
+        for item, album_id in zip(items, parsed):
+            if album_id is None:
+                results.append({"album_id": item.get("album_id") if isinstance(item, dict) else item,
+                                "status": "invalid"})
+            else:
+                results.append({"album_id": album_id, "rating": wanted[album_id], "status": statuses[album_id]})
+        return _batch_response(results)
+
+    except Exception as e:
+        print("BATCH RATE ALBUMS ERROR:", e)
+        return _json_error(f"batch_rate_albums_failed: {e}", 500)
+
+
+def rebuild_rating_aggregates():
+    """Recompute album rating count/sum/average from user_rating; returns albums corrected"""
+    with get_db_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT rebuild_album_rating_aggregates()")
+            fixed = cur.fetchone()[0]
+        conn.commit()
+    if fixed:
+        print(f"Rating aggregate check corrected {fixed} albums")
+    return fixed
+
+RATING_AGGREGATE_CHECK = PeriodicJob(
+    rebuild_rating_aggregates,
+    interval=RATING_AGGREGATE_CHECK_INTERVAL,
+    name="rating-aggregate-check"
+)
+
+
 if __name__ == '__main__':
-    app.run(debug=True, host="127.0.0.1", port=5000) # auto-generates HTTPS cert
+    from werkzeug.serving import is_running_from_reloader
+    debug = True
+    if not debug or is_running_from_reloader():
+        # in the serving process, not the reloader watching files
+        check_database()
+        restore_search_cache()
+        ALBUM_BACKFILL.start()
+        RATING_AGGREGATE_CHECK.start()
+    app.run(debug=debug, host="127.0.0.1", port=5000) # auto-generates HTTPS cert
@@ -0,0 +1,158 @@
+import functools
+import gzip
+import hashlib
+import threading
+
+from flask import make_response, request
+
+try:
+    import brotli
+except ImportError:     # optional; gzip only without it
+    brotli = None
+
+
+class HttpCache:
+    """
+    Validators, conditional GETs and compression for JSON responses.
+
+    - @cached(cache_control) on a view adds a strong ETag (hash of the JSON
+      body) and Cache-Control; a matching If-None-Match turns the 200 into
+      a bodyless 304 carrying the ETag the client matched
+    - compress(response) is an after_request hook: JSON bodies of at least
+      min_bytes are sent with brotli (if installed) or gzip, whichever the
+      client accepts; the ETag gets an "-br"/"-gzip" suffix per encoding
+
+    There is no Last-Modified: write times would be per process, and with
+    several workers one that didn't see a write would answer
+    If-Modified-Since with a wrong 304.
+    """
+
+    ENCODING_SUFFIXES = ('-br', '-gzip')
+
+    def __init__(self, min_bytes=1024, gzip_level=6, brotli_quality=5):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+        self._lock = threading.Lock()
+        self._validated = 0         # 200/304 responses that carried an ETag
+        self._not_modified = 0
+        self._bytes_saved_304 = 0
+        self._compressed = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    def _match(self, etag, if_none_match):
+        """The client's tag that matches etag (with its encoding suffix), or None"""
+        for tag in if_none_match.as_set(include_weak=True):
+            if tag == '*':
+                return etag
+            bare = tag
+            for suffix in self.ENCODING_SUFFIXES:
+                if tag.endswith(suffix):
+                    bare = tag[:-len(suffix)]
+                    break
+            if bare == etag:
+                return tag
+        return None
+
+    def check(self, body, if_none_match):
+        """
+        (etag, not_modified) for body given the client's werkzeug ETags from
+        If-None-Match. On a match etag is the tag the client holds, so a 304
+        names the same (possibly compressed) representation as its 200.
+        Doesn't need a Flask request, so the async serving mode uses it too.
+        """
+        etag = hashlib.sha1(body).hexdigest()
+        matched = self._match(etag, if_none_match) if if_none_match else None
+        not_modified = matched is not None
+
+        with self._lock:
+            self._validated += 1
+            if not_modified:
+                self._not_modified += 1
+                self._bytes_saved_304 += len(body)
+        return (matched if not_modified else etag), not_modified
+
+    def conditional(self, response, cache_control):
+        """Add validators to a 200 response and answer 304 if the client's copy is current"""
+        if response.status_code != 200 or response.direct_passthrough:
+            return response
+        response.headers['Cache-Control'] = cache_control
+
+        etag, not_modified = self.check(response.get_data(), request.if_none_match)
+        response.set_etag(etag)
+
+        if not_modified:
+            # compress() skips 304s; the 200 would have varied on encoding
+            response.vary.add('Accept-Encoding')
+            response.status_code = 304
+            response.set_data(b'')
+            response.headers.pop('Content-Type', None)
+            response.headers.pop('Content-Length', None)
+        return response
+
+    def cached(self, cache_control):
+        """View decorator: conditional() on the view's response"""
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                return self.conditional(make_response(view(*args, **kwargs)), cache_control)
+            return wrapper
+        return decorator
+
+    def encode(self, body, accept_encodings):
+        """
+        (data, encoding) for body given the client's werkzeug Accept-Encoding;
+        encoding is None when body is sent as-is.
+        """
+        if len(body) < self.min_bytes:
+            return body, None
+        if brotli is not None and accept_encodings['br']:
+            encoding = 'br'
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        elif accept_encodings['gzip']:
+            encoding = 'gzip'
+            compressed = gzip.compress(body, compresslevel=self.gzip_level)
+        else:
+            return body, None
+        if len(compressed) >= len(body):
+            return body, None
+
+        with self._lock:
+            self._compressed += 1
+            self._bytes_in += len(body)
+            self._bytes_out += len(compressed)
+        return compressed, encoding
+
+    def compress(self, response):
+        if (response.status_code != 200 or response.direct_passthrough
+                or response.mimetype != 'application/json'
+                or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        compressed, encoding = self.encode(response.get_data(), request.accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{encoding}", weak)
+        return response
+
+    def stats(self):
+        with self._lock:
+            return {
+                'validated_responses': self._validated,
+                'not_modified': self._not_modified,
+                'not_modified_ratio': round(self._not_modified / self._validated, 4) if self._validated else 0.0,
+                'bytes_saved_304': self._bytes_saved_304,
+                'compressed_responses': self._compressed,
+                'bytes_before_compression': self._bytes_in,
+                'bytes_after_compression': self._bytes_out,
+                'bytes_saved_compression': self._bytes_in - self._bytes_out,
+                'brotli_available': brotli is not None,
+            }
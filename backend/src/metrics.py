@@ -0,0 +1,218 @@
+import bisect
+import math
+import threading
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _header(name, kind, help_text):
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+class Counter:
+    """Monotonic count per label tuple: inc(('GET', '/x'))"""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = list(self._values.items())
+        lines = _header(self.name, 'counter', self.help)
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+        return lines
+
+
+class Histogram:
+    """
+    Latency distribution per label tuple. Observations land in one
+    non-cumulative bucket (a bisect and an add under the lock); cumulative
+    counts are only built when the metrics are rendered.
+    """
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._children = {}     # labels -> [counts per bucket + overflow, sum]
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._add(labels, index, value)
+
+    def _add(self, labels, index, value):
+        """Record one observation in bucket index; caller holds the lock"""
+        child = self._children.get(labels)
+        if child is None:
+            child = self._children[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        child[0][index] += 1
+        child[1] += value
+
+    def _snapshot(self):
+        """Copy of the children for rendering; caller holds the lock"""
+        return [(labels, (list(counts), total)) for labels, (counts, total) in self._children.items()]
+
+    def _render_children(self, children):
+        lines = []
+        for labels, (counts, total) in children:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, ('le', _number(bound)))} "
+                             f"{cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+    def render(self):
+        with self._lock:
+            children = self._snapshot()
+        return _header(self.name, 'histogram', self.help) + self._render_children(children)
+
+
+class OperationMetrics:
+    """
+    Latency histogram, error counter and in-flight gauge for one kind of
+    operation (HTTP requests, DB queries, Deezer calls), updated together
+    under one lock:
+
+        <prefix>_duration_seconds{labels}   histogram
+        <prefix>_errors_total{labels}       counter
+        <in_flight_name>                    gauge
+
+    This is the observer interface db_pool and deezer_client call:
+    start() when an operation begins, finish(labels, seconds, ok) when it
+    ends (every start() is matched by one finish()).
+    """
+
+    def __init__(self, prefix, help_text, in_flight_name, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.help = help_text
+        self.in_flight_name = in_flight_name
+        self.duration = Histogram(f"{prefix}_duration_seconds", f"{help_text}: latency in seconds",
+                                  labelnames, buckets)
+        self.labelnames = self.duration.labelnames
+        self._lock = self.duration._lock     # one lock for all three
+        self._errors = {}
+        self._in_flight = 0
+
+    def start(self):
+        with self._lock:
+            self._in_flight += 1
+
+    def finish(self, labels, seconds, ok=True):
+        index = bisect.bisect_left(self.duration.buckets, seconds)
+        with self._lock:
+            self._in_flight -= 1
+            self.duration._add(labels, index, seconds)
+            if not ok:
+                self._errors[labels] = self._errors.get(labels, 0) + 1
+
+    def in_flight(self):
+        with self._lock:
+            return self._in_flight
+
+    def render(self):
+        with self._lock:
+            children = self.duration._snapshot()
+            errors = list(self._errors.items())
+            in_flight = self._in_flight
+
+        lines = _header(self.duration.name, 'histogram', self.duration.help)
+        lines += self.duration._render_children(children)
+        name = f"{self.prefix}_errors_total"
+        lines += _header(name, 'counter', f"{self.help}: failures")
+        lines += [f"{name}{_labels(self.labelnames, labels)} {count}" for labels, count in errors]
+        lines += _header(self.in_flight_name, 'gauge', f"{self.help}: currently running")
+        lines.append(f"{self.in_flight_name} {in_flight}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    Values read at scrape time from fn() -> iterable of (label values, value),
+    for counts other components already keep in their stats().
+    """
+
+    def __init__(self, name, kind, help_text, labelnames, fn):
+        self.name = name
+        self.kind = kind
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self):
+        lines = _header(self.name, self.kind, self.help)
+        try:
+            samples = list(self.fn())
+        except Exception as e:
+            print(f"Error collecting metric {self.name}: {e}")
+            return lines
+        lines += [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                  for labels, value in samples if value is not None]
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text format (version 0.0.4)"""
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = []
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self.register(Counter(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def operation(self, prefix, help_text, in_flight_name, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(OperationMetrics(prefix, help_text, in_flight_name, labelnames, buckets))
+
+    def callback(self, name, kind, help_text, labelnames, fn):
+        return self.register(CallbackMetric(name, kind, help_text, labelnames, fn))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines += metric.render()
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,37 @@
+import base64
+import binascii
+import json
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that wasn't produced by encode_cursor or has the wrong shape"""
+
+
+def encode_cursor(values):
+    """Opaque page cursor for the sort key of the last row on a page"""
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, types):
+    """
+    Decode a cursor back into its sort key values. `types` gives the
+    expected type of each value, e.g. (str, int); ints are accepted where a
+    float is expected.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw.decode('utf-8'))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("malformed cursor")
+
+    if not isinstance(values, list) or len(values) != len(types):
+        raise InvalidCursor("malformed cursor")
+    for value, expected in zip(values, types):
+        if isinstance(value, bool):
+            raise InvalidCursor("malformed cursor")
+        if expected is float and isinstance(value, int):
+            continue
+        if not isinstance(value, expected):
+            raise InvalidCursor("malformed cursor")
+    return values
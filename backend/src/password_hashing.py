@@ -0,0 +1,113 @@
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when too many hash jobs are already waiting for the pool"""
+
+
+def hash_method(pwhash):
+    """'scrypt:32768:8:1$salt$hash' -> 'scrypt:32768:8:1'"""
+    return pwhash.split('$', 1)[0] if pwhash else ''
+
+
+class PasswordHasher:
+    """
+    Runs werkzeug's password hashing in a dedicated process pool so the
+    CPU-heavy work doesn't stall the request threads.
+
+    - method is the werkzeug hash method, i.e. the hash cost
+      (e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000")
+    - at most max_pending jobs may be queued or running; past that callers
+      wait up to queue_timeout seconds and then get HashingBusy
+    - workers=0 hashes inline on the calling thread
+    """
+
+    def __init__(self, method="scrypt:32768:8:1", workers=2, max_pending=32, queue_timeout=5.0,
+                 job_timeout=30.0):
+        self.method = method
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self.job_timeout = job_timeout
+
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self._hashes = 0
+        self._verifies = 0
+        self._busy = 0
+        self._time_total = 0.0
+        self._time_max = 0.0
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    # spawn: forking a process that already runs request threads is unsafe
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context("spawn")
+                    )
+        return self._executor
+
+    def _run(self, fn, *args):
+        started = time.monotonic()
+        if self.workers <= 0:
+            result = fn(*args)
+        else:
+            if not self._slots.acquire(timeout=self.queue_timeout):
+                with self._stats_lock:
+                    self._busy += 1
+                raise HashingBusy("password hashing queue is full")
+            try:
+                result = self._get_executor().submit(fn, *args).result(self.job_timeout)
+            finally:
+                self._slots.release()
+
+        elapsed = time.monotonic() - started
+        with self._stats_lock:
+            self._time_total += elapsed
+            if elapsed > self._time_max:
+                self._time_max = elapsed
+        return result
+
+    def hash(self, password):
+        result = self._run(generate_password_hash, password, self.method)
+        with self._stats_lock:
+            self._hashes += 1
+        return result
+
+    def verify(self, pwhash, password):
+        result = self._run(check_password_hash, pwhash, password)
+        with self._stats_lock:
+            self._verifies += 1
+        return result
+
+    def needs_rehash(self, pwhash):
+        """True if pwhash was made with a different method/cost than the configured one"""
+        return hash_method(pwhash) != self.method
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def stats(self):
+        with self._stats_lock:
+            jobs = self._hashes + self._verifies
+            return {
+                'method': self.method,
+                'workers': self.workers,
+                'hashes': self._hashes,
+                'verifies': self._verifies,
+                'busy_rejections': self._busy,
+                'avg_ms': round(self._time_total * 1000 / jobs, 3) if jobs else 0.0,
+                'max_ms': round(self._time_max * 1000, 3),
+            }
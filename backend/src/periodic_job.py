@@ -0,0 +1,87 @@
+import threading
+import time
+
+
+class PeriodicJob:
+    """
+    Runs fn() on a daemon thread every `interval` seconds (first run after
+    initial_delay, default one interval). Exceptions are logged and counted;
+    the job keeps its schedule. run_now() runs it on the calling thread.
+    """
+
+    def __init__(self, fn, interval, name="periodic-job", initial_delay=None):
+        self.fn = fn
+        self.interval = interval
+        self.name = name
+        self.initial_delay = interval if initial_delay is None else initial_delay
+
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()   # one run at a time, thread or run_now()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self._runs = 0
+        self._errors = 0
+        self._last_result = None
+        self._last_error = None
+        self._last_run_ms = 0.0
+        self._last_run_at = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def run_now(self):
+        """Run the job once and return its result (re-raises its exception)"""
+        with self._run_lock:
+            started = time.monotonic()
+            try:
+                result = self.fn()
+            except Exception as e:
+                with self._lock:
+                    self._errors += 1
+                    self._last_error = str(e)
+                raise
+            finally:
+                with self._lock:
+                    self._runs += 1
+                    self._last_run_ms = (time.monotonic() - started) * 1000
+                    self._last_run_at = time.time()
+            with self._lock:
+                self._last_result = result
+                self._last_error = None
+            return result
+
+    def _loop(self):
+        if self._stop.wait(self.initial_delay):
+            return
+        while True:
+            try:
+                self.run_now()
+            except Exception as e:
+                print(f"Error in {self.name}: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def stats(self):
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'runs': self._runs,
+                'errors': self._errors,
+                'last_result': self._last_result,
+                'last_error': self._last_error,
+                'last_run_ms': round(self._last_run_ms, 3),
+                'last_run_at': self._last_run_at,
+            }
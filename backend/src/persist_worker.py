@@ -0,0 +1,211 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def _merge_album(old, new):
+    """Newer data wins, but don't let an empty field wipe out one we already had"""
+    merged = dict(old)
+    for key, value in new.items():
+        if value not in (None, '', []):
+            merged[key] = value
+        else:
+            merged.setdefault(key, value)
+    return merged
+
+
+class WriteBehindQueue:
+    """
+    Background persistence worker for albums leaving the search cache.
+
+    submit() only queues work: albums are coalesced by deezer_id and a daemon
+    thread hands them to save_batch(albums) in batches of batch_size, at least
+    every flush_interval seconds. save_batch must return how many albums it
+    saved successfully.
+
+    The queue holds at most max_pending albums. When it is full submit()
+    waits up to put_timeout seconds for the worker to catch up (backpressure)
+    and then drops what still doesn't fit, counting it in stats();
+    submit(albums, block=False) drops right away instead of waiting.
+    """
+
+    def __init__(self, save_batch, max_pending=5000, batch_size=50, flush_interval=2.0,
+                 put_timeout=0.5, name="album-write-behind"):
+        self.save_batch = save_batch
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()   # deezer_id -> album
+        self._thread = None
+        self._stopping = False
+        self._flushing = 0              # albums taken by the worker but not yet saved
+        self._in_flight = {}            # id(batch) -> batch, for pending()
+
+        self._submitted = 0
+        self._coalesced = 0
+        self._dropped = 0
+        self._saved = 0
+        self._errors = 0
+        self._batches = 0
+        self._max_depth = 0
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
+        self._last_flush_ms = 0.0
+
+    def start(self):
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def submit(self, albums, block=True):
+        """Queue albums for saving; returns the number that were dropped"""
+        self.start()
+        dropped = 0
+        deadline = time.monotonic() + (self.put_timeout if block else 0)
+        with self._cond:
+            for album in albums:
+                deezer_id = str(album.get('deezer_id'))
+                self._submitted += 1
+                if deezer_id in self._pending:
+                    self._pending[deezer_id] = _merge_album(self._pending[deezer_id], album)
+                    self._coalesced += 1
+                    continue
+                while len(self._pending) >= self.max_pending:
+                    self._cond.notify_all()     # wake the worker early
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if len(self._pending) >= self.max_pending:
+                    dropped += 1
+                    continue
+                self._pending[deezer_id] = dict(album)
+            self._dropped += dropped
+            depth = len(self._pending)
+            if depth > self._max_depth:
+                self._max_depth = depth
+            if depth >= self.batch_size:
+                self._cond.notify_all()
+        if dropped:
+            print(f"Write-behind queue full, dropped {dropped} album(s)")
+        return dropped
+
+    def _take_batch(self):
+        batch = []
+        while self._pending and len(batch) < self.batch_size:
+            _, album = self._pending.popitem(last=False)
+            batch.append(album)
+        self._flushing += len(batch)
+        if batch:
+            self._in_flight[id(batch)] = batch
+        return batch
+
+    def _save(self, batch):
+        started = time.monotonic()
+        try:
+            saved = self.save_batch(batch)
+        except Exception as e:
+            print(f"Error in write-behind flush: {e}")
+            saved = 0
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._flushing -= len(batch)
+            self._in_flight.pop(id(batch), None)
+            self._batches += 1
+            self._saved += saved
+            self._errors += len(batch) - saved
+            self._flush_time_total += elapsed
+            self._last_flush_ms = elapsed * 1000
+            if elapsed > self._flush_time_max:
+                self._flush_time_max = elapsed
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._pending) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+                if self._stopping and not self._pending:
+                    return
+                batch = self._take_batch()
+            if batch:
+                self._save(batch)
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been saved"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            if self._thread is None or not self._thread.is_alive():
+                # No worker (never started or already stopped): save inline.
+                while self._pending:
+                    batch = self._take_batch()
+                    self._cond.release()
+                    try:
+                        self._save(batch)
+                    finally:
+                        self._cond.acquire()
+                return True
+            self._cond.notify_all()
+            while self._pending or self._flushing:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def pending(self):
+        """Snapshot of the albums not saved yet: queued plus those being saved"""
+        with self._cond:
+            albums = list(self._pending.values())
+            for batch in self._in_flight.values():
+                albums.extend(batch)
+            return albums
+
+    def drain(self):
+        """Take every queued album out of the queue, for the caller to save"""
+        with self._cond:
+            albums = list(self._pending.values())
+            self._pending.clear()
+            self._cond.notify_all()
+            return albums
+
+    def stop(self, flush=True, timeout=None):
+        """
+        Stop the worker, saving whatever is still queued if flush is True.
+        Returns False if that didn't finish within timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        flushed = self.flush(timeout) if flush else True
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        return flushed
+
+    def stats(self):
+        with self._cond:
+            return {
+                'queue_depth': len(self._pending),
+                'in_flight': self._flushing,
+                'max_queue_depth': self._max_depth,
+                'max_pending': self.max_pending,
+                'submitted': self._submitted,
+                'coalesced': self._coalesced,
+                'dropped': self._dropped,
+                'saved': self._saved,
+                'errors': self._errors,
+                'batches': self._batches,
+                'last_flush_ms': round(self._last_flush_ms, 3),
+                'avg_flush_ms': round(self._flush_time_total * 1000 / self._batches, 3)
+                                if self._batches else 0.0,
+                'max_flush_ms': round(self._flush_time_max * 1000, 3),
+            }
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+from array import array
+
+
+class AlbumIdSampler:
+    """
+    In-memory array of every album_id, refreshed every refresh_interval
+    seconds, so picking n random albums is O(n) instead of sorting the
+    whole album table with ORDER BY RANDOM().
+
+    - sample(n) never returns the same id twice in one call
+    - the first sample() loads the ids synchronously; after that an
+      out-of-date array keeps being served while a background thread reloads
+      it, so albums added since the last refresh show up within about
+      refresh_interval seconds
+    - load_ids() must return an iterable of integer album ids
+    """
+
+    def __init__(self, load_ids, refresh_interval=300):
+        self.load_ids = load_ids
+        self.refresh_interval = refresh_interval
+
+        self._lock = threading.Lock()
+        self._ids = array('q')
+        self._loaded_at = None
+        self._refreshing = False
+        self._random = random.Random()
+        self._initial_load = threading.Lock()
+
+        self._refreshes = 0
+        self._refresh_errors = 0
+        self._last_refresh_ms = 0.0
+        self._samples = 0
+
+    def refresh(self):
+        """Reload the id array now (blocking)"""
+        started = time.monotonic()
+        try:
+            ids = array('q', self.load_ids())
+        except Exception:
+            with self._lock:
+                self._refresh_errors += 1
+                self._refreshing = False
+            raise
+        with self._lock:
+            self._ids = ids
+            self._loaded_at = time.monotonic()
+            self._refreshing = False
+            self._refreshes += 1
+            self._last_refresh_ms = (self._loaded_at - started) * 1000
+
+    def _refresh_in_background(self):
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing random album ids: {e}")
+
+        threading.Thread(target=run, name="album-id-refresh", daemon=True).start()
+
+    def sample(self, n, exclude=()):
+        """Return up to n distinct random album ids (fewer only if the catalog is smaller)"""
+        if self._loaded_at is None:
+            with self._initial_load:
+                if self._loaded_at is None:
+                    self.refresh()
+
+        with self._lock:
+            ids = self._ids
+            stale = time.monotonic() - self._loaded_at > self.refresh_interval
+            if stale and not self._refreshing:
+                self._refreshing = True
+                start_refresh = True
+            else:
+                start_refresh = False
+            self._samples += 1
+
+        if start_refresh:
+            self._refresh_in_background()
+
+        n = max(0, min(n, len(ids) - len(exclude)))
+        if n == 0:
+            return []
+        if not exclude:
+            return [ids[i] for i in self._random.sample(range(len(ids)), n)]
+
+        # Rejection sampling; exclude is small (ids already returned to the caller)
+        exclude = set(exclude)
+        picked = set()
+        result = []
+        attempts = 0
+        while len(result) < n and attempts < n * 20:
+            attempts += 1
+            album_id = ids[self._random.randrange(len(ids))]
+            if album_id in exclude or album_id in picked:
+                continue
+            picked.add(album_id)
+            result.append(album_id)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'ids': len(self._ids),
+                'age_seconds': round(time.monotonic() - self._loaded_at, 1)
+                               if self._loaded_at is not None else None,
+                'refresh_interval': self.refresh_interval,
+                'refreshes': self._refreshes,
+                'refresh_errors': self._refresh_errors,
+                'last_refresh_ms': round(self._last_refresh_ms, 3),
+                'samples': self._samples,
+            }
@@ -0,0 +1,233 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ('albums', 'expires_at', 'size', 'seq')
+
+    def __init__(self, albums, expires_at, size, seq):
+        self.albums = albums
+        self.expires_at = expires_at
+        self.size = size
+        self.seq = seq
+
+
+class SearchCache:
+    """
+    Bounded in-memory cache of search result pages ("query:page" -> albums).
+
+    - deezer_id index so album lookups are O(1) instead of scanning every page
+    - LRU eviction once max_entries or max_bytes is exceeded
+    - per-entry TTL; expired entries are dropped by expire(), which only
+      looks at entries that are actually due (min-heap on expiry time)
+
+    Entries that leave the cache (expired or evicted) are handed to
+    on_remove(key, albums, reason) so the caller can persist them. The
+    callback always runs outside the cache lock.
+
+    The cache belongs to one process; shared_search_cache has backends with
+    the same interface that every worker process can share (see
+    create_search_cache).
+    """
+
+    shared = False
+
+    def __init__(self, ttl_seconds, max_entries=10000, max_bytes=64 * 1024 * 1024,
+                 on_remove=None):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_remove = on_remove
+
+        self._lock = threading.RLock()
+        self._entries = OrderedDict()   # key -> _Entry, least recently used first
+        self._index = {}                # deezer_id -> {key: album}
+        self._expiry_heap = []          # (expires_at, seq, key)
+        self._seq = itertools.count()
+        self._bytes = 0
+
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+
+    @staticmethod
+    def _estimate_size(albums):
+        try:
+            return len(json.dumps(albums, default=str))
+        except (TypeError, ValueError):
+            return 0
+
+    def _unlink(self, key):
+        """Drop key from the entry map and the id index; caller holds the lock"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        for album in entry.albums:
+            deezer_id = str(album.get('deezer_id'))
+            keys = self._index.get(deezer_id)
+            if keys is not None:
+                keys.pop(key, None)
+                if not keys:
+                    del self._index[deezer_id]
+        return entry
+
+    def _notify(self, removed):
+        if self.on_remove is None:
+            return
+        for key, albums, reason in removed:
+            self.on_remove(key, albums, reason)
+
+    def store(self, key, albums, ttl_seconds=None):
+        """Store (or replace) a page of albums under key"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        albums = list(albums)
+        size = self._estimate_size(albums)
+        removed = []
+
+        with self._lock:
+            if key in self._entries:
+                self._unlink(key)
+
+            seq = next(self._seq)
+            expires_at = time.monotonic() + ttl
+            self._entries[key] = _Entry(albums, expires_at, size, seq)
+            self._bytes += size
+            heapq.heappush(self._expiry_heap, (expires_at, seq, key))
+            for album in albums:
+                self._index.setdefault(str(album.get('deezer_id')), {})[key] = album
+
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._bytes > self.max_bytes):
+                lru_key = next(iter(self._entries))
+                if lru_key == key and len(self._entries) == 1:
+                    break   # never evict the page we are storing
+                entry = self._unlink(lru_key)
+                self._evicted += 1
+                removed.append((lru_key, entry.albums, 'evicted'))
+
+        self._notify(removed)
+
+    def get_album(self, deezer_id):
+        """Return the cached album with this deezer_id, or None"""
+        now = time.monotonic()
+        with self._lock:
+            keys = self._index.get(str(deezer_id))
+            if keys:
+                for key, album in reversed(list(keys.items())):
+                    entry = self._entries[key]
+                    if entry.expires_at > now:
+                        self._entries.move_to_end(key)
+                        self._hits += 1
+                        return album
+            self._misses += 1
+            return None
+
+    def update_album(self, deezer_id, fields):
+        """Merge fields into every cached copy of an album; returns False if it isn't cached"""
+        with self._lock:
+            keys = self._index.get(str(deezer_id))
+            if not keys:
+                return False
+            for key, album in keys.items():
+                album.update(fields)
+                entry = self._entries[key]
+                size = self._estimate_size(entry.albums)
+                self._bytes += size - entry.size
+                entry.size = size
+            return True
+
+    def expire(self):
+        """Remove entries whose TTL has passed; returns the removed keys"""
+        now = time.monotonic()
+        removed = []
+        with self._lock:
+            heap = self._expiry_heap
+            while heap and heap[0][0] <= now:
+                _, seq, key = heapq.heappop(heap)
+                entry = self._entries.get(key)
+                if entry is None or entry.seq != seq:
+                    continue    # replaced or evicted since this heap item was pushed
+                self._unlink(key)
+                self._expired += 1
+                removed.append((key, entry.albums, 'expired'))
+
+            # Heap items for replaced/evicted entries are skipped lazily above;
+            # rebuild if they start to dominate so the heap stays bounded.
+            if len(heap) > 2 * len(self._entries) + 64:
+                self._expiry_heap = [(e.expires_at, e.seq, k) for k, e in self._entries.items()]
+                heapq.heapify(self._expiry_heap)
+
+        self._notify(removed)
+        return [key for key, _, _ in removed]
+
+    def items(self):
+        """Snapshot of (key, albums) for every cached page"""
+        with self._lock:
+            return [(key, entry.albums) for key, entry in self._entries.items()]
+
+    def items_with_ttl(self):
+        """Snapshot of (key, albums, seconds_left) for every unexpired page"""
+        now = time.monotonic()
+        with self._lock:
+            return [(key, entry.albums, entry.expires_at - now)
+                    for key, entry in self._entries.items() if entry.expires_at > now]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._expiry_heap = []
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'albums_indexed': len(self._index),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'evicted': self._evicted,
+            }
+
+
+def create_search_cache(url, ttl_seconds, max_entries=10000, max_bytes=64 * 1024 * 1024, on_remove=None):
+    """
+    Search cache backend for a URL:
+
+    - memory://                 this process only (SearchCache)
+    - sqlite:////path/to/file   a SQLite file shared by the processes on one
+                                host; a path on /dev/shm keeps it in shared memory
+    - redis://host:6379/0       a Redis-protocol server shared by every host
+                                (also rediss:// and unix://)
+    """
+    scheme, sep, rest = url.partition('://')
+    if not sep:
+        raise ValueError(f"search cache URL needs a scheme: {url!r}")
+    kwargs = dict(ttl_seconds=ttl_seconds, max_entries=max_entries, max_bytes=max_bytes, on_remove=on_remove)
+
+    if scheme == 'memory':
+        return SearchCache(**kwargs)
+    if scheme == 'sqlite':
+        from shared_search_cache import SqliteSearchCache
+        return SqliteSearchCache(rest[1:] if rest.startswith('/') else rest, **kwargs)
+    if scheme in ('redis', 'rediss', 'unix'):
+        from shared_search_cache import RedisSearchCache
+        return RedisSearchCache(url, **kwargs)
+    raise ValueError(f"unsupported search cache URL: {url!r}")
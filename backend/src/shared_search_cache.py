@@ -0,0 +1,517 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import redis
+except ImportError:     # optional; only needed for redis:// search cache URLs
+    redis = None
+
+
+def _find_album(albums, deezer_id):
+    for album in albums:
+        if str(album.get('deezer_id')) == deezer_id:
+            return album
+    return None
+
+
+_SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS search_pages (
+        key TEXT PRIMARY KEY,
+        albums TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        last_access REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS search_pages_expires_at ON search_pages (expires_at);
+    CREATE INDEX IF NOT EXISTS search_pages_last_access ON search_pages (last_access);
+
+    CREATE TABLE IF NOT EXISTS search_page_albums (
+        deezer_id TEXT NOT NULL,
+        key TEXT NOT NULL,
+        PRIMARY KEY (deezer_id, key)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS search_page_albums_key ON search_page_albums (key);
+
+    -- entry count and size kept up to date by triggers, so store() can check
+    -- the limits without scanning the table
+    CREATE TABLE IF NOT EXISTS search_cache_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        entries INTEGER NOT NULL,
+        bytes INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO search_cache_totals VALUES (0, 0, 0);
+
+    CREATE TRIGGER IF NOT EXISTS search_pages_insert AFTER INSERT ON search_pages BEGIN
+        UPDATE search_cache_totals SET entries = entries + 1, bytes = bytes + NEW.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS search_pages_delete AFTER DELETE ON search_pages BEGIN
+        UPDATE search_cache_totals SET entries = entries - 1, bytes = bytes - OLD.size;
+    END;
+    CREATE TRIGGER IF NOT EXISTS search_pages_resize AFTER UPDATE OF size ON search_pages BEGIN
+        UPDATE search_cache_totals SET bytes = bytes + NEW.size - OLD.size;
+    END;
+"""
+
+
+class SqliteSearchCache:
+    """
+    SearchCache kept in a SQLite file (WAL mode), shared by every worker
+    process on the host: a search served by one worker is a hit when the
+    album click lands on another. Put the file on /dev/shm to keep it in
+    shared memory.
+
+    - same interface as SearchCache; TTLs use wall-clock time, since
+      monotonic clocks can't be compared across processes
+    - LRU eviction once max_entries or max_bytes is exceeded
+    - expired and evicted pages are deleted in a write transaction, so each
+      one is handed to on_remove(key, albums, reason) by exactly one process
+    - expire() looks at the file at most every expire_interval seconds
+    - every process (including forked workers) opens its own connection
+    """
+
+    shared = True
+
+    def __init__(self, path, ttl_seconds, max_entries=10000, max_bytes=64 * 1024 * 1024,
+                 on_remove=None, expire_interval=1.0):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_remove = on_remove
+        self.expire_interval = expire_interval
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = None
+        self._pid = None
+        self._next_expire = 0.0
+
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+
+        with self._lock:
+            self._conn()
+
+    def _conn(self):
+        """This process's connection; caller holds the lock"""
+        if self._pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(_SQLITE_SCHEMA)
+            self._db, self._pid = db, os.getpid()
+        return self._db
+
+    @contextmanager
+    def _transaction(self, db):
+        # IMMEDIATE takes the write lock up front, so concurrent writers queue
+        # on busy_timeout instead of failing to upgrade a read lock
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    @staticmethod
+    def _delete_pages(db, where, params):
+        """Delete matching pages and their album index rows; returns [(key, albums_json)]"""
+        rows = db.execute(f"DELETE FROM search_pages WHERE {where} RETURNING key, albums", params).fetchall()
+        db.executemany("DELETE FROM search_page_albums WHERE key = ?", [(key,) for key, _ in rows])
+        return rows
+
+    def _notify(self, removed):
+        if self.on_remove is None:
+            return
+        for key, albums, reason in removed:
+            self.on_remove(key, albums, reason)
+
+    def store(self, key, albums, ttl_seconds=None):
+        """Store (or replace) a page of albums under key"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        albums = list(albums)
+        body = json.dumps(albums, default=str)
+        now = time.time()
+        removed = []
+
+        with self._lock:
+            db = self._conn()
+            with self._transaction(db):
+                self._delete_pages(db, "key = ?", (key,))
+                db.execute(
+                    "INSERT INTO search_pages (key, albums, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, body, len(body), now + ttl, now)
+                )
+                db.executemany(
+                    "INSERT OR IGNORE INTO search_page_albums (deezer_id, key) VALUES (?, ?)",
+                    [(str(album.get('deezer_id')), key) for album in albums]
+                )
+
+                while True:
+                    entries, size = db.execute("SELECT entries, bytes FROM search_cache_totals").fetchone()
+                    if entries <= self.max_entries and size <= self.max_bytes:
+                        break
+                    # never evict the page we are storing
+                    lru = self._delete_pages(db, """key = (
+                        SELECT key FROM search_pages WHERE key != ? ORDER BY last_access LIMIT 1
+                    )""", (key,))
+                    if not lru:
+                        break
+                    removed.extend((lru_key, lru_albums, 'evicted') for lru_key, lru_albums in lru)
+            self._evicted += len(removed)
+
+        self._notify([(k, json.loads(a), reason) for k, a, reason in removed])
+
+    def get_album(self, deezer_id):
+        """Return the cached album with this deezer_id, or None"""
+        deezer_id = str(deezer_id)
+        now = time.time()
+        with self._lock:
+            db = self._conn()
+            row = db.execute("""
+                SELECT p.key, p.albums
+                FROM search_page_albums pa
+                JOIN search_pages p ON p.key = pa.key
+                WHERE pa.deezer_id = ? AND p.expires_at > ?
+                ORDER BY p.last_access DESC
+                LIMIT 1
+            """, (deezer_id, now)).fetchone()
+            album = _find_album(json.loads(row[1]), deezer_id) if row else None
+            if album is None:
+                self._misses += 1
+                return None
+            db.execute("UPDATE search_pages SET last_access = ? WHERE key = ?", (now, row[0]))
+            self._hits += 1
+            return album
+
+    def update_album(self, deezer_id, fields):
+        """Merge fields into every cached copy of an album; returns False if it isn't cached"""
+        deezer_id = str(deezer_id)
+        with self._lock:
+            db = self._conn()
+            with self._transaction(db):
+                rows = db.execute("""
+                    SELECT p.key, p.albums
+                    FROM search_page_albums pa
+                    JOIN search_pages p ON p.key = pa.key
+                    WHERE pa.deezer_id = ?
+                """, (deezer_id,)).fetchall()
+                for key, body in rows:
+                    albums = json.loads(body)
+                    _find_album(albums, deezer_id).update(fields)
+                    body = json.dumps(albums, default=str)
+                    db.execute("UPDATE search_pages SET albums = ?, size = ? WHERE key = ?",
+                               (body, len(body), key))
+            return bool(rows)
+
+    def expire(self):
+        """Remove entries whose TTL has passed; returns the removed keys"""
+        now = time.time()
+        with self._lock:
+            if now < self._next_expire:
+                return []
+            self._next_expire = now + self.expire_interval
+
+            db = self._conn()
+            # read-only check first, so the common case takes no write lock
+            if db.execute("SELECT 1 FROM search_pages WHERE expires_at <= ? LIMIT 1", (now,)).fetchone() is None:
+                return []
+            with self._transaction(db):
+                removed = self._delete_pages(db, "expires_at <= ?", (now,))
+            self._expired += len(removed)
+
+        self._notify([(key, json.loads(albums), 'expired') for key, albums in removed])
+        return [key for key, _ in removed]
+
+    def items(self):
+        """Snapshot of (key, albums) for every cached page"""
+        with self._lock:
+            rows = self._conn().execute("SELECT key, albums FROM search_pages").fetchall()
+        return [(key, json.loads(albums)) for key, albums in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._conn().execute("SELECT entries FROM search_cache_totals").fetchone()[0]
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._conn().execute("SELECT 1 FROM search_pages WHERE key = ?", (key,)).fetchone() is not None
+
+    def clear(self):
+        with self._lock:
+            db = self._conn()
+            with self._transaction(db):
+                db.execute("DELETE FROM search_page_albums")
+                db.execute("DELETE FROM search_pages")
+
+    def close(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                self._db.close()
+            self._db = self._pid = None
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn().execute("SELECT entries, bytes FROM search_cache_totals").fetchone()
+            return {
+                'backend': 'sqlite',
+                'path': self.path,
+                'entries': entries,
+                'bytes': size,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                # counters below are this process's
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'evicted': self._evicted,
+            }
+
+
+class RedisSearchCache:
+    """
+    SearchCache on a Redis-protocol server (Redis, Valkey, KeyDB, ...),
+    shared by every worker process on every host.
+
+    Keys, all under `prefix`:
+      page:<key>         JSON list of albums
+      album:<deezer_id>  set of page keys holding that album
+      expiry / access    sorted sets of page keys by expiry / last access time
+      size, bytes        per-page JSON size and the total
+
+    Pages aren't given a Redis TTL of ttl_seconds, because a page Redis drops
+    on its own never reaches on_remove (and the database). expire() and
+    eviction remove each page in a WATCH/MULTI transaction, so exactly one
+    process hands it to on_remove. As a backstop for pages nobody expires,
+    keys do get a Redis TTL of ttl_seconds + orphan_grace.
+    """
+
+    shared = True
+
+    def __init__(self, url, ttl_seconds, max_entries=10000, max_bytes=64 * 1024 * 1024,
+                 on_remove=None, expire_interval=1.0, prefix='search-cache:', orphan_grace=24 * 60 * 60):
+        if redis is None:
+            raise RuntimeError("the redis package is required for redis:// search cache URLs")
+        self.url = url
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.on_remove = on_remove
+        self.expire_interval = expire_interval
+        self.prefix = prefix
+        self.orphan_grace = orphan_grace
+
+        # redis-py's connection pool is thread-safe and reconnects after fork
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._expiry = prefix + 'expiry'
+        self._access = prefix + 'access'
+        self._sizes = prefix + 'size'
+        self._bytes = prefix + 'bytes'
+
+        self._lock = threading.Lock()
+        self._next_expire = 0.0
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._evicted = 0
+
+    def _page(self, key):
+        return f"{self.prefix}page:{key}"
+
+    def _album(self, deezer_id):
+        return f"{self.prefix}album:{deezer_id}"
+
+    def _notify(self, removed):
+        if self.on_remove is None:
+            return
+        for key, albums, reason in removed:
+            self.on_remove(key, albums, reason)
+
+    def _remove(self, key, due_by=None):
+        """
+        Remove one page and return its albums, or None if another process
+        removed or replaced it first (or, with due_by, it isn't due yet).
+        """
+        page = self._page(key)
+        with self._redis.pipeline() as pipe:
+            try:
+                pipe.watch(page)
+                if due_by is not None:
+                    expires_at = pipe.zscore(self._expiry, key)
+                    if expires_at is None or expires_at > due_by:
+                        return None
+                body = pipe.get(page)
+                size = int(pipe.hget(self._sizes, key) or 0)
+                albums = json.loads(body) if body is not None else []
+
+                pipe.multi()
+                pipe.delete(page)
+                pipe.zrem(self._expiry, key)
+                pipe.zrem(self._access, key)
+                pipe.hdel(self._sizes, key)
+                pipe.decrby(self._bytes, size)
+                for album in albums:
+                    pipe.srem(self._album(album.get('deezer_id')), key)
+                pipe.execute()
+            except redis.WatchError:
+                return None
+        # body is None if the orphan backstop TTL already dropped the page
+        return albums if body is not None else None
+
+    def store(self, key, albums, ttl_seconds=None):
+        """Store (or replace) a page of albums under key"""
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        albums = list(albums)
+        body = json.dumps(albums, default=str)
+        now = time.time()
+        keep_ms = int((ttl + self.orphan_grace) * 1000)
+
+        def write(pipe):
+            previous = int(pipe.hget(self._sizes, key) or 0)
+            pipe.multi()
+            pipe.set(self._page(key), body, px=keep_ms)
+            pipe.zadd(self._expiry, {key: now + ttl})
+            pipe.zadd(self._access, {key: now})
+            pipe.hset(self._sizes, key, len(body))
+            pipe.incrby(self._bytes, len(body) - previous)
+            for album in albums:
+                album_key = self._album(album.get('deezer_id'))
+                pipe.sadd(album_key, key)
+                pipe.pexpire(album_key, keep_ms)
+
+        self._redis.transaction(write, self._page(key))
+
+        removed = []
+        while True:
+            entries = self._redis.zcard(self._access)
+            if entries <= self.max_entries and int(self._redis.get(self._bytes) or 0) <= self.max_bytes:
+                break
+            lru_key = next((k for k in self._redis.zrange(self._access, 0, 1) if k != key), None)
+            if lru_key is None:
+                break   # never evict the page we are storing
+            evicted = self._remove(lru_key)
+            if evicted is not None:
+                removed.append((lru_key, evicted, 'evicted'))
+        with self._lock:
+            self._evicted += len(removed)
+        self._notify(removed)
+
+    def get_album(self, deezer_id):
+        """Return the cached album with this deezer_id, or None"""
+        deezer_id = str(deezer_id)
+        now = time.time()
+        keys = list(self._redis.smembers(self._album(deezer_id)))
+        album = None
+        if keys:
+            with self._redis.pipeline(transaction=False) as pipe:
+                for key in keys:
+                    pipe.get(self._page(key))
+                    pipe.zscore(self._expiry, key)
+                results = pipe.execute()
+            # freshest page first, like the in-process cache's newest entry
+            pages = sorted(
+                ((expires_at, key, body) for key, body, expires_at in zip(keys, results[::2], results[1::2])
+                 if body is not None and expires_at is not None and expires_at > now),
+                reverse=True
+            )
+            for _, key, body in pages:
+                album = _find_album(json.loads(body), deezer_id)
+                if album is not None:
+                    self._redis.zadd(self._access, {key: now})
+                    break
+
+        with self._lock:
+            if album is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return album
+
+    def update_album(self, deezer_id, fields):
+        """Merge fields into every cached copy of an album; returns False if it isn't cached"""
+        deezer_id = str(deezer_id)
+        updated = False
+        for key in self._redis.smembers(self._album(deezer_id)):
+            page = self._page(key)
+
+            def merge(pipe):
+                nonlocal updated
+                body = pipe.get(page)
+                albums = json.loads(body) if body is not None else []
+                album = _find_album(albums, deezer_id)
+                if album is None:
+                    return
+                album.update(fields)
+                body = json.dumps(albums, default=str)
+                previous = int(pipe.hget(self._sizes, key) or 0)
+                pipe.multi()
+                pipe.set(page, body, keepttl=True)
+                pipe.hset(self._sizes, key, len(body))
+                pipe.incrby(self._bytes, len(body) - previous)
+                updated = True
+
+            self._redis.transaction(merge, page)
+        return updated
+
+    def expire(self):
+        """Remove entries whose TTL has passed; returns the removed keys"""
+        now = time.time()
+        with self._lock:
+            if now < self._next_expire:
+                return []
+            self._next_expire = now + self.expire_interval
+
+        removed = []
+        for key in self._redis.zrangebyscore(self._expiry, '-inf', now, start=0, num=1000):
+            albums = self._remove(key, due_by=now)
+            if albums is not None:
+                removed.append((key, albums, 'expired'))
+        with self._lock:
+            self._expired += len(removed)
+        self._notify(removed)
+        return [key for key, _, _ in removed]
+
+    def items(self):
+        """Snapshot of (key, albums) for every cached page"""
+        keys = self._redis.zrange(self._access, 0, -1)
+        bodies = self._redis.mget([self._page(key) for key in keys]) if keys else []
+        return [(key, json.loads(body)) for key, body in zip(keys, bodies) if body is not None]
+
+    def __len__(self):
+        return self._redis.zcard(self._access)
+
+    def __contains__(self, key):
+        return self._redis.zscore(self._access, key) is not None
+
+    def clear(self):
+        keys = list(self._redis.scan_iter(match=self.prefix + '*', count=1000))
+        for i in range(0, len(keys), 1000):
+            self._redis.delete(*keys[i:i + 1000])
+
+    def close(self):
+        self._redis.close()
+
+    def stats(self):
+        entries = self._redis.zcard(self._access)
+        size = int(self._redis.get(self._bytes) or 0)
+        with self._lock:
+            return {
+                'backend': 'redis',
+                'entries': entries,
+                'bytes': size,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                # counters below are this process's
+                'hits': self._hits,
+                'misses': self._misses,
+                'expired': self._expired,
+                'evicted': self._evicted,
+            }
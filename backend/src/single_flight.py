@@ -0,0 +1,121 @@
+import asyncio
+import threading
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters', 'futures')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        self.futures = []   # (loop, future) of do_async() waiters
+
+
+def _resolve(future, call):
+    if future.done():
+        return
+    if call.error is not None:
+        future.set_exception(call.error)
+    else:
+        future.set_result(call.result)
+
+
+class SingleFlight:
+    """
+    Per-key request coalescing: while fn() is running for a key, other
+    callers with the same key wait for that call and get its result (or its
+    exception) instead of starting their own. do() and do_async() share
+    calls, so threads and coroutines loading the same key coalesce too.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._leaders = 0
+        self._coalesced = 0
+
+    def do(self, key, fn, timeout=None):
+        """Run fn() once per key at a time; returns (result, was_leader)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"timed out waiting for in-flight call {key!r}")
+            if call.error is not None:
+                raise call.error
+            return call.result, False
+
+        try:
+            call.result = fn()
+            return call.result, True
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            self._finish(key, call)
+
+    async def do_async(self, key, coro_fn, timeout=None):
+        """
+        do() for a coroutine function: the leader runs coro_fn() as a task,
+        which a cancelled caller doesn't cancel, and waiting doesn't block
+        the event loop
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self._leaders += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self._coalesced += 1
+                leader = False
+                future = loop.create_future()
+                call.futures.append((loop, future))
+
+        if leader:
+            future = asyncio.ensure_future(coro_fn())
+            future.add_done_callback(lambda task: self._task_done(key, call, task))
+            return await asyncio.shield(future), True
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout), False
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"timed out waiting for in-flight call {key!r}") from None
+
+    def _task_done(self, key, call, task):
+        if task.cancelled():
+            call.error = asyncio.CancelledError()
+        elif task.exception() is not None:
+            call.error = task.exception()
+        else:
+            call.result = task.result()
+        self._finish(key, call)
+
+    def _finish(self, key, call):
+        with self._lock:
+            del self._calls[key]
+        # no more waiters can join once the call is out of _calls
+        call.done.set()
+        for loop, future in call.futures:
+            loop.call_soon_threadsafe(_resolve, future, call)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': len(self._calls),
+                'leaders': self._leaders,
+                'coalesced': self._coalesced,
+            }
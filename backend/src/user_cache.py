@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """
+    Small in-process TTL cache for user rows, used by flask-login's
+    user_loader so authenticated requests don't query app_user every time.
+    Holds at most max_entries users (least recently used dropped first).
+    Call invalidate() whenever a user's row changes or they log out.
+    """
+
+    def __init__(self, ttl_seconds=60, max_entries=10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()     # user_id -> (row, expires_at)
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, user_id):
+        """Cached row for user_id, or None"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._rows.get(user_id)
+            if cached is not None and cached[1] > now:
+                self._rows.move_to_end(user_id)
+                self._hits += 1
+                return cached[0]
+            if cached is not None:
+                del self._rows[user_id]
+            self._misses += 1
+            return None
+
+    def set(self, user_id, row):
+        with self._lock:
+            self._rows[user_id] = (dict(row), time.monotonic() + self.ttl_seconds)
+            self._rows.move_to_end(user_id)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._rows.pop(user_id, None)
+            self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._rows),
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_ratio': round(self._hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self._invalidations,
+            }
@@ -0,0 +1,78 @@
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from album_backfill import AlbumBackfillWorker  # noqa: E402
+
+
+class NotFound(Exception):
+    pass
+
+
+class AlbumBackfillBackoffTest(unittest.TestCase):
+    def make_worker(self, fetch, missing_ids, **kwargs):
+        self.fetched = []
+        self.written = []
+        lock = threading.Lock()
+
+        def counting_fetch(album_id):
+            with lock:
+                self.fetched.append(album_id)
+            return fetch(album_id)
+
+        def find_missing(after_id, limit):
+            return [album_id for album_id in missing_ids if album_id > after_id][:limit]
+
+        worker = AlbumBackfillWorker(counting_fetch, find_missing, self.written.extend,
+                                     workers=1, **kwargs)
+        self.addCleanup(worker.stop, 5)
+        return worker
+
+    def wait_for_scans(self, worker, scans, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while worker.stats()['scans_completed'] < scans:
+            self.assertLess(time.monotonic(), deadline, "backfill scans didn't run")
+            time.sleep(0.01)
+
+    def test_not_found_album_is_skipped_on_the_next_scans(self):
+        def fetch(album_id):
+            raise NotFound(f"album {album_id} not found")
+
+        # default retry_after, scaled down with the scan interval
+        worker = self.make_worker(fetch, [7], scan_interval=0.1)
+        worker.start()
+        self.wait_for_scans(worker, 3)
+
+        self.assertEqual(self.fetched, [7])
+        self.assertEqual(worker.stats()['skipped_backoff'], 2)
+
+    def test_album_without_cover_is_skipped_until_its_backoff_passes(self):
+        worker = self.make_worker(lambda album_id: {}, [3], scan_interval=0.02, retry_after=0.2)
+        worker.start()
+        self.wait_for_scans(worker, 3)
+        self.assertEqual(self.fetched, [3])
+
+        time.sleep(0.25)        # first backoff over; the second one is twice as long
+        self.wait_for_scans(worker, worker.stats()['scans_completed'] + 3)
+        self.assertEqual(self.fetched, [3, 3])
+        self.assertEqual(self.written, [])
+
+    def test_enqueue_skips_albums_backing_off(self):
+        worker = self.make_worker(lambda album_id: {}, [], scan_interval=60, retry_after=60)
+        worker.enqueue([5])
+        deadline = time.monotonic() + 5
+        while not self.fetched:
+            self.assertLess(time.monotonic(), deadline, "enqueued album wasn't fetched")
+            time.sleep(0.01)
+
+        worker.enqueue([5])
+        self.assertEqual(worker.stats()['queue_depth'], 0)
+        self.assertEqual(worker.stats()['enqueued'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
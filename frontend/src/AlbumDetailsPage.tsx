@@ -1,62 +1,50 @@
-import { useLocation, useNavigate } from 'react-router-dom';
+import { useLocation, useNavigate, useParams } from 'react-router-dom';
 import { useState, useEffect } from 'react';
 import './AlbumDetailsPage.css';
 import { api } from './utils/api.ts';
-
-interface Track {
-  id: string;
-  title: string;
-  duration: number;
-  track_position: number;
-}
-
-interface AlbumDetail {
-  deezer_id: string;
-  title: string;
-  artist_name: string;
-  artist_id: string;
-  cover_url: string;
-  release_date: string;
-  tracks: Track[];
-}
+import type { AlbumPage } from './utils/api.ts';
 
 function AlbumDetailsPage() {
   const location = useLocation();
   const navigate = useNavigate();
-  const album = location.state?.album as AlbumDetail;
+  const { albumId } = useParams();
+  // HomePage passes the album page it loaded; opening the URL directly loads it here
+  const [album, setAlbum] = useState<AlbumPage | undefined>(location.state?.album as AlbumPage | undefined);
+  const [isLoading, setIsLoading] = useState(!album);
   
-  const [userRating, setUserRating] = useState<number>(0);
+  const [userRating, setUserRating] = useState<number>(album?.user_rating ?? 0);
   const [hoverRating, setHoverRating] = useState<number>(0);
   const [isSubmitting, setIsSubmitting] = useState(false);
-  const [isAlbumAdded, setIsAlbumAdded] = useState(false);
+  const [isAlbumAdded, setIsAlbumAdded] = useState(album?.in_list ?? false);
 
   useEffect(() => {
-    if (album) {
-      fetchUserRating();
-      checkIfAlbumAdded();
+    if (albumId && album?.deezer_id !== albumId) {
+      fetchAlbumPage(albumId);
     }
-  }, [album]);
+  }, [albumId]);
 
-  const fetchUserRating = async () => {
+  const fetchAlbumPage = async (id: string) => {
+    setIsLoading(true);
     try {
-      const response = await api.getUserRating(album.deezer_id);
-      if (response.rating) {
-        setUserRating(response.rating);
-      }
+      const page = await api.getAlbumPage(id);
+      setAlbum(page);
+      setUserRating(page.user_rating ?? 0);
+      setIsAlbumAdded(page.in_list);
     } catch (err) {
-      console.error('Error fetching rating:', err);
+      console.error('Error fetching album:', err);
+    } finally {
+      setIsLoading(false);
     }
   };
 
-  const checkIfAlbumAdded = async () => {
-    try {
-      const albums = await api.getMyAlbums();
-      const isAdded = albums.some(a => a.deezer_id === album.deezer_id);
-      setIsAlbumAdded(isAdded);
-    } catch (err) {
-      console.error('Error checking album status:', err);
-    }
-  };
+  if (isLoading) {
+    return (
+      <div className="album-details">
+        <button className="back-btn" onClick={() => navigate('/home')}>← Back</button>
+        <p>Loading...</p>
+      </div>
+    );
+  }
 
   if (!album) {
     return (
@@ -91,7 +79,6 @@ function AlbumDetailsPage() {
 
   const handleAdd = async () => {
     try {
-      await api.getAlbumDetails(album.deezer_id);
       await api.addAlbum(album.deezer_id);
       setIsAlbumAdded(true);
     } catch (err) {
@@ -104,7 +91,6 @@ function AlbumDetailsPage() {
     
     setIsSubmitting(true);
     try {
-      await api.getAlbumDetails(album.deezer_id);
       await api.rateAlbum(album.deezer_id, rating);
       setUserRating(rating);
     } catch (err) {
@@ -135,6 +121,11 @@ function AlbumDetailsPage() {
         {userRating > 0 && (
           <p className="rating-text">Your rating: {userRating} stars</p>
         )}
+        {album.rating_count > 0 && album.rating_average !== null && (
+          <p className="rating-text">
+            Community rating: {album.rating_average.toFixed(1)} ({album.rating_count} {album.rating_count === 1 ? 'rating' : 'ratings'})
+          </p>
+        )}
       </div>
     );
   };
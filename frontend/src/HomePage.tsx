@@ -59,7 +59,7 @@ function HomePage() {
   const handleAlbumClick = async (albumId: string) => {
     setIsLoading(true);
     try {
-      const albumData = await api.getAlbumDetails(albumId);
+      const albumData = await api.getAlbumPage(albumId);
       navigate(`/album/${albumId}`, { state: { album: albumData } });
     } catch (error) {
       console.error('Error fetching album details:', error);
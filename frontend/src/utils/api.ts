@@ -15,6 +15,12 @@ export interface AlbumDetail extends Album {
   artist_id: string;
   release_date: string;
   tracks: Track[];
+  rating_average: number | null;
+  rating_count: number;
+}
+export interface AlbumPage extends AlbumDetail {
+  user_rating: number | null;
+  in_list: boolean;
 }
 
 export interface SearchResponse {
@@ -24,6 +30,20 @@ export interface SearchResponse {
   results: Album[];
 }
 
+export interface Page<T> {
+  items: T[];
+  next_cursor: string | null;
+  limit: number;
+}
+
+function pageParams(cursor?: string | null, limit?: number) {
+  const params = new URLSearchParams();
+  if (limit !== undefined) params.set("limit", String(limit));
+  if (cursor) params.set("cursor", cursor);
+  if (!params.has("limit") && !params.has("cursor")) params.set("limit", "50");
+  return params.toString();
+}
+
 export async function request<T = unknown>(
   path: string,
   init: RequestInit & { json?: unknown } = {}
@@ -69,9 +89,15 @@ export const api = {
   getAlbumDetails(albumId: string) {
     return request<AlbumDetail>(`/v1/albums/${albumId}`);
   },
+  getAlbumPage(albumId: string) {
+    return request<AlbumPage>(`/v1/albums/${albumId}/page`);
+  },
   getMyAlbums() {
     return request<Album[]>("/v1/me/albums");
   },
+  getMyAlbumsPage(cursor?: string | null, limit?: number) {
+    return request<Page<Album>>(`/v1/me/albums?${pageParams(cursor, limit)}`);
+  },
   getRandomAlbums(count: number = 6) {
     return request<Album[]>(`/v1/albums/random?count=${count}`);
   },
@@ -99,6 +125,9 @@ export const api = {
   getRatedAlbums() {
     return request<Album[]>("/v1/me/rated-albums");
   },
+  getRatedAlbumsPage(cursor?: string | null, limit?: number) {
+    return request<Page<Album>>(`/v1/me/rated-albums?${pageParams(cursor, limit)}`);
+  },
   removeRating(albumId: string) {
     return request<{ ok: boolean; message?: string }>(
       `/v1/albums/${albumId}/rating`,